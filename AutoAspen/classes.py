@@ -7,10 +7,24 @@ __date__ = '12/25/2019'
 __version__ = '1.1'
 
 
+import os
 import re
+import json
+import time
+import gzip
+from collections import deque
+from queue import Queue
+from threading import Lock, Thread
+from shutil import copyfile, copyfileobj
 import numpy as np
-from pythoncom import CoInitialize
-from win32com.client import DispatchEx
+import pandas as pd
+from scipy.spatial import cKDTree
+from pythoncom import CoInitialize, CoMarshalInterThreadInterfaceInStream, CoGetInterfaceAndReleaseStream, IID_IDispatch
+from win32com.client import DispatchEx, Dispatch
+from win32process import GetWindowThreadProcessId, GetProcessMemoryInfo, EnumProcesses, GetModuleFileNameEx
+from win32api import OpenProcess, CloseHandle
+from pywintypes import error as WinError
+from win32con import PROCESS_QUERY_INFORMATION, PROCESS_VM_READ
 
 
 class Excel():
@@ -22,6 +36,7 @@ class Excel():
 		'''
 		
 		CoInitialize()
+		self.file = excelFile
 		self.excelCOM = DispatchEx('Excel.Application')
 		self.excelBook = self.excelCOM.Workbooks.Open(excelFile)
 
@@ -80,6 +95,36 @@ class Excel():
 		# print('finished running sub_ClearSumData_ASPEN')
 		self.run_macro('sub_GetSumData_ASPEN')
 		print('finished running sub_GetSumData_ASPEN')
+	
+	
+	def load_aspenValues(self, values, locations):
+		'''
+		Writes values harvested from the live Aspen tree instead of letting the macro read them from a saved file, 
+		cells in the same column with consecutive rows are written in one call
+		
+		Parameters
+		values: lst, values of Aspen tree nodes
+		locations: lst of str, sheet!cell in calculator, in the order of values
+		'''
+		
+		cells = {}
+		for value, location in zip(values, locations):
+			sheet, cell = location.split('!')
+			col, row = re.match(r'\$?([A-Za-z]+)\$?(\d+)$', cell).groups()
+			cells.setdefault((sheet, col.upper()), []).append((int(row), value))
+		
+		for (sheet, col), rowValues in cells.items():
+			sht = self.excelBook.Worksheets(sheet)
+			
+			rowValues.sort(key = lambda rowValue: rowValue[0])
+			
+			start = 0
+			for k in range(1, len(rowValues) + 1):
+				if k == len(rowValues) or rowValues[k][0] != rowValues[k-1][0] + 1:
+					block = rowValues[start:k]
+					sht.Range('%s%s:%s%s' % (col, block[0][0], col, block[-1][0])).Value = tuple((value,) for _, value in block)
+					start = k
+		
 		
 	def run_macro(self, macro):
 		'''
@@ -89,6 +134,52 @@ class Excel():
 			
 		self.excelCOM.Run(macro)	
 		
+		
+	def pid(self):
+		'''
+		Returns
+		pid: int, id of the Excel process serving this instance
+		'''
+		
+		return GetWindowThreadProcessId(self.excelCOM.Hwnd)[1]
+		
+		
+	def memory(self):
+		'''
+		Returns
+		memory: float, working set of the Excel process in MB
+		'''
+		
+		handle = OpenProcess(PROCESS_QUERY_INFORMATION | PROCESS_VM_READ, False, self.pid())
+		try:
+			memory = GetProcessMemoryInfo(handle)['WorkingSetSize'] / 1024**2
+		finally:
+			CloseHandle(handle)
+		
+		return memory
+		
+		
+	def replace_with(self, other):
+		'''
+		Quits the Excel process and continues with the one of other
+		
+		Parameters
+		other: instance of Excel class, opened with the same file
+		'''
+		
+		self.quit()
+		
+		self.excelCOM, self.excelBook = other.excelCOM, other.excelBook
+		
+		
+	def quit(self):
+		'''
+		Closes the workbook and quits the Excel process
+		'''
+		
+		self.close()
+		self.excelCOM.Quit()
+		
 			
 	def close(self):
 		
@@ -108,6 +199,10 @@ class Aspen():
 		self.COM = DispatchEx('Apwn.Document')
 		self.COM.InitFromArchive2(self.file)
 		
+		self.changes = {}
+		self.converged = False
+		self.runStats = []
+		
 		
 	def get_value(self, aspenPath):
 		'''
@@ -123,6 +218,25 @@ class Aspen():
 		return value
 		
 		
+	def get_values(self, aspenPaths):
+		'''
+		Parameters
+		aspenPaths: lst of str, paths in ASPEN tree
+		
+		Returns
+		values: lst, values in ASPEN tree nodes, None for paths not found
+		'''
+		
+		tree = self.COM.Tree
+		
+		values = []
+		for aspenPath in aspenPaths:
+			node = tree.FindNode(aspenPath)
+			values.append(None if node is None else node.Value)
+		
+		return values
+		
+		
 	def set_value(self, aspenPath, value, ifFortran, verbose=True, short_name=None):
 		'''
 		Parameters
@@ -141,16 +255,60 @@ class Aspen():
 			
 			self.COM.Tree.FindNode(aspenPath).Value = re.sub(r'(?<==).+', str(value), oldValue)
 			
+			match = re.search(r'(?<==).+', oldValue)
+			oldValue = match.group() if match else None   # no '=' in the Fortran line, change is unknown
+			
 		else:
+			oldValue = self.COM.Tree.FindNode(aspenPath).Value
+			
 			self.COM.Tree.FindNode(aspenPath).Value = float(value)
 		
+		# relative change since the last converged run, accumulated over repeated sets
+		try:
+			change = abs(float(value) - float(oldValue)) / (abs(float(oldValue)) or 1)
+		except (TypeError, ValueError):
+			change = np.inf
+		self.changes[aspenPath] = self.changes.get(aspenPath, 0) + change
+		
 		if verbose:
 			print(f'| New Value: {self.COM.Tree.FindNode(aspenPath).Value}')
 
-	def run_model(self):
-	
-		self.COM.Reinit()
-		self.COM.Engine.Run2()
+	def run_model(self, warm = False, threshold = 0.1):
+		'''
+		Parameters
+		warm: bool, whether to start from the current converged state without Reinit if the largest relative change 
+			  of inputs since the last converged run is not above threshold, falls back to Reinit and rerun if the 
+			  warm run does not converge
+		threshold: float, threshold of relative change of inputs for warm start
+		'''
+		
+		t0 = time.time()
+		
+		ifWarm = warm and self.converged and max(self.changes.values(), default = 0) <= threshold
+		if ifWarm:
+			self.COM.Engine.Run2()
+			self.converged = self.check_convergence()
+			mode = 'warm'
+		
+		if not ifWarm or not self.converged:
+			self.COM.Reinit()
+			self.COM.Engine.Run2()
+			self.converged = self.check_convergence()
+			mode = 'fallback' if ifWarm else 'cold'
+		
+		self.changes = {}
+		self.runStats.append({'Mode': mode, 'Converged': self.converged, 'Time (s)': time.time() - t0})
+		
+		
+	def check_convergence(self):
+		'''
+		Returns
+		ifConverged: bool, whether the last run finished without errors, True if run status is not available
+		'''
+		
+		node = self.COM.Tree.FindNode(r'\Data\Results Summary\Run-Status\Output\PER_ERROR')
+		
+		return node is None or node.Value in [0, None]
 		
 		
 	def save_model(self, saveFile):
@@ -161,11 +319,204 @@ class Aspen():
 	
 		self.COM.SaveAs(saveFile)
 		
+		
+	def load_snapshot(self, snapshotFile):
+		'''
+		Reopens the model from a converged snapshot, which becomes the starting state of the next run
+		
+		Parameters
+		snapshotFile: str, converged Aspen file (.bkp)
+		'''
+		
+		self.COM.Close()
+		self.COM = DispatchEx('Apwn.Document')
+		self.COM.InitFromArchive2(snapshotFile)
+		
+		self.changes = {}
+		self.converged = True
+		
+	
+	def replace_with(self, other):
+		'''
+		Closes the Aspen model and continues with the one of other, which is at its initial state
+		
+		Parameters
+		other: instance of Aspen class, opened with the same file
+		'''
+		
+		self.COM.Close()
+		self.COM = other.COM
+		
+		self.changes = {}
+		self.converged = False
+		
 	
 	def close(self):
 		
 		self.COM.Close()
 	
+	
+class Standby():
+	
+	def __init__(self, cls, file):
+		'''
+		Opens an instance of Aspen or Excel class in a background thread, so the caller keeps running while the COM 
+		server starts and loads file
+		
+		Parameters
+		cls: Aspen or Excel class
+		file: str, Aspen model file or excel calculator file
+		'''
+		
+		self.instance = None
+		self.streams = {}
+		self.error = None
+		
+		self.thread = Thread(target = self._open, args = (cls, file), daemon = True)
+		self.thread.start()
+		
+		
+	def _open(self, cls, file):
+		
+		try:
+			instance = cls(file)
+			
+			# COM objects belong to this thread, they are marshalled to be used by the thread calling get
+			for name, value in vars(instance).items():
+				if hasattr(value, '_oleobj_'):
+					self.streams[name] = CoMarshalInterThreadInterfaceInStream(IID_IDispatch, value._oleobj_)
+			
+			self.instance = instance
+		
+		except Exception as e:
+			self.error = e
+		
+		
+	def ready(self):
+		
+		return not self.thread.is_alive()
+		
+		
+	def get(self):
+		'''
+		Returns
+		instance: instance of Aspen or Excel class usable in the calling thread, None if it failed to open
+		'''
+		
+		self.thread.join()
+		
+		if self.instance is None:
+			print('standby failed to open: %s' % self.error)
+			return None
+		
+		for name, stream in self.streams.items():
+			setattr(self.instance, name, Dispatch(CoGetInterfaceAndReleaseStream(stream, IID_IDispatch)))
+		self.streams = {}
+		
+		return self.instance
+		
+		
+class Recycler():
+	
+	def __init__(self, aspenModel, calculator, every = None, maxMemory = None, lead = 0.9):
+		'''
+		Replaces the COM servers of aspenModel and calculator with fresh ones after every runs or when the Excel 
+		process uses more than maxMemory MB, to bound the growth of memory and handles in long loops. The fresh servers 
+		are opened in the background once lead of either limit is reached and swapped in after the first run they are 
+		ready, so recycling does not wait for them to start. aspenModel and calculator keep their identity.
+		
+		Parameters
+		aspenModel: instance of Aspen class
+		calculator: instance of Excel class
+		every: int or None, # of runs between recycling
+		maxMemory: float or None, memory limit of the Excel process in MB
+		lead: float, fraction of limits at which fresh servers start to open
+		'''
+		
+		self.aspenModel = aspenModel
+		self.calculator = calculator
+		self.every = every
+		self.maxMemory = maxMemory
+		self.lead = lead
+		
+		self.count = 0
+		self.nrecycled = 0
+		self.standby = None
+		
+		
+	def usage(self):
+		'''
+		Returns
+		usage: float, the larger fraction of the run and memory limits used
+		'''
+		
+		usage = 0
+		if self.every:
+			usage = max(usage, self.count / self.every)
+		if self.maxMemory:
+			usage = max(usage, self.calculator.memory() / self.maxMemory)
+		
+		return usage
+		
+		
+	def after_run(self):
+		'''
+		Returns
+		recycled: bool, whether the servers were replaced, models are then at their initial state and all inputs 
+				  should be set again
+		'''
+		
+		self.count += 1
+		
+		usage = self.usage()
+		
+		if self.standby is None:
+			if usage >= self.lead:
+				self.standby = (Standby(Aspen, self.aspenModel.file), Standby(Excel, self.calculator.file))
+			return False
+		
+		if usage < 1 or not all(standby.ready() for standby in self.standby):
+			return False
+		
+		aspenModel, calculator = [standby.get() for standby in self.standby]
+		self.standby = None
+		
+		if aspenModel is None or calculator is None:   # opened again after the next run
+			for instance in [aspenModel, calculator]:
+				if instance is not None:
+					self._discard(instance)
+			return False
+		
+		self.aspenModel.replace_with(aspenModel)
+		self.calculator.replace_with(calculator)
+		
+		self.count = 0
+		self.nrecycled += 1
+		print('Aspen and Excel recycled at %.0f%% of limit' % (100 * usage))
+		
+		return True
+		
+		
+	def close(self):
+		'''
+		Closes fresh servers not swapped in yet
+		'''
+		
+		if self.standby is not None:
+			for standby in self.standby:
+				instance = standby.get()
+				if instance is not None:
+					self._discard(instance)
+			self.standby = None
+		
+		
+	def _discard(self, instance):
+		
+		if isinstance(instance, Excel):
+			instance.quit()   # closing the workbook alone leaves the hidden Excel process running
+		else:
+			instance.close()
+		
 		
 class Scaler():
 	
@@ -210,6 +561,985 @@ class Scaler():
 		return rawData
 		
 		
+class TmpManager():
+	
+	def __init__(self, tmpDir, retainDir = None, keep = None, compress = False):
+		'''
+		Names temporary Aspen files and deletes them once more than keep newer files exist. Files of failed runs and 
+		files passed to retain are copied to retainDir first, and gzipped by a background thread if compress.
+		
+		Parameters
+		tmpDir: str, directory of temporary Aspen files, can be on a RAM-backed path (e.g. /dev/shm or a RAM disk)
+		retainDir: str or None, directory of retained files, tmpDir/retained by default, should be on disk if tmpDir is not
+		keep: int or None, # of most recent files kept in tmpDir, all files are kept if None
+		compress: bool, whether retained files are gzipped
+		'''
+		
+		self.tmpDir = tmpDir
+		self.retainDir = retainDir or tmpDir + '/retained'
+		self.keep = None if keep is None else max(keep, 1)   # the latest file may still be read by calculator
+		self.compress = compress
+		
+		self.recent = deque()
+		self.count = 0
+		self.nfailed = 0
+		self.stats = {'Files written': 0, 'MB written': 0.0, 'Files deleted': 0, 'Files retained': 0}
+		
+		os.makedirs(tmpDir, exist_ok = True)
+		os.makedirs(self.retainDir, exist_ok = True)
+		
+		self.queue = Queue()
+		self.compressor = None
+		if compress:
+			self.compressor = Thread(target = self._compress_files, daemon = True)
+			self.compressor.start()
+		
+		
+	def new_file(self):
+		'''
+		Returns
+		tmpFile: str, name of the next temporary Aspen file
+		'''
+		
+		self.count += 1
+		
+		return '%s/%s.bkp' % (self.tmpDir, self.count)
+		
+		
+	def done(self, tmpFile, failed = False):
+		'''
+		Parameters
+		tmpFile: str, temporary Aspen file just saved
+		failed: bool, whether the run did not converge, such files are retained
+		'''
+		
+		self.stats['Files written'] += 1
+		self.stats['MB written'] += os.path.getsize(tmpFile) / 1024**2
+		
+		if failed:
+			self.nfailed += 1
+			self.retain(tmpFile, 'failed_%s' % self.nfailed)
+		
+		if self.keep is None:
+			return
+		
+		self.recent.append(tmpFile)
+		while len(self.recent) > self.keep:
+			try:
+				os.remove(self.recent.popleft())
+				self.stats['Files deleted'] += 1
+			except FileNotFoundError:
+				pass
+		
+		
+	def retain(self, tmpFile, name):
+		'''
+		Parameters
+		tmpFile: str, temporary Aspen file
+		name: str, name of retained file, a retained file of the same name is replaced
+		'''
+		
+		retainedFile = '%s/%s.bkp' % (self.retainDir, name)
+		copyfile(tmpFile, retainedFile)
+		self.stats['Files retained'] += 1
+		
+		if self.compress:
+			self.queue.put(retainedFile)
+		
+		
+	def _compress_files(self):
+		
+		while True:
+			retainedFile = self.queue.get()
+			try:
+				with open(retainedFile, 'rb') as fIn, gzip.open(retainedFile + '.gz', 'wb') as fOut:
+					copyfileobj(fIn, fOut)
+				os.remove(retainedFile)
+			except OSError as e:
+				print('failed to compress %s: %s' % (retainedFile, e))
+			finally:
+				self.queue.task_done()
+		
+		
+	def usage(self):
+		'''
+		Returns
+		usage: dict, # and size of files written, deleted and retained, and disk usage of tmpDir and retainDir
+		'''
+		
+		usage = dict(self.stats)
+		for name, folder in [('Tmp', self.tmpDir), ('Retained', self.retainDir)]:
+			files = [entry for entry in os.scandir(folder) if entry.is_file()]
+			usage['%s files' % name] = len(files)
+			usage['%s MB' % name] = sum(entry.stat().st_size for entry in files) / 1024**2
+		
+		return usage
+		
+		
+	def close(self):
+		'''
+		Waits until retained files are compressed
+		'''
+		
+		if self.compressor is not None:
+			self.queue.join()
+		
+		
+class Simulator():
+	
+	def __init__(self, aspenModel, calculator, inputs, outputs, tmpDir, warm = False, library = None, handoff = None, keepFiles = False, 
+				 recycler = None, classifier = None):
+		'''
+		Runs Aspen model and calculator for input values given one point after another, only inputs whose values 
+		changed since the previous point are set again, and Aspen is run only when an Aspen input changed
+		
+		Parameters
+		aspenModel: instance of Aspen class
+		calculator: instance of Excel class
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		outputs: lst of str, sheet!cell of outputs in calculator
+		tmpDir: str or instance of TmpManager class, directory or manager of temporary Aspen files
+		warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+		library: instance of SnapshotLibrary class or None, if given, Aspen runs start from the nearest converged 
+				 snapshot when it is nearer than the current state, and converged runs are added to it
+		handoff: lst of tuples or None, (Aspen path, sheet!cell in calculator), if given, results are copied from the 
+				 live Aspen tree to calculator and the calculator macro no longer reads a saved Aspen file, so the map 
+				 should cover every cell sub_GetSumData_ASPEN fills that outputs depend on
+		keepFiles: bool, whether Aspen files are still saved to tmpDir in handoff mode, always saved with library
+		recycler: instance of Recycler class or None, recycles COM servers of aspenModel and calculator, all inputs are 
+				  set again after recycling
+		classifier: instance of FeasibilityClassifier class or None, learns convergence of each Aspen run
+		'''
+		
+		self.aspenModel = aspenModel
+		self.calculator = calculator
+		self.inputs = [(location, bool(ifFortran), '\\' in location) for location, ifFortran in inputs]
+		self.outputs = [output.split('!') for output in outputs]
+		self.tmp = tmpDir if isinstance(tmpDir, TmpManager) else TmpManager(tmpDir)
+		self.warm = warm
+		self.library = library
+		self.handoff = None if handoff is None else [list(items) for items in zip(*handoff)]
+		self.ifSave = handoff is None or keepFiles or library is not None
+		
+		self.ifAspen = any(ifAspen for _, _, ifAspen in self.inputs)
+		self.aspenIdx = [i for i, (_, _, ifAspen) in enumerate(self.inputs) if ifAspen]
+		self.prevValues = None
+		self.tmpFile = None if self.ifAspen else aspenModel.file
+		self.handoffValues = None
+		self.recycler = recycler
+		self.classifier = classifier
+		
+		
+	def run(self, values):
+		'''
+		Parameters
+		values: array, values of inputs
+		
+		Returns
+		outputValues: array, values of outputs
+		'''
+		
+		changed = [i for i, value in enumerate(values) if self.prevValues is None or value != self.prevValues[i]]
+		
+		for i in changed:
+			location, ifFortran, ifAspen = self.inputs[i]
+			if ifAspen:
+				self.aspenModel.set_value(location, values[i], ifFortran)
+			else:
+				sheet, cell = location.split('!')
+				self.calculator.set_cell(values[i], sheet, loc = cell)
+		
+		if self.ifAspen and (self.prevValues is None or any(self.inputs[i][2] for i in changed)):
+			aspenValues = [values[i] for i in self.aspenIdx]
+			
+			if self.library is not None:
+				self.start_from_snapshot(aspenValues)
+			
+			self.aspenModel.run_model(warm = self.warm)
+			
+			if self.classifier is not None:
+				self.classifier.add(aspenValues, not self.aspenModel.converged, self.aspenModel.runStats[-1]['Time (s)'])
+			
+			if self.ifSave:
+				self.tmpFile = self.tmp.new_file()
+				self.aspenModel.save_model(self.tmpFile)
+				self.tmp.done(self.tmpFile, failed = not self.aspenModel.converged)
+			
+			if self.library is not None and self.aspenModel.converged:
+				self.library.add(aspenValues, self.tmpFile)
+			
+			self.handoffValues = None
+		
+		if self.handoff is None:
+			self.calculator.load_aspenModel(self.tmpFile)
+		
+		elif self.handoffValues is None:
+			paths, locations = self.handoff
+			self.handoffValues = self.aspenModel.get_values(paths)
+			self.calculator.load_aspenValues(self.handoffValues, locations)
+		
+		self.calculator.run_macro('solvedcfror')
+		
+		outputValues = np.array([self.calculator.get_cell(sheet, loc = cell) for sheet, cell in self.outputs], dtype = float)
+		
+		self.prevValues = list(values)
+		
+		if self.recycler is not None and self.recycler.after_run():
+			self.prevValues = None
+			self.handoffValues = None
+		
+		return outputValues
+		
+		
+	def start_from_snapshot(self, aspenValues):
+		'''
+		Parameters
+		aspenValues: lst, values of Aspen inputs of the next run
+		'''
+		
+		nearest = self.library.nearest(aspenValues)
+		if nearest is None:
+			return
+		
+		snapshotFile, dist = nearest
+		if self.prevValues is not None:
+			prevAspenValues = [self.prevValues[i] for i in self.aspenIdx]
+			if self.library.distance(aspenValues, prevAspenValues) <= dist:
+				return
+		
+		self.aspenModel.load_snapshot(snapshotFile)
+		
+		for i, value in zip(self.aspenIdx, aspenValues):
+			location, ifFortran, _ = self.inputs[i]
+			self.aspenModel.set_value(location, value, ifFortran)
+		
+		
+class SnapshotLibrary():
+	
+	def __init__(self, libDir, paths, budget = 2048):
+		'''
+		Converged Aspen files indexed by values of Aspen inputs with a KD-tree, inputs are scaled by the range of 
+		indexed values. Snapshots are copied into libDir and listed in libDir/snapshots.json, the least recently used 
+		snapshots are deleted when the total size exceeds budget.
+		
+		Parameters
+		libDir: str, library directory
+		paths: lst of str, Aspen paths of inputs
+		budget: float, disk budget in MB
+		'''
+		
+		self.libDir = libDir
+		self.paths = list(paths)
+		self.budget = budget * 1024**2
+		self.indexFile = libDir + '/snapshots.json'
+		self.tree = None
+		
+		os.makedirs(libDir, exist_ok = True)
+		
+		if os.path.exists(self.indexFile):
+			with open(self.indexFile) as f:
+				index = json.load(f)
+			if index['paths'] != self.paths:
+				raise ValueError('%s indexes snapshots of different inputs' % libDir)
+			
+			self.entries = [entry for entry in index['entries'] if os.path.exists(entry['file'])]
+			self.nadded = index['nadded']
+		
+		else:
+			self.entries = []
+			self.nadded = 0
+		
+		self.clock = max([entry['lastUsed'] for entry in self.entries], default = 0)
+		
+		
+	def __len__(self):
+		
+		return len(self.entries)
+		
+		
+	def save_index(self):
+		
+		with open(self.indexFile, 'w') as f:
+			json.dump({'paths': self.paths, 'nadded': self.nadded, 'entries': self.entries}, f)
+		
+		
+	def add(self, x, bkpFile):
+		'''
+		Parameters
+		x: lst, values of Aspen inputs
+		bkpFile: str, converged Aspen file, copied into library
+		'''
+		
+		self.nadded += 1
+		self.clock += 1
+		
+		snapshotFile = '%s/%s.bkp' % (self.libDir, self.nadded)
+		copyfile(bkpFile, snapshotFile)
+		
+		self.entries.append({'file': snapshotFile, 'x': list(map(float, x)), 'size': os.path.getsize(snapshotFile), 
+							 'lastUsed': self.clock})
+		self.evict()
+		
+		self.tree = None
+		self.save_index()
+		
+		
+	def import_files(self, aspenModel, files):
+		'''
+		Indexes converged Aspen files saved before, values of inputs are read from each file
+		
+		Parameters
+		aspenModel: instance of Aspen class, its model is replaced by the last file read
+		files: lst of str, Aspen files (.bkp)
+		'''
+		
+		for file in files:
+			aspenModel.load_snapshot(file)
+			if not aspenModel.check_convergence():
+				continue
+			
+			x = []
+			for path in self.paths:
+				value = aspenModel.get_value(path)
+				x.append(float(re.search(r'(?<==).+', value).group() if isinstance(value, str) else value))
+			
+			self.add(x, file)
+		
+		
+	def evict(self):
+		
+		self.entries.sort(key = lambda entry: entry['lastUsed'])
+		
+		while len(self.entries) > 1 and sum(entry['size'] for entry in self.entries) > self.budget:
+			entry = self.entries.pop(0)
+			os.remove(entry['file'])
+		
+		
+	def distance(self, x1, x2):
+		'''
+		Parameters
+		x1, x2: lst, values of Aspen inputs
+		
+		Returns
+		dist: float, Euclidean distance of scaled inputs
+		'''
+		
+		return float(np.linalg.norm((np.asarray(x1, dtype = float) - np.asarray(x2, dtype = float)) / self.scale()))
+		
+		
+	def scale(self):
+		
+		X = np.array([entry['x'] for entry in self.entries])
+		span = X.max(axis = 0) - X.min(axis = 0) if X.size else np.ones(len(self.paths))
+		
+		return np.where(span > 0, span, 1)
+		
+		
+	def nearest(self, x):
+		'''
+		Parameters
+		x: lst, values of Aspen inputs
+		
+		Returns
+		nearest: tuple or None, (snapshot file, scaled distance), None if library is empty
+		'''
+		
+		if not self.entries:
+			return None
+		
+		if self.tree is None:
+			self.treeScale = self.scale()
+			self.tree = cKDTree(np.array([entry['x'] for entry in self.entries]) / self.treeScale)
+		
+		dist, k = self.tree.query(np.asarray(x, dtype = float) / self.treeScale)
+		
+		self.clock += 1
+		self.entries[k]['lastUsed'] = self.clock
+		
+		return self.entries[k]['file'], float(dist)
+		
+		
+class RecordedRuns():
+	
+	def __init__(self, inputs, extras, runFile = None):
+		'''
+		runs recorded at values of inputs with extra columns of results, appended to runFile so later sweeps start from 
+		them. Nearest runs are looked up with inputs scaled by the range of runs recorded.
+		
+		Parameters
+		inputs: lst of str, names, locations or Aspen paths of inputs
+		extras: lst of str, columns recorded after inputs
+		runFile: str or None, .tsv file of recorded runs, created if not existing
+		'''
+		
+		self.inputs = list(inputs)
+		self.extras = list(extras)
+		self.runFile = runFile
+		self.tree = None
+		
+		self.X = []
+		self.values = {extra: [] for extra in self.extras}
+		
+		if runFile is not None and os.path.exists(runFile):
+			runs = pd.read_csv(runFile, sep = '\t')
+			if runs.columns[:-len(self.extras)].tolist() != self.inputs:
+				raise ValueError('%s records runs of different inputs' % runFile)
+			
+			self.X = runs[self.inputs].values.tolist()
+			self.values = {extra: runs[extra].tolist() for extra in self.extras}
+		
+		elif runFile is not None:
+			pd.DataFrame(columns = self.inputs + self.extras).to_csv(runFile, sep = '\t', index = False)
+		
+		
+	def __len__(self):
+		
+		return len(self.X)
+		
+		
+	def add(self, x, *values):
+		'''
+		Parameters
+		x: lst, values of inputs
+		values: values of extra columns, in order
+		'''
+		
+		self.X.append(list(map(float, x)))
+		for extra, value in zip(self.extras, values):
+			self.values[extra].append(value)
+		
+		self.tree = None
+		
+		if self.runFile is not None:
+			with open(self.runFile, 'a') as f:
+				f.write('\t'.join(map(str, self.X[-1] + list(values))) + '\n')
+		
+		
+	def nearest(self, X, k):
+		'''
+		Parameters
+		X: 2D array, rows are points, columns are inputs
+		k: int, # of neighbours, capped by # of runs recorded
+		
+		Returns
+		dists: 2D array, scaled distances to the nearest runs of each point, ascending
+		idx: 2D array, indices of the nearest runs of each point
+		'''
+		
+		X = np.asarray(X, dtype = float).reshape(-1, len(self.inputs))
+		
+		if self.tree is None:
+			runs = np.array(self.X)
+			span = runs.max(axis = 0) - runs.min(axis = 0)
+			self.treeScale = np.where(span > 0, span, 1)
+			self.tree = cKDTree(runs / self.treeScale)
+		
+		k = min(k, len(self.X))
+		dists, idx = self.tree.query(X / self.treeScale, k = k)
+		
+		return np.reshape(dists, (X.shape[0], k)), np.reshape(idx, (X.shape[0], k))
+		
+		
+class FeasibilityClassifier():
+	
+	def __init__(self, paths, classFile = None, k = 7, radius = 0.2, threshold = 0.8, minRuns = 20):
+		'''
+		k-nearest-neighbour classifier of Aspen convergence over values of Aspen inputs, learnt online from runs. The 
+		failure probability of a point is the smoothed fraction of failed runs among its k nearest runs within radius, 
+		inputs are scaled by the range of runs seen. Runs are appended to classFile so later sweeps start from them.
+		
+		Parameters
+		paths: lst of str, Aspen paths of inputs
+		classFile: str or None, .tsv file of past runs, created if not existing
+		k: int, # of neighbours
+		radius: float, scaled distance beyond which runs are not neighbours
+		threshold: float, failure probability above which a point is doomed
+		minRuns: int, # of runs seen before any point is doomed
+		'''
+		
+		self.paths = list(paths)
+		self.classFile = classFile
+		self.k = k
+		self.radius = radius
+		self.threshold = threshold
+		self.minRuns = minRuns
+		
+		self.runs = RecordedRuns(self.paths, ['Failed', 'Time (s)'], classFile)
+		self.failed = self.runs.values['Failed']
+		self.times = self.runs.values['Time (s)']
+		
+		self.skipped = []   # lst of dict, keys are ['Values', 'Probability', 'Replacement'], filled by runners
+		
+		
+	def __len__(self):
+		
+		return len(self.runs)
+		
+		
+	def add(self, x, failed, seconds):
+		'''
+		Parameters
+		x: lst, values of Aspen inputs
+		failed: bool, whether the run did not converge
+		seconds: float, time of the run
+		'''
+		
+		self.runs.add(x, int(bool(failed)), float(seconds))
+		
+		
+	def probability(self, x):
+		'''
+		Parameters
+		x: lst, values of Aspen inputs
+		
+		Returns
+		prob: float, estimated probability that the run fails, 0.5 without neighbours
+		'''
+		
+		if not len(self.runs):
+			return 0.5
+		
+		dists, idx = self.runs.nearest(x, self.k)
+		idx = idx[0][dists[0] <= self.radius]
+		
+		nfailed = sum(self.failed[i] for i in idx)
+		
+		return (nfailed + 1) / (idx.size + 2)
+		
+		
+	def doomed(self, x):
+		'''
+		Parameters
+		x: lst, values of Aspen inputs
+		
+		Returns
+		ifDoomed: bool, whether the run is predicted to fail
+		'''
+		
+		return len(self.runs) >= self.minRuns and any(self.failed) and self.probability(x) > self.threshold
+		
+		
+	def savings(self):
+		'''
+		Returns
+		seconds: float, estimated time of doomed runs not solved, the mean time of failed runs per run
+		'''
+		
+		failedTimes = [t for t, failed in zip(self.times, self.failed) if failed]
+		
+		return len(self.skipped) * (np.mean(failedTimes) if failedTimes else 0)
+		
+		
+class RuntimeModel():
+	
+	def __init__(self, inputs, timingFile = None, k = 5):
+		'''
+		k-nearest-neighbour regressor of run time over values of inputs, learnt from recorded runs. The predicted time 
+		of a point is the mean time of its k nearest runs, inputs are scaled by the range of runs recorded. Runs are 
+		appended to timingFile so later sweeps start from them.
+		
+		Parameters
+		inputs: lst of str, names or locations of inputs
+		timingFile: str or None, .tsv file of recorded runs, created if not existing
+		k: int, # of neighbours
+		'''
+		
+		self.inputs = list(inputs)
+		self.timingFile = timingFile
+		self.k = k
+		
+		self.runs = RecordedRuns(self.inputs, ['Time (s)'], timingFile)
+		self.times = self.runs.values['Time (s)']
+		
+		
+	def __len__(self):
+		
+		return len(self.runs)
+		
+		
+	def add(self, x, seconds):
+		'''
+		Parameters
+		x: lst, values of inputs
+		seconds: float, time of the run
+		'''
+		
+		self.runs.add(x, float(seconds))
+		
+		
+	def predict(self, X):
+		'''
+		Parameters
+		X: 2D array, rows are points, columns are inputs
+		
+		Returns
+		seconds: array, predicted time of each point, NaN if no run is recorded
+		'''
+		
+		X = np.asarray(X, dtype = float).reshape(-1, len(self.inputs))
+		
+		if not len(self.runs):
+			return np.full(X.shape[0], np.nan)
+		
+		_, idx = self.runs.nearest(X, self.k)
+		
+		return np.array(self.times)[idx].mean(axis = 1)
+		
+		
+	def eta(self, X, nworkers, busy = ()):
+		'''
+		Parameters
+		X: 2D array, points not started yet
+		nworkers: int, # of workers
+		busy: lst, predicted seconds left of points running
+		
+		Returns
+		seconds: float, predicted time until all points finish when dispatched longest first to the first free worker, 
+				 NaN if no run is recorded
+		'''
+		
+		if not len(self.runs):
+			return np.nan
+		
+		free = sorted(list(busy) + [0] * (nworkers - len(busy)))[:max(nworkers, 1)]
+		for seconds in sorted(self.predict(X) if len(X) else [], reverse = True):
+			free[0] += seconds
+			free.sort()
+		
+		return max(free, default = 0)
+		
+		
+class EvaluationStore():
+	
+	def __init__(self, inputs, outputs, decimals = 10):
+		'''
+		Parameters
+		inputs: lst, input names
+		outputs: lst, output names
+		decimals: int, input values are rounded to decimals to build the key
+		'''
+		
+		self.inputs = list(inputs)
+		self.outputs = list(outputs)
+		self.decimals = decimals
+		self.records = {}
+		self.hits = 0
+		
+		
+	def key(self, x):
+		'''
+		Parameters
+		x: array, input values
+		
+		Returns
+		key: tuple, rounded input values
+		'''
+		
+		return tuple(np.round(np.asarray(x, dtype = float), self.decimals))
+		
+		
+	def __contains__(self, x):
+		
+		return self.key(x) in self.records
+		
+		
+	def get(self, x):
+		'''
+		Parameters
+		x: array, input values
+		
+		Returns
+		outputValues: array or None, values of all outputs, None if x has not been simulated
+		'''
+		
+		outputValues = self.records.get(self.key(x))
+		if outputValues is not None:
+			self.hits += 1
+		
+		return outputValues
+		
+		
+	def add(self, x, outputValues):
+		'''
+		Parameters
+		x: array, input values
+		outputValues: array, values of all outputs
+		'''
+		
+		self.records[self.key(x)] = np.asarray(outputValues, dtype = float)
+		
+		
+	def best(self, output):
+		'''
+		Parameters
+		output: str, output name
+		
+		Returns
+		x: array or None, input values with the minimal value of output, None if store is empty
+		f: float or None, minimal value of output
+		'''
+		
+		j = self.outputs.index(output)
+		
+		records = [(key, values[j]) for key, values in self.records.items() if not np.isnan(values[j])]
+		if not records:
+			return None, None
+		
+		key, f = min(records, key = lambda record: record[1])
+		
+		return np.array(key), f
+		
+		
+	def to_frame(self):
+		'''
+		Returns
+		evaluations: df, columns are inputs + outputs, index are evaluations
+		'''
+		
+		rows = [list(key) + values.tolist() for key, values in self.records.items()]
+		
+		return pd.DataFrame(rows, columns = self.inputs + self.outputs, dtype = float)
+		
+		
+class EvaluationRecorder():
+	
+	def __init__(self, traceFile, nvars, resume = False):
+		'''
+		Records each function evaluation as a row of float64 [f, x..., total time, Aspen time, calculator time] 
+		appended to traceFile. If resume, evaluations already in traceFile are replayed to the optimizer in the same 
+		order as long as it asks for the same inputs, without running Aspen again.
+		
+		Parameters
+		traceFile: str, binary trace file
+		nvars: int, # of input variables
+		resume: bool, whether to replay the existing trace
+		'''
+		
+		self.traceFile = traceFile
+		self.nvars = nvars
+		self.ncols = nvars + 4
+		self.nevals = 0
+		self.lock = Lock()
+		
+		if resume and os.path.exists(traceFile):
+			self.replay = read_trace_rows(traceFile, nvars)
+		else:
+			self.replay = np.zeros((0, self.ncols))
+		
+		self.truncate(self.replay.shape[0])
+		
+		
+	def truncate(self, nrows):
+		'''
+		Parameters
+		nrows: int, # of rows kept in trace file
+		'''
+		
+		self.replay = self.replay[:nrows]
+		self.replay.tofile(self.traceFile)
+		
+		
+	def x0(self):
+		'''
+		Returns
+		x0: array or None, inputs of the first recorded evaluation, None if nothing to replay
+		'''
+		
+		return self.replay[0, 1:1+self.nvars].copy() if self.replay.shape[0] else None
+		
+		
+	def replay_next(self, x):
+		'''
+		Parameters
+		x: array, input values asked by the optimizer
+		
+		Returns
+		f: float or None, recorded objective if x is the next recorded evaluation, otherwise None and replay stops
+		'''
+		
+		with self.lock:
+			if self.nevals < self.replay.shape[0]:
+				if np.allclose(x, self.replay[self.nevals, 1:1+self.nvars], rtol = 0, atol = 1e-12):
+					self.nevals += 1
+					
+					return self.replay[self.nevals-1, 0]
+				
+				else:
+					self.truncate(self.nevals)
+		
+		return None
+		
+		
+	def record(self, x, f, times):
+		'''
+		Parameters
+		x: array, input values
+		f: float, objective
+		times: lst, [total time, Aspen time, calculator time] in seconds, NaN if not measured
+		'''
+		
+		row = np.concatenate([[f], np.asarray(x, dtype = float), times])
+		
+		with self.lock:
+			with open(self.traceFile, 'ab') as fh:
+				row.tofile(fh)
+			self.nevals += 1
+		
+		
+class ResponseCube():
+	
+	def __init__(self, cubeFile, axes, outputs):
+		'''
+		Full-factorial response results stored as a memory-mapped float64 array of shape (# of outputs, # of 1st var 
+		values, ..., # of Nth var values) in cubeFile, NaN for grid points not simulated yet. Grid names and values are 
+		kept in a .json next to cubeFile, an existing cube of the same grid is reopened so finished points are kept.
+		
+		Parameters
+		cubeFile: str, .npy file
+		axes: lst of tuples, (var+unit, values) of each input variable
+		outputs: lst of str, output+unit
+		'''
+		
+		self.cubeFile = cubeFile
+		self.names = [name for name, _ in axes]
+		self.values = [np.asarray(values, dtype = float) for _, values in axes]
+		self.outputs = list(outputs)
+		self.shape = tuple(values.size for values in self.values)
+		
+		metaFile = os.path.splitext(cubeFile)[0] + '.json'
+		meta = {'names': self.names, 'values': [values.tolist() for values in self.values], 'outputs': self.outputs}
+		
+		if os.path.exists(cubeFile) and os.path.exists(metaFile):
+			with open(metaFile) as f:
+				if json.load(f) != meta:
+					raise ValueError('%s exists with a different grid' % cubeFile)
+			
+			self.data = np.load(cubeFile, mmap_mode = 'r+')
+		
+		else:
+			with open(metaFile, 'w') as f:
+				json.dump(meta, f)
+			
+			self.data = np.lib.format.open_memmap(cubeFile, mode = 'w+', dtype = np.float64, shape = (len(self.outputs),) + self.shape)
+			self.data[:] = np.nan
+			self.data.flush()
+		
+		
+	def done(self, pos):
+		'''
+		Parameters
+		pos: tuple, grid position
+		
+		Returns
+		ifDone: bool, whether all outputs at pos are simulated
+		'''
+		
+		return not np.isnan(self.data[(slice(None),) + tuple(pos)]).any()
+		
+		
+	def set(self, pos, outputValues):
+		'''
+		Parameters
+		pos: tuple, grid position
+		outputValues: array, values of outputs
+		'''
+		
+		self.data[(slice(None),) + tuple(pos)] = outputValues
+		self.data.flush()
+		
+		
+	def plane(self, output, xAxis, yAxis, fixed = None):
+		'''
+		Parameters
+		output: str, output+unit
+		xAxis, yAxis: int, index of input variables in x and y axis
+		fixed: dict or None, keys are index of other input variables, values are their grid positions, 
+			   middle positions by default
+		
+		Returns
+		data: df, index are x var values, columns are y var values, index.name is 'xVar+unit,yVar+unit'
+		'''
+		
+		fixed = fixed or {}
+		sel = tuple(slice(None) if i in [xAxis, yAxis] else fixed.get(i, n//2) for i, n in enumerate(self.shape))
+		values = self.data[self.outputs.index(output)][sel]
+		if xAxis > yAxis:
+			values = values.T
+		
+		data = pd.DataFrame(values, index = self.values[xAxis], columns = self.values[yAxis])
+		data.index.name = ','.join([self.names[xAxis], self.names[yAxis]])
+		
+		return data
+		
+		
+	def frames(self):
+		'''
+		Returns
+		simResults: dict, keys are output+unit, values are df, index are 1st var values, columns are 2nd var values 
+					for 2 input variables or multiIndex with 2nd, ..., Nth var values, index.name is '1stVar+unit,...,NthVar+unit'
+		'''
+		
+		index = self.values[0]
+		if len(self.shape) == 2:
+			columns = self.values[1]
+		else:
+			columns = pd.MultiIndex.from_product(self.values[1:])
+		
+		simResults = {}
+		for output, values in zip(self.outputs, self.data):
+			outputData = pd.DataFrame(np.asarray(values).reshape(index.size, -1), index = index, columns = columns)
+			outputData.index.name = ','.join(self.names)
+			
+			simResults[output] = outputData
+		
+		return simResults
+		
+		
+def read_trace_rows(traceFile, nvars):
+	'''
+	Parameters
+	traceFile: str, binary trace file written by EvaluationRecorder
+	nvars: int, # of input variables
+	
+	Returns
+	rows: 2D array, rows are evaluations, columns are [f, x..., total time, Aspen time, calculator time]
+	'''
+	
+	ncols = nvars + 4
+	
+	values = np.fromfile(traceFile, dtype = np.float64)
+	rows = values[:values.size // ncols * ncols].reshape(-1, ncols)   # drops a row partially written on interruption
+	
+	return rows
+	
+	
+def process_ids(names):
+	'''
+	Parameters
+	names: lst of str, image names of processes in lower case, e.g. ['aspenplus.exe', 'apmain.exe']
+	
+	Returns
+	pids: set, ids of running processes with these image names, processes that cannot be opened are skipped
+	'''
+	
+	pids = set()
+	for pid in EnumProcesses():
+		try:
+			handle = OpenProcess(PROCESS_QUERY_INFORMATION | PROCESS_VM_READ, False, pid)
+		except WinError:
+			continue
+		
+		try:
+			if os.path.basename(GetModuleFileNameEx(handle, 0)).lower() in names:
+				pids.add(pid)
+		except WinError:
+			pass
+		finally:
+			CloseHandle(handle)
+	
+	return pids
+		
+		
 		
 		
 		
@@ -7,14 +7,13 @@ __date__ = '8/26/2020'
 __version__ = '1.3'
 
 
-import re
 import numpy as np
 import pandas as pd
-from pandas import IndexSlice as idx
-from itertools import product
+from itertools import combinations
 import seaborn as sns
 import matplotlib.pyplot as plt
 from mpl_toolkits import mplot3d
+from classes import read_trace_rows
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -31,6 +30,7 @@ def parse_config(configFile):
 			['Input', 'Path', 'Fortran', 'Distribution', 'Parameters', 'Size'] for sensitivity_AspenVars_con
 			['Input', 'Path', 'Fortran', 'Values'] for sensitivity_AspenVars_dis
 			['Input', 'Path', 'Range', 'Fortran'] for optimization_AspenVars
+			['Input', 'Location', 'Fortran', 'Baseline', 'Step'] for sensitivity_local, Step is optional
 			['Input', 'Unit', 'Location', 'Fortran', 'Distribution', 'Parameters', 'Size'] for response_hybrid
 			['Input', 'Unit', 'Location', 'Distribution', 'Parameters', 'Size'] for response_nonAspenVars
 			['Input', 'Unit', 'Location', 'Fortran', 'Distribution', 'Parameters', 'Size'] for response_AspenVars
@@ -46,13 +46,36 @@ def parse_config(configFile):
 	return inputs, outputs
 	
 	
-def save_simulation_results(results, outDir):
+def parse_handoff(configFile):
+	'''
+	Parameters
+	configFile: str, config file
+	
+	Returns
+	handoff: lst of tuples or None, (Aspen path, sheet!cell in calculator) from the optional Handoff sheet with 
+			 columns ['Path', 'Location'], None if config file has no Handoff sheet
+	'''
+	
+	if 'Handoff' not in pd.ExcelFile(configFile).sheet_names:
+		return None
+	
+	handoff = pd.read_excel(configFile, sheet_name = 'Handoff').dropna(how = 'all')
+	
+	
+	return list(handoff[['Path', 'Location']].itertuples(index = False, name = None))
+	
+	
+def save_simulation_results(results, outDir, inputValues = None):
 	'''
 	Parameters
 	results: df, colunms are output variables, index are runs
 	outDir: str, output directory
+	inputValues: df or None, columns are input variables, index are runs, if given, saved in front of outputs
 	'''
 	
+	if inputValues is not None:
+		results = pd.concat([inputValues, results], axis = 1)
+	
 	results.to_csv(outDir + '/sim_results.tsv', sep = '\t', index = False)
 	
 	
@@ -96,29 +119,73 @@ def save_optimization_results(results, outDir):
 	results.to_csv(outDir + '/opt_results.tsv', sep = '\t')
 	
 	
-def read_log(logFile, objName, varNames):
+def save_evaluations(evaluations, outDir):
+	'''
+	Parameters
+	evaluations: df, columns are inputs + outputs, index are evaluations
+	outDir: str, output directory
+	'''
+	
+	evaluations.to_csv(outDir + '/opt_evaluations.tsv', sep = '\t', index = False)
+	
+	
+def save_local_optima(localOptima, outDir):
+	'''
+	Parameters
+	localOptima: df, index are (output, start), columns are ['Objective'] + inputs + ['Evaluations', 'Pruned']
+	outDir: str, output directory
+	'''
+	
+	localOptima.to_csv(outDir + '/opt_local_optima.tsv', sep = '\t')
+	
+	
+def save_pareto_front(front, outDir):
+	'''
+	Parameters
+	front: df, columns are inputs + outputs, index are nondominated points
+	outDir: str, output directory
+	'''
+	
+	front.to_csv(outDir + '/pareto_front.tsv', sep = '\t', index = False)
+	
+	
+def plot_pareto_front(front, evaluations, objectives, outDir):
+	'''
+	Parameters
+	front: df, columns are inputs + outputs, index are nondominated points
+	evaluations: df, columns are inputs + outputs, index are all simulations
+	objectives: lst, two outputs to plot
+	outDir: str, output directory
+	'''
+	
+	xLabel, yLabel = objectives
+	
+	fig, ax = plt.subplots()
+	
+	ax.scatter(evaluations[xLabel], evaluations[yLabel], s = 10, color = 'lightgray', label = 'simulated')
+	ax.plot(front[xLabel], front[yLabel], marker = 'o', color = '#d62728', label = 'Pareto front')
+	
+	ax.set_xlabel(xLabel)
+	ax.set_ylabel(yLabel)
+	ax.legend()
+	
+	fig.savefig('%s/pareto_front_%s+%s.jpg' % (outDir, xLabel, yLabel), dpi = 300, bbox_inches = 'tight')
+	
+	
+def read_trace(traceFile, objName, varNames):
 	'''
 	Parameters:
-	logFile: str, log file of pybobyqa
+	traceFile: str, binary trace file written by EvaluationRecorder
 	objName: str, objective name
 	varNames: lst, variable names
 	
 	Returns:
-	points: df, columns are f, x, y, index are data points
+	points: df, columns are f, x, y, 'Total time', 'Aspen time', 'Calculator time', index are evaluations
 	'''
 	
-	points = []
-	with open(logFile) as f:
-		for line in f:
-		
-			if re.match(r'^Function eval', line):
-				f_str, xy_str = re.search(r'f = (.+) at x = \[(.+)\]', line).groups()
-				xy_str = xy_str.strip().split()
-				fxy_float = list(map(float, [f_str] + xy_str))
+	rows = read_trace_rows(traceFile, len(varNames))
 	
-				points.append(fxy_float)
-	
-	points = pd.DataFrame(points, columns = [objName] + varNames)
+	points = pd.DataFrame(rows, columns = [objName] + varNames + ['Total time', 'Aspen time', 'Calculator time'])
 	
 
 	return points
@@ -147,10 +214,10 @@ def plot_3D_1(data, outDir):
 	fig.savefig('%s/%s_%s+%s.jpg' % (outDir, zLabel, xLabel, yLabel), dpi = 300, bbox_inches = 'tight')	
 	
 
-def plot_optimization_results(logDir, outputs, inputs, outDir):
+def plot_optimization_results(traceDir, outputs, inputs, outDir):
 	'''
 	Parameters
-	logDir: str, directory of log file
+	traceDir: str, directory of trace files
 	outputs: lst, output objectives
 	inputs: lst, input variables
 	outDir: str, output directory
@@ -158,9 +225,96 @@ def plot_optimization_results(logDir, outputs, inputs, outDir):
 	
 	for output in outputs:
 		
-		points = read_log('%s/%s_opt.log' % (logDir, output), output, inputs)
+		points = read_trace('%s/%s_opt.trace' % (traceDir, output), output, inputs)
+	
+		plot_3D_1(points[[output] + inputs], outDir)
+	
+	
+def save_run_stats(runStats, outDir):
+	'''
+	Parameters
+	runStats: lst of dict, keys are ['Mode', 'Converged', 'Time (s)'], Mode is 'warm', 'cold' or 'fallback'
+	outDir: str, output directory
+	'''
+	
+	runStats = pd.DataFrame(runStats, columns = ['Mode', 'Converged', 'Time (s)'])
+	runStats.to_csv(outDir + '/aspen_run_stats.tsv', sep = '\t', index_label = 'Run')
+	
+	if not runStats.empty:
+		print('%s Aspen runs, %.1f%% converged on the warm path' % (runStats.shape[0], 100 * (runStats['Mode'] == 'warm').mean()))
+		print(runStats.groupby('Mode')['Time (s)'].agg(['count', 'mean']))
+	
+	
+def save_failures(failures, inputs, outDir):
+	'''
+	Parameters
+	failures: lst of dict, keys are ['Values', 'Reason', 'Attempts'], see SupervisedPool
+	inputs: lst of str, names of inputs
+	outDir: str, output directory
+	'''
+	
+	failures = pd.DataFrame([dict(zip(inputs, failure['Values']), Reason = failure['Reason'], Attempts = failure['Attempts']) 
+							 for failure in failures], columns = list(inputs) + ['Reason', 'Attempts'])
+	failures.to_csv(outDir + '/failed_points.tsv', sep = '\t', index = False)
+	
+	if not failures.empty:
+		print('%s points failed, see failed_points.tsv' % failures.shape[0])
+	
+	
+def save_skipped_points(skipped, inputs, savings, outDir):
+	'''
+	Parameters
+	skipped: lst of dict, keys are ['Values', 'Probability', 'Replacement'], see FeasibilityClassifier
+	inputs: lst of str, names of inputs
+	savings: float, estimated time saved in seconds
+	outDir: str, output directory
+	'''
 	
-		plot_3D_1(points, outDir)
+	rows = []
+	for point in skipped:
+		row = dict(zip(inputs, point['Values']), **{'Failure probability': point['Probability']})
+		if point['Replacement'] is not None:
+			row.update(zip(['%s (replacement)' % input for input in inputs], point['Replacement']))
+		rows.append(row)
+	
+	skipped = pd.DataFrame(rows, columns = list(inputs) + ['Failure probability'] + ['%s (replacement)' % input for input in inputs])
+	skipped.to_csv(outDir + '/skipped_points.tsv', sep = '\t', index = False)
+	
+	nreplaced = skipped['%s (replacement)' % inputs[0]].notna().sum() if inputs else 0
+	print('%s points predicted to fail, %s replaced, about %.0f s of failed solves saved, see skipped_points.tsv' % 
+		  (skipped.shape[0], nreplaced, savings))
+	
+	
+def save_fidelity_results(liteResults, fullRuns, errors, outDir):
+	'''
+	Parameters
+	liteResults: df, outputs of the lite model, colunms are output variables, index are runs
+	fullRuns: array, index of runs simulated with the full model
+	errors: df, index are outputs, columns are ['Lite RMSE', 'Corrected RMSE']
+	outDir: str, output directory
+	'''
+	
+	liteResults = liteResults.copy()
+	liteResults['Full run'] = liteResults.index.isin(fullRuns)
+	liteResults.to_csv(outDir + '/sim_results_lite.tsv', sep = '\t', index = False)
+	
+	errors.to_csv(outDir + '/fidelity_errors.tsv', sep = '\t', index_label = 'Output')
+	
+	print(errors.to_string())
+	
+	
+def save_tmp_usage(usage, outDir):
+	'''
+	Parameters
+	usage: dict, disk usage of temporary Aspen files, see TmpManager.usage
+	outDir: str, output directory
+	'''
+	
+	usage = pd.Series(usage, name = 'Value', dtype = object)
+	usage.to_csv(outDir + '/tmp_usage.tsv', sep = '\t', index_label = 'Item')
+	
+	print('temporary Aspen files: %d written (%.1f MB), %d kept (%.1f MB), %d retained (%.1f MB)' % 
+		  (usage['Files written'], usage['MB written'], usage['Tmp files'], usage['Tmp MB'], usage['Retained files'], usage['Retained MB']))
 	
 	
 def save_response_results(simResults, outDir):
@@ -211,6 +365,48 @@ def plot_hybrid_response(simResults, outDir):
 		plt.savefig('%s/%s_contour.jpg' % (outDir, zLabel.split()[0]), dpi = 300, bbox_inches = 'tight')
 		
 
+def save_adaptive_response(points, outDir):
+	'''
+	Parameters
+	points: df, columns are 2 inputs + outputs, rows are scattered simulated points
+	outDir: str, output directory
+	'''
+	
+	points.to_csv(outDir + '/adaptive_res_results.tsv', sep = '\t', index = False)
+	
+	
+def plot_adaptive_response(points, outDir):
+	'''
+	Parameters
+	points: df, columns are 2 inputs + outputs, rows are scattered simulated points, 1st input in x axis, 2nd input in y axis
+	outDir: str, output directory
+	'''
+	
+	xLabel, yLabel, *outputs = points.columns
+	
+	for output in outputs:
+		data = points[[xLabel, yLabel, output]].dropna()
+		x, y, Z = data.values.T
+		
+		
+		plt.figure()
+		
+		ctf = plt.tricontourf(x, y, Z, 50, cmap = plt.cm.get_cmap('RdBu').reversed())
+		plt.scatter(x, y, s = 3, color = 'k', alpha = 0.5)
+		
+		plt.xlabel(xLabel)
+		plt.ylabel(yLabel)
+		
+		cbar = plt.colorbar(ctf)
+		cbar.set_label(output, labelpad = 15, rotation = 270)
+		
+		if Z.max() - Z.min() > 0.001:	
+			ct = plt.tricontour(x, y, Z, ctf.levels[1::6], colors = 'dimgray', linewidths = 1, linestyles ='dashed')
+			plt.clabel(ct, ctf.levels[1::6], inline = True, fontsize = 7, colors = 'k')
+		
+		plt.savefig('%s/%s_adaptive_contour.jpg' % (outDir, output.split()[0]), dpi = 300, bbox_inches = 'tight')
+		
+		
 def plot_contour(output, data, outDir, suffix = ''):	
 	'''
 	Parameters
@@ -221,6 +417,7 @@ def plot_contour(output, data, outDir, suffix = ''):
 	'''
 	
 	xLabel, yLabel = data.index.name.split(',')
+	data = data.loc[~data.index.duplicated(), ~data.columns.duplicated()]   # repeated grid values are plotted once
 	x = data.index.astype(np.float)
 	y = data.columns.astype(np.float)
 	X, Y = np.meshgrid(x, y)
@@ -256,13 +453,10 @@ def plot_3D_2(output, data, outDir):
 	
 	xLabel, yLabel, zLabel = data.index.name.split(',')
 	
-	var1 = data.index
-	var2 = data.columns.levels[0]
-	var3 = data.columns.levels[1]
-
-	xyz = np.array(list(product(var1, var2, var3)))
+	# positional, rows of data in order of index and columns
+	xyz = np.array([(i, j, k) for i in data.index for j, k in data.columns])
 	x, y, z = xyz[:,0], xyz[:,1], xyz[:,2] 
-	values = [data.loc[idx[i], idx[j, k]] for i, j, k in zip(x, y, z)]
+	values = data.values.ravel()
 
 	
 	ax = plt.subplot(111, projection = '3d')
@@ -279,50 +473,62 @@ def plot_3D_2(output, data, outDir):
 	plt.savefig('%s/%s_3D.jpg' % (outDir, output.split()[0]), dpi = 300, bbox_inches = 'tight')
 	
 	
-def plot_aspenVar_or_nonAspenVar_response(simResults, outDir):
+def plot_response_cube(cube, outDir):
 	'''
+	Contours of every pair of input variables with other variables at their middle values, 3D scatter for 3 input variables
+	
 	Parameters
-	simResults: dict, keys are 'output+unit', values are df,
-	for 2 input variables, index are 1st var values, columns are 2nd var values, index.name is '1stVar+unit,2ndVar+unit'
-	for 2 input variables, index are 1st var values, columns are multiIndex with 2nd and 3rd var values, index.name is '1stVar+unit,2ndVar+unit,3rdVar+unit'
+	cube: instance of ResponseCube class
 	outDir: str, output directory
 	'''
 	
-	for output, data in simResults.items():
+	nvars = len(cube.shape)
+	
+	for output in cube.outputs:
+		
+		if nvars == 2:
+			plot_contour(output, cube.plane(output, 0, 1), outDir)
+			continue
+		
+		if nvars == 3:
+			plot_3D_2(output, cube.frames()[output], outDir)
+		
+		for xAxis, yAxis in combinations(range(nvars), 2):
+			plot_contour(output, cube.plane(output, xAxis, yAxis), outDir, '%s+%s' % (cube.names[xAxis], cube.names[yAxis]))
+	
+	
+def save_local_sensitivity(gradients, elasticities, outDir):
+	'''
+	Parameters
+	gradients: df, index are inputs, columns are outputs
+	elasticities: df, index are inputs, columns are outputs
+	outDir: str, output directory
+	'''
+	
+	gradients.to_csv(outDir + '/local_gradients.tsv', sep = '\t')
+	elasticities.to_csv(outDir + '/local_elasticities.tsv', sep = '\t')
+	
+	
+def plot_elasticities(elasticities, outDir):
+	'''
+	Parameters
+	elasticities: df, index are inputs, columns are outputs
+	outDir: str, output directory
+	'''
+	
+	for output in elasticities.columns:
+		data = elasticities[output].reindex(elasticities[output].abs().sort_values().index)
+		
+		fig, ax = plt.subplots(figsize = (6, max(3, 0.25*data.size)))
+		
+		ax.barh(np.arange(data.size), data.values, color = np.where(data.values > 0, '#d62728', '#1f77b4'))
+		ax.axvline(0, color = 'gray', linewidth = 0.8)
+		
+		ax.set_yticks(np.arange(data.size))
+		ax.set_yticklabels(data.index, size = 7)
+		ax.set_xlabel('Elasticity of %s' % output)
 		
-		if isinstance(data.columns, pd.MultiIndex):
-			
-			# plot 3D
-			plot_3D_2(output, data, outDir)
-			
-			# plot three contours
-			xLabel, yLabel, zLabel = data.index.name.split(',')
-			
-			var1 = data.index
-			var2 = data.columns.levels[0]
-			var3 = data.columns.levels[1]
-			
-			var1mid = var1[var1.size//2]
-			var2mid = var2[var2.size//2]
-			var3mid = var3[var3.size//2]
-			
-			data12 = data.loc[idx[:], idx[:, var3mid]].copy()
-			data12.columns = data12.columns.levels[0]
-			data12.index.name = ','.join([xLabel, yLabel])
-			
-			data13 = data.loc[idx[:], idx[var2mid, :]].copy()
-			data13.columns = data13.columns.levels[1]
-			data13.index.name = ','.join([xLabel, zLabel])
-			
-			data23 = data.loc[idx[var1mid], idx[:, :]].copy().unstack()
-			data23.index.name = ','.join([yLabel, zLabel])
-			
-			plot_contour(output, data12, outDir, '%s+%s' % (xLabel, yLabel))
-			plot_contour(output, data13, outDir, '%s+%s' % (xLabel, zLabel))
-			plot_contour(output, data23, outDir, '%s+%s' % (yLabel, zLabel))
-			
-		else:
-			plot_contour(output, data, outDir)
+		fig.savefig('%s/%s_elasticities.jpg' % (outDir, output), dpi = 300, bbox_inches = 'tight')
 	
 	
 def save_margins(margins, outDir):
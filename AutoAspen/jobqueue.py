@@ -0,0 +1,405 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+r'''
+Durable job queue of design points in a SQLite file, shared by workers on several hosts. A job is a point of a study,
+its task is {"inputs": [[location, ifFortran], ...], "values": [...], "outputs": [sheet!cell, ...]}, the same as tasks
+of SimulationPool, so points of any AutoAspen or AutoAspen2 study can be queued.
+
+Workers lease jobs for leaseSeconds and renew leases by heartbeats while running them. Leases not renewed in time are
+re-queued by the next lease call, and a job is failed after maxRetries expired or failed attempts. Results go to the
+results table. All changes are made in immediate transactions, so the file can be on a shared path; it is left in the
+default rollback journal mode, as the WAL mode does not work over network file systems.
+
+Tables
+jobs       id, study, key, task, status ('pending', 'leased', 'done' or 'failed'), worker, expires, attempts, reason
+results    job, study, key, outputs (JSON list, NaN for failed outputs), worker, seconds, finished
+'''
+
+
+import json
+import time
+import sqlite3
+import numpy as np
+import pandas as pd
+from threading import Thread, Event
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	study TEXT NOT NULL,
+	key TEXT NOT NULL,
+	task TEXT NOT NULL,
+	status TEXT NOT NULL DEFAULT 'pending',
+	worker TEXT,
+	expires REAL,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	reason TEXT,
+	UNIQUE (study, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS results (
+	job INTEGER PRIMARY KEY,
+	study TEXT NOT NULL,
+	key TEXT NOT NULL,
+	outputs TEXT NOT NULL,
+	worker TEXT,
+	seconds REAL,
+	finished REAL
+);
+'''
+
+
+class JobQueue():
+
+	def __init__(self, dbFile, leaseSeconds = 600, maxRetries = 2):
+		'''
+		Parameters
+		dbFile: str, SQLite file, created if not existing
+		leaseSeconds: float, seconds a lease lasts without heartbeat
+		maxRetries: int, # of retries of a job after its lease expired or it failed
+		'''
+
+		self.dbFile = dbFile
+		self.leaseSeconds = leaseSeconds
+		self.maxRetries = maxRetries
+
+		with self.connect() as conn:
+			conn.executescript(SCHEMA)
+
+
+	def connect(self):
+		'''
+		Returns
+		conn: Connection, autocommit, transactions are begun explicitly, one per call so threads do not share it
+		'''
+
+		return _Connection(self.dbFile)
+
+
+	def add_jobs(self, study, tasks, keys = None):
+		'''
+		Parameters
+		study: str, study name
+		tasks: lst of dict, keys are ['inputs', 'values', 'outputs']
+		keys: lst of str or None, keys of jobs in study, jobs with existing keys are not added again, the JSON of
+			  task by default so the same point is simulated once
+
+		Returns
+		ids: lst of int, ids of jobs in order of tasks
+		'''
+
+		texts = [json.dumps(task) for task in tasks]
+		keys = texts if keys is None else [str(key) for key in keys]
+
+		with self.connect() as conn:
+			conn.execute('BEGIN IMMEDIATE')
+			conn.executemany('INSERT OR IGNORE INTO jobs (study, key, task) VALUES (?, ?, ?)',
+							 [(study, key, text) for key, text in zip(keys, texts)])
+			ids = dict(conn.execute('SELECT key, id FROM jobs WHERE study = ?', (study,)).fetchall())
+			conn.execute('COMMIT')
+
+		return [ids[key] for key in keys]
+
+
+	def lease(self, worker, study = None):
+		'''
+		Parameters
+		worker: str, worker name, e.g. host:pid
+		study: str or None, leases jobs of study only if given
+
+		Returns
+		job: tuple or None, (id, task), None if no job is pending
+		'''
+
+		now = time.time()
+
+		with self.connect() as conn:
+			conn.execute('BEGIN IMMEDIATE')
+
+			conn.execute('''UPDATE jobs SET status = CASE WHEN attempts + 1 > ? THEN 'failed' ELSE 'pending' END,
+							attempts = attempts + 1, worker = NULL, reason = 'lease of ' || worker || ' expired'
+							WHERE status = 'leased' AND expires < ?''', (self.maxRetries, now))
+
+			if study is None:
+				row = conn.execute("SELECT id, task FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+			else:
+				row = conn.execute("SELECT id, task FROM jobs WHERE status = 'pending' AND study = ? ORDER BY id LIMIT 1",
+								   (study,)).fetchone()
+
+			if row is not None:
+				conn.execute("UPDATE jobs SET status = 'leased', worker = ?, expires = ? WHERE id = ?",
+							 (worker, now + self.leaseSeconds, row[0]))
+
+			conn.execute('COMMIT')
+
+		return None if row is None else (row[0], json.loads(row[1]))
+
+
+	def heartbeat(self, jobId, worker):
+		'''
+		Parameters
+		jobId: int, id of leased job
+		worker: str, worker name
+
+		Returns
+		ifHeld: bool, whether the lease is still held by worker and was renewed
+		'''
+
+		with self.connect() as conn:
+			cursor = conn.execute("UPDATE jobs SET expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+								  (time.time() + self.leaseSeconds, jobId, worker))
+
+		return cursor.rowcount == 1
+
+
+	def complete(self, jobId, worker, outputValues, seconds):
+		'''
+		Results are kept even if the lease expired meanwhile, unless another worker finished the job first
+
+		Parameters
+		jobId: int, id of leased job
+		worker: str, worker name
+		outputValues: array, values of outputs
+		seconds: float, time of the run
+		'''
+
+		with self.connect() as conn:
+			conn.execute('BEGIN IMMEDIATE')
+
+			row = conn.execute('SELECT study, key, status FROM jobs WHERE id = ?', (jobId,)).fetchone()
+			if row is not None and row[2] != 'done':
+				conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+							 (jobId, row[0], row[1], json.dumps(list(map(float, outputValues))), worker, seconds, time.time()))
+				conn.execute("UPDATE jobs SET status = 'done', worker = ?, expires = NULL WHERE id = ?", (worker, jobId))
+
+			conn.execute('COMMIT')
+
+
+	def fail(self, jobId, worker, reason):
+		'''
+		Parameters
+		jobId: int, id of leased job
+		worker: str, worker name
+		reason: str, reason of failure, the job is re-queued unless it failed maxRetries times
+		'''
+
+		with self.connect() as conn:
+			conn.execute('''UPDATE jobs SET status = CASE WHEN attempts + 1 > ? THEN 'failed' ELSE 'pending' END,
+							attempts = attempts + 1, worker = NULL, expires = NULL, reason = ?
+							WHERE id = ? AND worker = ? AND status = 'leased' ''', (self.maxRetries, reason, jobId, worker))
+
+
+	def collect(self, ids):
+		'''
+		Parameters
+		ids: lst of int, ids of jobs
+
+		Returns
+		finished: dict, keys are ids of done or failed jobs, values are (array of output values or None, reason, attempts)
+		'''
+
+		finished = {}
+		with self.connect() as conn:
+			for start in range(0, len(ids), 500):
+				chunk = list(ids[start:start+500])
+				marks = ','.join('?' * len(chunk))
+				rows = conn.execute('''SELECT jobs.id, jobs.status, results.outputs, jobs.reason, jobs.attempts FROM jobs
+									   LEFT JOIN results ON results.job = jobs.id
+									   WHERE jobs.id IN (%s) AND jobs.status IN ('done', 'failed')''' % marks, chunk).fetchall()
+
+				for jobId, status, outputs, reason, attempts in rows:
+					outputValues = np.array(json.loads(outputs), dtype = float) if status == 'done' else None
+					finished[jobId] = (outputValues, reason, attempts)
+
+		return finished
+
+
+	def progress(self, study = None):
+		'''
+		Parameters
+		study: str or None, all studies if None
+
+		Returns
+		counts: ser, index are status, values are # of jobs
+		'''
+
+		with self.connect() as conn:
+			if study is None:
+				rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+			else:
+				rows = conn.execute('SELECT status, COUNT(*) FROM jobs WHERE study = ? GROUP BY status', (study,)).fetchall()
+
+		return pd.Series(dict(rows), dtype = int).reindex(['pending', 'leased', 'done', 'failed'], fill_value = 0)
+
+
+class _Connection():
+
+	def __init__(self, dbFile):
+
+		self.conn = sqlite3.connect(dbFile, timeout = 120, isolation_level = None)
+
+
+	def __enter__(self):
+
+		return self.conn
+
+
+	def __exit__(self, excType, exc, tb):
+
+		if excType is not None and self.conn.in_transaction:
+			self.conn.execute('ROLLBACK')
+		self.conn.close()
+
+
+class QueuePool():
+
+	def __init__(self, queue, study, pollSeconds = 5):
+		'''
+		Same interface as SimulationPool, points are added to queue and simulated by workers on any host running
+		queue_worker.py, results are polled every pollSeconds
+
+		Parameters
+		queue: instance of JobQueue class
+		study: str, study name, points already queued in study are not simulated again
+		pollSeconds: float, seconds between polls of results
+		'''
+
+		self.queue = queue
+		self.study = study
+		self.pollSeconds = pollSeconds
+
+		self.failures = []   # lst of dict, keys are ['Values', 'Reason', 'Attempts']
+
+
+	def simulate(self, inputs, values, outputs):
+		'''
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		values: array, values of inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+
+		Returns
+		outputValues: array, values of outputs, NaN if the point failed
+		'''
+
+		return self.simulate_batch(inputs, [values], outputs)[0]
+
+
+	def simulate_batch(self, inputs, valuesList, outputs):
+		'''
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		valuesList: 2D array, rows are runs, columns are inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+
+		Returns
+		outputValues: 2D array, rows are runs, columns are outputs, NaN for failed runs
+		'''
+
+		inputs = [[location, int(ifFortran)] for location, ifFortran in inputs]
+		tasks = [{'inputs': inputs, 'values': list(map(float, values)), 'outputs': list(outputs)} for values in valuesList]
+		ids = self.queue.add_jobs(self.study, tasks)
+
+		finished = {}
+		while True:
+			finished.update(self.queue.collect([jobId for jobId in ids if jobId not in finished]))
+			if len(finished) == len(set(ids)):
+				break
+
+			time.sleep(self.pollSeconds)
+
+		results = []
+		for jobId, task in zip(ids, tasks):
+			outputValues, reason, attempts = finished[jobId]
+			if outputValues is None:
+				self.failures.append({'Values': task['values'], 'Reason': reason, 'Attempts': attempts})
+				outputValues = np.full(len(outputs), np.nan)
+			results.append(outputValues)
+
+		return np.array(results)
+
+
+	def simulate_group(self, inputs, valuesList, outputs):
+		'''
+		Same as simulate_batch, runs are queued separately as workers on other hosts do not share Aspen solves
+
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		valuesList: 2D array, rows are runs sharing values of Aspen inputs, columns are inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+
+		Returns
+		outputValues: 2D array, rows are runs, columns are outputs, NaN for failed runs
+		'''
+
+		return self.simulate_batch(inputs, valuesList, outputs)
+
+
+	def close(self):
+
+		pass
+
+
+def run_worker(queue, worker, simulate, study, idleSeconds = 60, pollSeconds = 5):
+	'''
+	Leases jobs and runs them with simulate until no job is pending for idleSeconds. The lease is renewed by a
+	heartbeat thread every third of its duration while simulate runs.
+
+	Parameters
+	queue: instance of JobQueue class
+	worker: str, worker name, e.g. host:pid
+	simulate: function, called with inputs, values and outputs of a task, returns values of outputs
+	study: str, works on jobs of study only, the one queued for the model simulate runs
+	idleSeconds: float, seconds without pending jobs before returning, never returns if None
+	pollSeconds: float, seconds between polls for jobs when idle
+
+	Returns
+	njobs: int, # of jobs run
+	'''
+
+	njobs = 0
+	idleSince = time.time()
+	while True:
+		job = queue.lease(worker, study)
+
+		if job is None:
+			if idleSeconds is not None and time.time() - idleSince > idleSeconds:
+				return njobs
+			time.sleep(pollSeconds)
+			continue
+
+		jobId, task = job
+
+		stop = Event()
+		def beat():
+			while not stop.wait(queue.leaseSeconds / 3):
+				if not queue.heartbeat(jobId, worker):
+					return
+
+		heart = Thread(target = beat, daemon = True)
+		heart.start()
+
+		t0 = time.time()
+		try:
+			outputValues = simulate([tuple(item) for item in task['inputs']], task['values'], task['outputs'])
+
+		except Exception as e:
+			queue.fail(jobId, worker, '%s: %s' % (type(e).__name__, e))
+
+		else:
+			queue.complete(jobId, worker, outputValues, time.time() - t0)
+
+		finally:
+			stop.set()
+			heart.join()
+
+		njobs += 1
+		idleSince = time.time()
@@ -8,10 +8,20 @@ __version__ = '1.0'
 
 
 r'''
-This script optimizes outputs and get optimal inputs
+This script optimizes outputs and get optimal inputs. With -k, BOBYQA is started from k space-filling points 
+running on parallel Aspen/Excel workers, and local optima of all starts are saved as well. With -s, a quadratic surrogate 
+(optionally on top of trained regression models given by -r) is optimized in a trust region and only its candidate 
+optima are verified in Aspen. With -m, all outputs are optimized together by NSGA-II and the Pareto front is saved, 
+outputs are minimized unless column Sense of Outputs sheet is max
 
 Example
 python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\optimization_AspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Sugars\opt -c C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\opt_config.xlsx -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm
+
+python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\optimization_AspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Sugars\opt -c C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\opt_config.xlsx -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm -k 4
+
+python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\optimization_AspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Sugars\opt -c C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\opt_config.xlsx -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm -s -w 3
+
+python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\optimization_AspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Sugars\opt -c C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\opt_config.xlsx -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm -m -w 4
 '''
 
 
@@ -19,9 +29,11 @@ python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\optimization_
 
 import argparse
 import os
-from i_o import parse_config, save_optimization_results, plot_optimization_results
-from classes import Aspen, Excel
-from utilities import optimize
+from i_o import (parse_config, save_optimization_results, save_local_optima, save_evaluations, plot_optimization_results, 
+				 save_pareto_front, plot_pareto_front, save_tmp_usage, save_failures)
+from classes import Aspen, Excel, EvaluationStore, TmpManager, Recycler, RuntimeModel
+from parallel import open_pool
+from utilities import optimize, optimize_multistart, optimize_surrogate, optimize_pareto
 
 
 
@@ -33,12 +45,44 @@ if __name__ == '__main__':
 	parser.add_argument('-c', '--configFile', type = str, required = True, help = 'config file, .xlsx')
 	parser.add_argument('-a', '--aspenFile', type = str, required = True, help = 'Aspen model file, .bkp')
 	parser.add_argument('-e', '--calculatorFile', type = str, required = True, help = 'excel calculator file, .xlsm')
+	parser.add_argument('-k', '--nstarts', type = int, required = False, help = '# of BOBYQA starts for multistart optimization')
+	parser.add_argument('-s', '--surrogate', action = 'store_true', help = 'whether to optimize a surrogate and verify its optima in Aspen')
+	parser.add_argument('-r', '--regressionModels', type = str, nargs = '+', required = False, help = 'trained regression models (.mod) used by -s, in the order of outputs in config file')
+	parser.add_argument('-m', '--multiobjective', action = 'store_true', help = 'whether to optimize all outputs together and save the Pareto front')
+	parser.add_argument('-p', '--resume', action = 'store_true', help = 'whether to resume an interrupted optimization by replaying recorded evaluations, without -k or -s')
+	parser.add_argument('-w', '--nworkers', type = int, required = False, help = '# of Aspen/Excel workers for -k, -s or -m, default as many as starts for -k and 1 otherwise')
+	parser.add_argument('-u', '--tmpDir', type = str, required = False, help = 'directory of temporary .bkp files, can be on a RAM disk, outDir/tmp by default')
+	parser.add_argument('-x', '--keepTmp', type = int, required = False, help = '# of most recent temporary .bkp files kept (by each worker), all kept by default, .bkp files of failed runs and optima are retained in outDir/retained without -k, -s or -m')
+	parser.add_argument('-g', '--gzipTmp', action = 'store_true', help = 'whether retained .bkp files are gzipped in background')
+	parser.add_argument('-q', '--timeouts', type = float, nargs = 2, required = False, help = 'seconds allowed for Aspen and calculator of one run with -k, -s or -m, if given, hung or crashed workers are killed and restarted and runs retried')
+	parser.add_argument('-j', '--maxRetries', type = int, required = False, default = 2, help = '# of retries of a run with -q, failed runs are NaN and listed in failed_points.tsv')
+	parser.add_argument('-t', '--timingFile', type = str, required = False, help = 'file of run times (.tsv) for -k, -s or -m, created if not existing, if given, runs are dispatched longest expected first and the ETA is printed')
+	parser.add_argument('-n', '--recycleEvery', type = int, required = False, help = '# of runs after which Aspen and Excel (of a worker) are replaced by fresh instances')
+	parser.add_argument('-l', '--maxMemory', type = float, required = False, help = 'memory limit of Excel in MB above which Aspen and Excel are replaced by fresh instances, for workers only with -q')
 	args = parser.parse_args()
 	
 	outDir = args.outDir
 	configFile = args.configFile
 	aspenFile = args.aspenFile
 	calculatorFile = args.calculatorFile
+	nstarts = args.nstarts
+	surrogate = args.surrogate
+	multiobjective = args.multiobjective
+	regressionModels = args.regressionModels or []
+	resume = args.resume
+	nworkers = args.nworkers or nstarts or 1
+	mode = 'pareto' if multiobjective else 'surrogate' if surrogate else 'multistart' if nstarts else 'bobyqa'
+	
+	tmpDir = args.tmpDir or outDir + '/tmp'
+	keepTmp = args.keepTmp
+	gzipTmp = args.gzipTmp
+	
+	timeouts = args.timeouts
+	maxRetries = args.maxRetries
+	
+	recycleEvery = args.recycleEvery
+	maxMemory = args.maxMemory
+	timingFile = args.timingFile
 	
 	os.makedirs(outDir, exist_ok = True)
 	
@@ -47,23 +91,86 @@ if __name__ == '__main__':
 	inputInfos, outputInfos = parse_config(configFile)
 	
 	
-	# optimize
-	try:
-		aspenModel = Aspen(aspenFile)
-		calculator = Excel(calculatorFile)
+	# optimize, simulations are shared by all outputs
+	store = EvaluationStore(inputInfos['Input'], outputInfos['Output'])
+	runtimeModel = RuntimeModel(inputInfos['Path'].tolist(), timingFile) if timingFile else None
+	
+	if mode == 'pareto':
+		try:
+			simPool = open_pool(aspenFile, calculatorFile, outDir, nworkers, tmpDir, keepTmp, timeouts, maxRetries, recycleEvery, maxMemory, 
+								runtimeModel)
+			
+			front = optimize_pareto(inputInfos, outputInfos, simPool, store = store)
+		
+		finally:
+			simPool.close()
+	
+	elif mode == 'surrogate':
+		from joblib import load
+		models = dict(zip(outputInfos['Output'], map(load, regressionModels)))
+		
+		try:
+			simPool = open_pool(aspenFile, calculatorFile, outDir, nworkers, tmpDir, keepTmp, timeouts, maxRetries, recycleEvery, maxMemory, 
+								runtimeModel)
+			
+			solutions = optimize_surrogate(inputInfos, outputInfos, simPool, outDir, models, store = store)
+		
+		finally:
+			simPool.close()
+	
+	elif mode == 'multistart':
+		try:
+			simPool = open_pool(aspenFile, calculatorFile, outDir, nworkers, tmpDir, keepTmp, timeouts, maxRetries, recycleEvery, maxMemory, 
+								runtimeModel)
+			
+			solutions, localOptima = optimize_multistart(inputInfos, outputInfos, simPool, outDir, nstarts, store = store)
+		
+		finally:
+			simPool.close()
+	
+	else:
+		try:
+			aspenModel = Aspen(aspenFile)
+			calculator = Excel(calculatorFile)
+			tmp = TmpManager(tmpDir, outDir + '/retained', keepTmp, gzipTmp)
+			
+			recycler = None
+			if recycleEvery or maxMemory:
+				recycler = Recycler(aspenModel, calculator, recycleEvery, maxMemory)
+		
+			solutions = optimize(inputInfos, outputInfos, aspenModel, calculator, outDir, store = store, resume = resume, tmp = tmp, 
+								 recycler = recycler)
+			
+			tmp.close()
+			save_tmp_usage(tmp.usage(), outDir)
+		
+		finally:
+			if recycler is not None:
+				recycler.close()
+			aspenModel.close()
+			calculator.close()
 	
-		solutions = optimize(inputInfos, outputInfos, aspenModel, calculator, outDir)
 	
-	finally:
-		aspenModel.close()
-		calculator.close()
+	# save and plot results 
+	save_evaluations(store.to_frame(), outDir)
 	
+	if mode != 'bobyqa' and timeouts:
+		save_failures(simPool.failures, inputInfos['Input'], outDir)
 	
-	# save and plot results 
-	save_optimization_results(solutions, outDir)
+	if mode == 'pareto':
+		save_pareto_front(front, outDir)
+		
+		if outputInfos.shape[0] == 2:   # plot if 2 objectives
+			plot_pareto_front(front, store.to_frame(), outputInfos['Output'].tolist(), outDir)
+	
+	else:
+		save_optimization_results(solutions, outDir)
+	
+	if mode == 'multistart':
+		save_local_optima(localOptima, outDir)
 	
-	if solutions.columns.size == 3:   # plot if 2 inputs
-		plot_optimization_results(outDir, solutions.index.tolist(), solutions.columns.tolist()[1:], outDir)
+	if mode != 'pareto' and inputInfos.shape[0] == 2:   # plot if 2 inputs
+		plot_optimization_results(outDir, outputInfos['Output'].tolist(), inputInfos['Input'].tolist(), outDir)
 	
 	
 	
@@ -0,0 +1,907 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+import os
+import re
+import time
+import subprocess
+import traceback
+import numpy as np
+from collections import deque
+from concurrent.futures import Future
+from threading import Thread, Lock
+from multiprocessing import Pool, Process, Queue, Semaphore
+from queue import Empty
+from multiprocessing.util import Finalize
+from classes import Aspen, Excel, TmpManager, process_ids
+
+
+ASPEN_SERVERS = ['aspenplus.exe', 'apmain.exe']
+
+
+_worker = {}
+
+
+def _init_worker(aspenFile, calculatorFile, tmpRoot, keep, retainRoot):
+	'''
+	Parameters
+	aspenFile: str, Aspen model file
+	calculatorFile: str, excel calculator file
+	tmpRoot: str, directory of temporary Aspen files, each worker uses its own subdirectory
+	keep: int or None, # of most recent temporary Aspen files kept by each worker, all files are kept if None
+	retainRoot: str, directory of retained Aspen files on disk, each worker uses its own subdirectory
+	'''
+
+	_worker['aspenModel'] = Aspen(aspenFile)
+	_worker['calculator'] = Excel(calculatorFile)
+	_worker['tmp'] = TmpManager('%s/worker%s' % (tmpRoot, os.getpid()), '%s/worker%s' % (retainRoot, os.getpid()), keep)
+
+	Finalize(None, _close_worker, exitpriority = 10)
+
+
+def _close_worker():
+
+	_worker['aspenModel'].close()
+	_worker['calculator'].quit()
+
+
+def _run_group(aspenModel, calculator, tmp, inputs, valuesList, outputs, report = None):
+	'''
+	Runs share values of Aspen inputs, Aspen is solved once with those of the first run and calculator is run for each
+
+	Parameters
+	aspenModel: instance of Aspen class
+	calculator: instance of Excel class
+	tmp: instance of TmpManager class
+	inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+	valuesList: 2D array, rows are runs, columns are inputs
+	outputs: lst of str, sheet!cell of outputs in calculator
+	report: function or None, called with 'aspen' and 'calculator' when a stage starts
+
+	Returns
+	outputValues: 2D array, rows are runs, columns are outputs
+	'''
+
+	report = report or (lambda stage: None)
+
+	# set ASPEN model variables
+	for (location, ifFortran), value in zip(inputs, valuesList[0]):
+		if re.search(r'\\', location):
+			aspenModel.set_value(location, value, bool(ifFortran), verbose = False)
+
+	# run ASPEN model
+	report('aspen')
+	aspenModel.run_model()
+
+	tmpFile = tmp.new_file()
+	aspenModel.save_model(tmpFile)
+	tmp.done(tmpFile, failed = not aspenModel.converged)
+
+	# run excel calculator
+	outputValues = []
+	for values in valuesList:
+		report('calculator')
+		for (location, _), value in zip(inputs, values):
+			if not re.search(r'\\', location):
+				sheet, cell = location.split('!')
+				calculator.set_cell(value, sheet, loc = cell)
+
+		calculator.load_aspenModel(tmpFile)
+		calculator.run_macro('solvedcfror')
+
+		runValues = []
+		for output in outputs:
+			sheet, cell = output.split('!')
+			runValues.append(calculator.get_cell(sheet, loc = cell))
+		outputValues.append(runValues)
+
+	return np.array(outputValues, dtype = float)
+
+
+def _run_point(aspenModel, calculator, tmp, inputs, values, outputs, report = None):
+	'''
+	Parameters
+	aspenModel: instance of Aspen class
+	calculator: instance of Excel class
+	tmp: instance of TmpManager class
+	inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+	values: array, values of inputs
+	outputs: lst of str, sheet!cell of outputs in calculator
+	report: function or None, called with 'aspen' and 'calculator' when the stage starts
+
+	Returns
+	outputValues: array, values of outputs
+	'''
+
+	return _run_group(aspenModel, calculator, tmp, inputs, [values], outputs, report)[0]
+
+
+def _simulate(inputs, values, outputs):
+	'''
+	Parameters
+	inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+	values: array, values of inputs
+	outputs: lst of str, sheet!cell of outputs in calculator
+
+	Returns
+	outputValues: array, values of outputs
+	'''
+
+	return _run_point(_worker['aspenModel'], _worker['calculator'], _worker['tmp'], inputs, values, outputs)
+
+
+def _simulate_group(inputs, valuesList, outputs):
+	'''
+	Parameters
+	inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+	valuesList: 2D array, rows are runs sharing values of Aspen inputs, columns are inputs
+	outputs: lst of str, sheet!cell of outputs in calculator
+
+	Returns
+	outputValues: 2D array, rows are runs, columns are outputs
+	'''
+
+	return _run_group(_worker['aspenModel'], _worker['calculator'], _worker['tmp'], inputs, valuesList, outputs)
+
+
+def _simulate_timed(task):
+	'''
+	Parameters
+	task: tuple, (index of run, inputs, values, outputs), see _simulate
+
+	Returns
+	i: int, index of run
+	outputValues: array, values of outputs
+	seconds: float, time of the run
+	'''
+
+	i, inputs, values, outputs = task
+
+	t0 = time.time()
+	outputValues = _simulate(inputs, values, outputs)
+
+	return i, outputValues, time.time() - t0
+
+
+def _format_seconds(seconds):
+	'''
+	Parameters
+	seconds: float
+
+	Returns
+	text: str, h:mm:ss, '?' if seconds is NaN
+	'''
+
+	if np.isnan(seconds):
+		return '?'
+
+	seconds = int(round(seconds))
+
+	return '%d:%02d:%02d' % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+class SimulationPool():
+
+	def __init__(self, aspenFile, calculatorFile, outDir, nworkers, tmpRoot = None, keep = None, recycleEvery = None, runtimeModel = None, 
+				 retainRoot = None):
+		'''
+		Parameters
+		aspenFile: str, Aspen model file
+		calculatorFile: str, excel calculator file
+		outDir: str, output directory
+		nworkers: int, # of worker processes, each with its own Aspen and Excel instances
+		tmpRoot: str or None, directory of temporary Aspen files, outDir/tmp by default
+		keep: int or None, # of most recent temporary Aspen files kept by each worker, all files are kept if None
+		recycleEvery: int or None, # of runs after which a worker is replaced by a new one with fresh Aspen and Excel
+		runtimeModel: instance of RuntimeModel class or None, if given, runs of a batch are dispatched longest expected 
+					  first, timings are recorded and the ETA is printed as runs finish
+		retainRoot: str or None, directory of Aspen files retained from failed runs, outDir/retained by default, 
+					should be on disk if tmpRoot is not
+		'''
+
+		self.nworkers = nworkers
+		self.runtimeModel = runtimeModel
+		self.pool = Pool(nworkers, initializer = _init_worker, 
+						 initargs = (aspenFile, calculatorFile, tmpRoot or outDir + '/tmp', keep, retainRoot or outDir + '/retained'), 
+						 maxtasksperchild = recycleEvery)
+
+
+	def simulate(self, inputs, values, outputs):
+		'''
+		Blocks until one worker finishes, can be called from several threads at the same time
+
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		values: array, values of inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+
+		Returns
+		outputValues: array, values of outputs
+		'''
+
+		return self.pool.apply(_simulate, (inputs, values, outputs))
+
+
+	def simulate_batch(self, inputs, valuesList, outputs):
+		'''
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		valuesList: 2D array, rows are runs, columns are inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+
+		Returns
+		outputValues: 2D array, rows are runs, columns are outputs
+		'''
+
+		if self.runtimeModel is None:
+			results = self.pool.starmap(_simulate, [(inputs, values, outputs) for values in valuesList], chunksize = 1)
+
+			return np.array(results)
+
+		# idle workers take the next run, so runs longest expected first keep workers busy until the end
+		predicted = self.runtimeModel.predict(valuesList)
+		order = np.argsort(-predicted, kind = 'stable') if not np.isnan(predicted).all() else np.arange(len(valuesList))
+
+		results = [None] * len(valuesList)
+		left = set(range(len(valuesList)))
+		for i, outputValues, seconds in self.pool.imap_unordered(_simulate_timed, [(i, inputs, valuesList[i], outputs) for i in order]):
+			results[i] = outputValues
+			left.discard(i)
+			self.runtimeModel.add(valuesList[i], seconds)
+
+			eta = self.runtimeModel.eta([valuesList[j] for j in left], self.nworkers)
+			print('%s runs done, %s left, ETA %s' % (len(results) - len(left), len(left), _format_seconds(eta)))
+
+		return np.array(results)
+
+
+	def simulate_group(self, inputs, valuesList, outputs):
+		'''
+		Blocks until the worker finishes, can be called from several threads at the same time
+
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		valuesList: 2D array, rows are runs sharing values of Aspen inputs, columns are inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+
+		Returns
+		outputValues: 2D array, rows are runs, columns are outputs, all runs are simulated by one worker with one 
+					  Aspen solve
+		'''
+
+		return self.pool.apply(_simulate_group, (inputs, valuesList, outputs))
+
+
+	def close(self):
+
+		self.pool.close()
+		self.pool.join()
+
+
+def _supervised_worker(wid, gen, aspenFile, calculatorFile, tmpDir, retainDir, keep, startLock, tasks, results):
+	'''
+	Parameters
+	wid: int, index of worker
+	gen: int, generation of worker, increased on every restart so messages of killed workers are ignored
+	aspenFile: str, Aspen model file
+	calculatorFile: str, excel calculator file
+	tmpDir: str, directory of temporary Aspen files
+	retainDir: str, directory of Aspen files retained from failed runs
+	keep: int or None, # of most recent temporary Aspen files kept
+	startLock: Semaphore, shared by all workers, held while Aspen starts
+	tasks: Queue, (inputs, values, outputs) of the next point, or of the next group of runs sharing values of Aspen 
+		   inputs if values is 2D, None to stop
+	results: Queue, shared by all workers, ('pids', wid, gen, pids of Aspen servers), ('ready', wid, gen, pids of COM 
+			 servers), ('stage', wid, gen, stage), ('done', wid, gen, (outputValues, memory of Excel in MB)) or 
+			 ('error', wid, gen, reason) are put
+	'''
+	
+	# Aspen servers are not children of the worker, they are found as processes new after Aspen started, so workers 
+	# start Aspen one at a time; the lock is not waited for longer than 300 s in case its holder was killed
+	acquired = startLock.acquire(timeout = 300)
+	try:
+		before = process_ids(ASPEN_SERVERS)
+		aspenModel = Aspen(aspenFile)
+		aspenPids = sorted(process_ids(ASPEN_SERVERS) - before)
+	finally:
+		if acquired:
+			startLock.release()
+	
+	results.put(('pids', wid, gen, aspenPids))
+	
+	calculator = Excel(calculatorFile)
+	tmp = TmpManager(tmpDir, retainDir, keep)
+	
+	results.put(('ready', wid, gen, aspenPids + [calculator.pid()]))
+	
+	try:
+		while True:
+			task = tasks.get()
+			if task is None:
+				break
+			
+			run = _run_group if np.ndim(task[1]) == 2 else _run_point
+			try:
+				outputValues = run(aspenModel, calculator, tmp, *task, report = lambda stage: results.put(('stage', wid, gen, stage)))
+			
+			except Exception as e:
+				results.put(('error', wid, gen, '%s: %s' % (type(e).__name__, e)))
+				continue
+			
+			try:
+				memory = calculator.memory()
+			except Exception:
+				memory = 0
+			
+			results.put(('done', wid, gen, (outputValues, memory)))
+	
+	finally:
+		aspenModel.close()
+		calculator.quit()
+		
+		
+class SupervisedPool():
+	
+	def __init__(self, aspenFile, calculatorFile, outDir, nworkers, tmpRoot = None, keep = None, aspenTimeout = 1800, 
+				 calculatorTimeout = 600, startTimeout = 600, maxRetries = 2, recycleEvery = None, maxMemory = None, lead = 0.9, 
+				 runtimeModel = None, retainRoot = None):
+		'''
+		Same interface as SimulationPool, but each worker is watched by a supervisor thread. A worker whose Aspen or 
+		calculator stage exceeds its timeout (e.g. a diverging Engine.Run2 or a modal dialog in Excel) is killed 
+		together with its Aspen and Excel servers and restarted, and so is a crashed worker. The point is then retried up to 
+		maxRetries times, after which its outputs are NaN and the reason is recorded in failures.
+		
+		A worker is also replaced after recycleEvery runs or when its Excel process uses more than maxMemory MB. Its 
+		replacement is started as a standby once lead of either limit is reached, and takes over when the worker is 
+		idle and ready, so recycling does not wait for Aspen and Excel to start. A standby also takes over from a 
+		worker that hung or crashed.
+		
+		Idle workers take the next pending point. With runtimeModel, pending points are kept in order of predicted time, 
+		longest first, so short points fill the gaps at the end of a batch; the model learns from every finished 
+		point and the ETA is printed as points finish.
+		
+		Parameters
+		aspenFile: str, Aspen model file
+		calculatorFile: str, excel calculator file
+		outDir: str, output directory
+		nworkers: int, # of worker processes, each with its own Aspen and Excel instances
+		tmpRoot: str or None, directory of temporary Aspen files, outDir/tmp by default
+		keep: int or None, # of most recent temporary Aspen files kept by each worker, all files are kept if None
+		aspenTimeout: float, seconds allowed for setting inputs and running Aspen of one point
+		calculatorTimeout: float, seconds allowed for running calculator of one point
+		startTimeout: float, seconds allowed for opening Aspen model and calculator
+		maxRetries: int, # of retries of a point after its worker hung, crashed or raised
+		recycleEvery: int or None, # of runs after which a worker is recycled
+		maxMemory: float or None, memory limit of the Excel process of a worker in MB
+		lead: float, fraction of limits at which a standby starts
+		runtimeModel: instance of RuntimeModel class or None, predicts time of points from recorded timings
+		retainRoot: str or None, directory of Aspen files retained from failed runs, outDir/retained by default
+		'''
+		
+		self.nworkers = nworkers
+		self.aspenFile = aspenFile
+		self.calculatorFile = calculatorFile
+		self.tmpRoot = tmpRoot or outDir + '/tmp'
+		self.retainRoot = retainRoot or outDir + '/retained'
+		self.keep = keep
+		self.timeouts = {'start': startTimeout, 'aspen': aspenTimeout, 'calculator': calculatorTimeout}
+		self.maxRetries = maxRetries
+		self.recycleEvery = recycleEvery
+		self.maxMemory = maxMemory
+		self.lead = lead
+		self.runtimeModel = runtimeModel
+		
+		self.failures = []   # lst of dict, keys are ['Values', 'Reason', 'Attempts']
+		self.nrestarts = 0
+		self.nrecycled = 0
+		self.ndone = 0
+		self.ngen = 0
+		self.standbys = {}
+		self.retired = []
+		
+		self.results = Queue()
+		self.startLock = Semaphore(1)
+		self.pending = deque()
+		self.lock = Lock()
+		self.closing = False
+		
+		self.workers = [None] * nworkers
+		for wid in range(nworkers):
+			self._start_worker(wid)
+		
+		self.supervisor = Thread(target = self._supervise, daemon = True)
+		self.supervisor.start()
+		
+		
+	def _start_worker(self, wid, standby = False):
+		
+		self.ngen += 1
+		
+		tasks = Queue()
+		tmpDir = '%s/worker%s_%s' % (self.tmpRoot, wid, self.ngen)
+		retainDir = '%s/worker%s_%s' % (self.retainRoot, wid, self.ngen)
+		process = Process(target = _supervised_worker, args = (wid, self.ngen, self.aspenFile, self.calculatorFile, tmpDir, retainDir, 
+															   self.keep, self.startLock, tasks, self.results), daemon = True)
+		process.start()
+		
+		worker = {'process': process, 'tasks': tasks, 'gen': self.ngen, 'pids': [], 'stage': 'start', 'since': time.time(), 
+				  'job': None, 'startFailures': 0, 'runs': 0, 'memory': 0}
+		
+		if standby:
+			self.standbys[wid] = worker
+		else:
+			if self.workers[wid] is not None:
+				worker['startFailures'] = self.workers[wid]['startFailures']
+			self.workers[wid] = worker
+		
+		
+	def _kill_worker(self, worker):
+		
+		worker['process'].kill()
+		worker['process'].join()
+		
+		# COM servers are separate processes and outlive their client, servers also found by another worker 
+		# (started at the same time without the start lock) are left alone
+		others = {pid for other in self.workers + list(self.standbys.values()) if other is not None and other is not worker 
+				  for pid in other['pids']}
+		for pid in set(worker['pids']) - others:
+			try:
+				subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)], capture_output = True)   # with child processes
+			except OSError:
+				pass
+		
+		
+	def _restart_worker(self, wid, reason):
+		
+		worker = self.workers[wid]
+		job = worker['job']
+		
+		self._kill_worker(worker)
+		
+		worker['startFailures'] = worker['startFailures'] + 1 if worker['stage'] == 'start' else 0
+		if wid in self.standbys:
+			print('worker %s replaced by standby: %s' % (wid, reason))
+			self.workers[wid] = self.standbys.pop(wid)
+			self.nrestarts += 1
+		
+		elif worker['startFailures'] > self.maxRetries:
+			print('worker %s given up: %s' % (wid, reason))
+			worker['stage'] = 'dead'
+		
+		else:
+			print('worker %s restarted: %s' % (wid, reason))
+			self._start_worker(wid)
+			self.nrestarts += 1
+		
+		if job is not None:
+			self._retry(job, reason)
+		
+		
+	def _retry(self, job, reason):
+		
+		job['attempts'] += 1
+		
+		if job['attempts'] > self.maxRetries:
+			self._give_up(job, reason)
+		else:
+			with self.lock:
+				self.pending.appendleft(job)
+		
+		
+	def _give_up(self, job, reason):
+		
+		_, values, outputs = job['task']
+		for runValues in np.atleast_2d(values):
+			self.failures.append({'Values': list(runValues), 'Reason': reason, 'Attempts': job['attempts']})
+		
+		job['future'].set_result(np.full(np.shape(values)[:-1] + (len(outputs),), np.nan))
+		
+		
+	@staticmethod
+	def _first_run(job):
+		
+		return np.atleast_2d(job['task'][1])[0]   # a group is predicted to take as long as one run
+		
+		
+	def _usage(self, worker):
+		
+		usage = 0
+		if self.recycleEvery:
+			usage = max(usage, worker['runs'] / self.recycleEvery)
+		if self.maxMemory:
+			usage = max(usage, worker['memory'] / self.maxMemory)
+		
+		return usage
+		
+		
+	def _reorder(self):
+		
+		with self.lock:
+			if len(self.pending) < 2:
+				return
+			
+			jobs = list(self.pending)
+			predicted = self.runtimeModel.predict([self._first_run(job) for job in jobs])
+			if np.isnan(predicted).all():
+				return
+			
+			self.pending = deque(jobs[k] for k in np.argsort(-predicted, kind = 'stable'))
+		
+		
+	def _print_progress(self):
+		
+		with self.lock:
+			X = [self._first_run(job) for job in self.pending]
+		
+		now = time.time()
+		running = [worker['job'] for worker in self.workers if worker['job'] is not None]
+		busy = []
+		if running:
+			predicted = self.runtimeModel.predict([self._first_run(job) for job in running])
+			busy = [max(seconds - (now - job['start']), 0) for job, seconds in zip(running, predicted)]
+		
+		nalive = sum(worker['stage'] != 'dead' for worker in self.workers)
+		eta = self.runtimeModel.eta(X, nalive, busy)
+		
+		print('%s points done, %s left, ETA %s' % (self.ndone, len(X) + len(running), _format_seconds(eta)))
+		
+		
+	def _supervise(self):
+		
+		while True:
+			# dispatch pending points to idle workers
+			with self.lock:
+				for worker in self.workers:
+					if worker['stage'] == 'idle' and self.pending:
+						worker['job'] = self.pending.popleft()
+						worker['job']['start'] = time.time()
+						worker['stage'], worker['since'] = 'aspen', time.time()
+						worker['tasks'].put(worker['job']['task'])
+				
+				if all(worker['stage'] == 'dead' for worker in self.workers):
+					while self.pending:
+						self._give_up(self.pending.popleft(), 'no worker could start')
+				
+				if self.closing and not self.pending and all(worker['job'] is None for worker in self.workers):
+					break
+			
+			# handle messages of workers
+			try:
+				kind, wid, gen, content = self.results.get(timeout = 0.5)
+			except Empty:
+				kind = None
+			
+			if kind is None:
+				pass
+			
+			elif wid in self.standbys and gen == self.standbys[wid]['gen']:
+				if kind == 'pids':
+					self.standbys[wid]['pids'] = content
+				
+				elif kind == 'ready':
+					self.standbys[wid]['pids'] = content
+					self.standbys[wid]['stage'] = 'idle'
+			
+			elif gen == self.workers[wid]['gen']:
+				worker = self.workers[wid]
+				
+				if kind == 'pids':
+					worker['pids'] = content
+				
+				elif kind == 'ready':
+					worker['pids'] = content
+					worker['stage'], worker['since'] = 'idle', time.time()
+				
+				elif kind == 'stage':
+					worker['stage'], worker['since'] = content, time.time()
+				
+				elif kind in ('done', 'error'):
+					job, worker['job'] = worker['job'], None
+					worker['stage'], worker['since'] = 'idle', time.time()
+					
+					if kind == 'done':
+						outputValues, worker['memory'] = content
+						worker['runs'] += 1
+						job['future'].set_result(outputValues)
+						
+						self.ndone += 1
+						if self.runtimeModel is not None:
+							if np.ndim(job['task'][1]) == 1:
+								self.runtimeModel.add(job['task'][1], time.time() - job['start'])
+							self._reorder()
+							self._print_progress()
+					else:
+						self._retry(job, content)
+			
+			# recycle workers
+			for wid, worker in enumerate(self.workers):
+				usage = self._usage(worker)
+				if worker['stage'] == 'dead' or usage < self.lead:
+					continue
+				
+				if wid not in self.standbys:
+					self._start_worker(wid, standby = True)
+				
+				elif usage >= 1 and worker['stage'] == 'idle' and self.standbys[wid]['stage'] == 'idle':
+					worker['tasks'].put(None)   # exits after closing its Aspen and Excel
+					self.retired.append(worker['process'])
+					self.workers[wid] = self.standbys.pop(wid)
+					self.nrecycled += 1
+			
+			# restart hung or crashed workers
+			now = time.time()
+			for wid, worker in enumerate(self.workers):
+				if worker['stage'] == 'dead':
+					continue
+				
+				elif worker['stage'] == 'idle':
+					if not worker['process'].is_alive():
+						self._restart_worker(wid, 'worker exited with code %s' % worker['process'].exitcode)
+				
+				elif not worker['process'].is_alive():
+					self._restart_worker(wid, 'worker crashed in %s stage with code %s' % (worker['stage'], worker['process'].exitcode))
+				
+				elif now - worker['since'] > self.timeouts[worker['stage']]:
+					self._restart_worker(wid, '%s stage timed out after %s s' % (worker['stage'], self.timeouts[worker['stage']]))
+			
+			for wid, standby in list(self.standbys.items()):
+				if not standby['process'].is_alive() or (standby['stage'] == 'start' and now - standby['since'] > self.timeouts['start']):
+					print('standby of worker %s failed to start' % wid)
+					self._kill_worker(self.standbys.pop(wid))
+		
+		
+	def submit(self, inputs, values, outputs):
+		'''
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		values: array, values of inputs, 2D for a group of runs sharing values of Aspen inputs, see simulate_group
+		outputs: lst of str, sheet!cell of outputs in calculator
+		
+		Returns
+		future: Future, result is array of values of outputs, 2D for a group, NaN if the point failed
+		'''
+		
+		future = Future()
+		with self.lock:
+			self.pending.append({'task': (inputs, values, outputs), 'future': future, 'attempts': 0})
+		
+		return future
+		
+		
+	def simulate(self, inputs, values, outputs):
+		'''
+		Blocks until the point is finished or failed, can be called from several threads at the same time
+		
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		values: array, values of inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+		
+		Returns
+		outputValues: array, values of outputs, NaN if the point failed
+		'''
+		
+		return self.submit(inputs, values, outputs).result()
+		
+		
+	def simulate_batch(self, inputs, valuesList, outputs):
+		'''
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		valuesList: 2D array, rows are runs, columns are inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+		
+		Returns
+		outputValues: 2D array, rows are runs, columns are outputs, NaN for failed runs
+		'''
+		
+		futures = [self.submit(inputs, values, outputs) for values in valuesList]
+		if self.runtimeModel is not None:
+			self._reorder()
+		
+		return np.array([future.result() for future in futures])
+		
+		
+	def simulate_group(self, inputs, valuesList, outputs):
+		'''
+		Blocks until the group is finished or failed, can be called from several threads at the same time
+		
+		Parameters
+		inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+		valuesList: 2D array, rows are runs sharing values of Aspen inputs, columns are inputs
+		outputs: lst of str, sheet!cell of outputs in calculator
+		
+		Returns
+		outputValues: 2D array, rows are runs, columns are outputs, all runs are simulated by one worker with one 
+					  Aspen solve and retried together, NaN if the group failed
+		'''
+		
+		return self.submit(inputs, np.atleast_2d(np.asarray(valuesList, dtype = float)), outputs).result()
+		
+		
+	def close(self):
+		
+		with self.lock:
+			self.closing = True
+		self.supervisor.join()
+		
+		workers = self.workers + list(self.standbys.values())
+		for worker in workers:
+			worker['tasks'].put(None)
+		for worker in workers:
+			worker['process'].join(timeout = 60)
+			if worker['process'].is_alive():
+				self._kill_worker(worker)
+		
+		for process in self.retired:
+			process.join(timeout = 60)
+			if process.is_alive():
+				process.kill()
+		
+		
+def open_pool(aspenFile, calculatorFile, outDir, nworkers, tmpRoot = None, keep = None, timeouts = None, maxRetries = 2, 
+			  recycleEvery = None, maxMemory = None, runtimeModel = None, retainRoot = None):
+	'''
+	Parameters
+	aspenFile: str, Aspen model file
+	calculatorFile: str, excel calculator file
+	outDir: str, output directory
+	nworkers: int, # of worker processes
+	tmpRoot: str or None, directory of temporary Aspen files, outDir/tmp by default
+	keep: int or None, # of most recent temporary Aspen files kept by each worker, all files are kept if None
+	timeouts: tuple or None, (Aspen timeout, calculator timeout) in seconds, if given workers are supervised
+	maxRetries: int, # of retries of a point of supervised workers
+	recycleEvery: int or None, # of runs after which a worker is recycled
+	maxMemory: float or None, memory limit of Excel of a worker in MB, only for supervised workers
+	runtimeModel: instance of RuntimeModel class or None, dispatches points longest expected first and prints the ETA
+	retainRoot: str or None, directory of Aspen files retained from failed runs, outDir/retained by default, should be 
+				on disk if tmpRoot is not
+	
+	Returns
+	simPool: instance of SupervisedPool class if timeouts given, otherwise instance of SimulationPool class
+	'''
+	
+	if timeouts:
+		aspenTimeout, calculatorTimeout = timeouts
+		
+		return SupervisedPool(aspenFile, calculatorFile, outDir, nworkers, tmpRoot, keep, aspenTimeout, calculatorTimeout, 
+							  maxRetries = maxRetries, recycleEvery = recycleEvery, maxMemory = maxMemory, runtimeModel = runtimeModel, 
+							  retainRoot = retainRoot)
+	
+	else:
+		return SimulationPool(aspenFile, calculatorFile, outDir, nworkers, tmpRoot, keep, recycleEvery, runtimeModel, retainRoot)
+		
+		
+def _aspen_stage(aspenFile, inputs, valuesList, order, tmpDir, retainDir, keep, compress, queue, warm):
+	'''
+	Parameters
+	aspenFile: str, Aspen model file
+	inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+	valuesList: 2D array, rows are runs, columns are inputs
+	order: lst, index of runs in order of simulation
+	tmpDir: str, directory of temporary Aspen files
+	retainDir: str or None, directory of retained Aspen files, see TmpManager
+	keep: int or None, # of most recent temporary Aspen files kept, including those not read by calculator yet
+	compress: bool, whether retained files are gzipped
+	queue: Queue, bounded, (index of run, saved Aspen file) are put for the calculator stage, (None, (run stats, usage 
+		   of temporary files)) at the end, ('error', traceback) if the stage failed
+	warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+	'''
+	
+	aspenModel = Aspen(aspenFile)
+	tmp = TmpManager(tmpDir, retainDir, keep, compress)
+	
+	try:
+		prevValues = None
+		for i in order:
+			changed = [j for j, ((location, _), value) in enumerate(zip(inputs, valuesList[i])) 
+					   if re.search(r'\\', location) and (prevValues is None or value != prevValues[j])]
+			
+			for j in changed:
+				location, ifFortran = inputs[j]
+				aspenModel.set_value(location, valuesList[i][j], bool(ifFortran), verbose = False)
+			
+			if prevValues is None or changed:   # otherwise the calculator stage reuses the previous solution
+				aspenModel.run_model(warm = warm)
+				
+				tmpFile = tmp.new_file()
+				aspenModel.save_model(tmpFile)
+				tmp.done(tmpFile, failed = not aspenModel.converged)
+			
+			queue.put((i, tmpFile))   # blocks while the calculator stage is maxsize runs behind
+			prevValues = valuesList[i]
+	
+	except BaseException:
+		queue.put(('error', traceback.format_exc()))
+		raise
+	
+	else:
+		tmp.close()
+		queue.put((None, (aspenModel.runStats, tmp.usage())))
+	
+	finally:
+		aspenModel.close()
+		
+		
+def simulate_pipelined(aspenFile, calculator, inputs, valuesList, outputs, tmpDir, order = None, maxsize = 2, warm = False, 
+					   retainDir = None, keep = None, compress = False):
+	'''
+	Aspen solves run i+1 in a separate process while calculator processes run i in this process, 
+	connected by a bounded queue of saved Aspen files. Temporary Aspen files are managed by a TmpManager in the Aspen 
+	process, which also keeps the files still queued for calculator.
+	
+	Parameters
+	aspenFile: str, Aspen model file
+	calculator: instance of Excel class
+	inputs: lst of tuples, (location, ifFortran), location is Aspen path or sheet!cell in calculator
+	valuesList: 2D array, rows are runs, columns are inputs
+	outputs: lst of str, sheet!cell of outputs in calculator
+	tmpDir: str, directory of temporary Aspen files
+	order: lst or None, index of runs in order of simulation, in order of rows by default
+	maxsize: int, maximal # of solved runs waiting for calculator
+	warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+	retainDir: str or None, directory of retained Aspen files, tmpDir/retained by default
+	keep: int or None, # of most recent temporary Aspen files kept, at least 1, all kept if None
+	compress: bool, whether retained files are gzipped
+	
+	Returns
+	outputValues: 2D array, rows are runs, columns are outputs, NaN for runs not finished
+	runStats: lst of dict, stats of Aspen runs, see Aspen.run_model
+	tmpUsage: dict, usage of temporary Aspen files, see TmpManager.usage
+	'''
+	
+	os.makedirs(tmpDir, exist_ok = True)
+	
+	valuesList = np.asarray(valuesList)
+	order = list(range(valuesList.shape[0])) if order is None else list(order)
+	
+	keep = None if keep is None else max(keep, 1) + maxsize + 1   # files queued and the one calculator reads
+	
+	queue = Queue(maxsize)
+	aspenStage = Process(target = _aspen_stage, args = (aspenFile, inputs, valuesList, order, tmpDir, retainDir, keep, compress, queue, warm))
+	aspenStage.start()
+	
+	outputValues = np.full((valuesList.shape[0], len(outputs)), np.nan)
+	
+	try:
+		while True:
+			try:
+				i, item = queue.get(timeout = 1)
+			except Empty:
+				if aspenStage.is_alive():
+					continue
+				raise RuntimeError('Aspen stage exited unexpectedly with exit code %s' % aspenStage.exitcode)
+			
+			if i is None:
+				runStats, tmpUsage = item
+				break
+			
+			if i == 'error':
+				raise RuntimeError('Aspen stage failed:\n%s' % item)
+			
+			for (location, _), value in zip(inputs, valuesList[i]):
+				if not re.search(r'\\', location):
+					sheet, cell = location.split('!')
+					calculator.set_cell(value, sheet, loc = cell)
+			
+			calculator.load_aspenModel(item)
+			calculator.run_macro('solvedcfror')
+			
+			for k, output in enumerate(outputs):
+				sheet, cell = output.split('!')
+				outputValues[i, k] = calculator.get_cell(sheet, loc = cell)
+	
+	except BaseException:
+		aspenStage.terminate()   # otherwise it may block on a full queue forever
+		raise
+	
+	finally:
+		aspenStage.join()
+	
+	return outputValues, runStats, tmpUsage
@@ -0,0 +1,84 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+r'''
+This script runs design points queued in a shared job queue file (see jobqueue.py) on this host, it can be started on
+every host with Aspen licences. Each of nworkers workers leases the next pending point, renews its lease while the
+point runs and writes the outputs to the results table. Points of hosts that stop renewing their leases are re-queued.
+Workers only lease points of the given study, which must be the one queued for the same Aspen model and calculator.
+
+Example
+python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\queue_worker.py -b \\fileserver\aspen\farm.db -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\farm -s farm -w 2 -q 1800 600
+'''
+
+
+
+
+import argparse
+import os
+import socket
+from threading import Thread
+from jobqueue import JobQueue, run_worker
+from parallel import open_pool
+
+
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'This script runs design points of a shared job queue on this host')
+	parser.add_argument('-b', '--queueFile', type = str, required = True, help = 'job queue file (SQLite), on a shared path')
+	parser.add_argument('-a', '--aspenFile', type = str, required = True, help = 'Aspen model file, .bkp')
+	parser.add_argument('-e', '--calculatorFile', type = str, required = True, help = 'excel calculator file, .xlsm')
+	parser.add_argument('-o', '--outDir', type = str, required = True, help = 'output directory of this host')
+	parser.add_argument('-s', '--study', type = str, required = True, help = 'study to work on, queued for the same Aspen model and calculator')
+	parser.add_argument('-w', '--nworkers', type = int, required = False, default = 1, help = '# of Aspen/Excel workers on this host')
+	parser.add_argument('-l', '--leaseSeconds', type = float, required = False, default = 600, help = 'seconds a lease lasts without heartbeat')
+	parser.add_argument('-i', '--idleSeconds', type = float, required = False, default = 600, help = 'seconds without pending points before the script exits')
+	parser.add_argument('-q', '--timeouts', type = float, nargs = 2, required = False, help = 'seconds allowed for Aspen and calculator of one point, if given, hung or crashed workers are killed and restarted')
+	parser.add_argument('-j', '--maxRetries', type = int, required = False, default = 2, help = '# of retries of a point after its lease expired or it failed')
+	parser.add_argument('-u', '--tmpDir', type = str, required = False, help = 'directory of temporary .bkp files, outDir/tmp by default')
+	parser.add_argument('-x', '--keepTmp', type = int, required = False, help = '# of most recent temporary .bkp files kept by each worker, all kept by default')
+	args = parser.parse_args()
+
+	queueFile = args.queueFile
+	aspenFile = args.aspenFile
+	calculatorFile = args.calculatorFile
+	outDir = args.outDir
+	study = args.study
+	nworkers = args.nworkers
+	leaseSeconds = args.leaseSeconds
+	idleSeconds = args.idleSeconds
+	timeouts = args.timeouts
+	maxRetries = args.maxRetries
+
+	tmpDir = args.tmpDir or outDir + '/tmp'
+	keepTmp = args.keepTmp
+
+	os.makedirs(outDir, exist_ok = True)
+
+
+	# lease and run points
+	queue = JobQueue(queueFile, leaseSeconds, maxRetries)
+	host = '%s:%s' % (socket.gethostname(), os.getpid())
+
+	try:
+		simPool = open_pool(aspenFile, calculatorFile, outDir, nworkers, tmpDir, keepTmp, timeouts, maxRetries)
+
+		threads = [Thread(target = run_worker, args = (queue, '%s:%s' % (host, k), simPool.simulate, study, idleSeconds))
+				   for k in range(nworkers)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+	finally:
+		simPool.close()
+
+	print(queue.progress(study).to_string())
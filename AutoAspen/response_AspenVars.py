@@ -8,7 +8,7 @@ __version__ = '1.0'
 
 
 r'''
-This script estimates response of output with respect to 2-3 Aspen variables
+This script estimates response of output with respect to 2 or more Aspen variables
 
 Example
 python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\response_AspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Q4\enzyme_loading_and_deploy_and_solid_loading -c C:\Users\cwu\Desktop\Outputs\Aspen_automation\Data\Q4\enzyme_loading_and_deploy_and_solid_loading\resp_AspenVars_config.xlsx -a C:\Users\cwu\Desktop\Outputs\Aspen_automation\Data\Q4\enzyme_loading_and_deploy_and_solid_loading\PETase_Depoly_Base_v8.bkp -e C:\Users\cwu\Desktop\Outputs\Aspen_automation\Data\Q4\enzyme_loading_and_deploy_and_solid_loading\PETase_Depoly_Base_v8_corr.xlsm
@@ -17,26 +17,57 @@ python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\response_Aspe
 
 import argparse
 import os
-from i_o import parse_config, save_response_results, plot_aspenVar_or_nonAspenVar_response
-from utilities import generate_input_data, response_using_aspen
-from classes import Aspen, Excel
+from glob import glob
+from i_o import parse_config, parse_handoff, save_run_stats, save_tmp_usage, save_response_results, plot_response_cube, save_adaptive_response, plot_adaptive_response
+from utilities import generate_input_data, response_grid, response_adaptive
+from classes import Aspen, Excel, SnapshotLibrary, TmpManager, Recycler
 
 
 
 
 if __name__ == '__main__':
 	
-	parser = argparse.ArgumentParser(description = 'This script estimates response of output with respect to 2-3 variables in .xlsm')
+	parser = argparse.ArgumentParser(description = 'This script estimates response of output with respect to 2 or more variables in .xlsm')
 	parser.add_argument('-o', '--outDir', type = str, required = True, help = 'output directory')
 	parser.add_argument('-c', '--configFile', type = str, required = True, help = 'config file, .xlsx')
 	parser.add_argument('-a', '--aspenFile', type = str, required = True, help = 'Aspen model file, .bkp')
 	parser.add_argument('-e', '--calculatorFile', type = str, required = True, help = 'excel calculator file, .xlsm')
+	parser.add_argument('-l', '--loopOrder', type = int, nargs = '+', required = False, help = 'index of input variables from the outermost loop to the innermost loop, default in order of config file')
+	parser.add_argument('-b', '--budget', type = int, required = False, help = '# of runs of adaptive response of 2 variables, start from a coarse grid and refine where output changes sharply')
+	parser.add_argument('-t', '--traversal', type = str, required = False, default = 'serpentine', choices = ['serpentine', 'nested'], help = 'path through grid, "serpentine" reverses inner loops instead of restarting them')
+	parser.add_argument('-s', '--warmStart', action = 'store_true', help = 'whether Aspen runs skip Reinit when inputs change little from the last converged run')
+	parser.add_argument('-y', '--snapshotDir', type = str, required = False, help = 'directory of converged snapshot library, Aspen runs start from the nearest snapshot')
+	parser.add_argument('-z', '--snapshotBudget', type = float, required = False, default = 2048, help = 'disk budget of snapshot library in MB')
+	parser.add_argument('-i', '--importDirs', type = str, nargs = '+', required = False, help = 'directories of converged .bkp files from earlier runs to add to snapshot library')
+	parser.add_argument('-f', '--handoff', action = 'store_true', help = 'whether Aspen results are copied to calculator as mapped in the Handoff sheet of config file instead of saving and reloading .bkp files')
+	parser.add_argument('-k', '--keepBkp', action = 'store_true', help = 'whether .bkp files of runs are still saved in handoff mode')
+	parser.add_argument('-u', '--tmpDir', type = str, required = False, help = 'directory of temporary .bkp files, can be on a RAM disk, outDir/tmp by default')
+	parser.add_argument('-x', '--keepTmp', type = int, required = False, help = '# of most recent temporary .bkp files kept, all kept by default, .bkp files of failed runs are retained in outDir/retained')
+	parser.add_argument('-g', '--gzipTmp', action = 'store_true', help = 'whether retained .bkp files are gzipped in background')
+	parser.add_argument('-r', '--recycleEvery', type = int, required = False, help = '# of runs after which Aspen and Excel are replaced by fresh instances started in background')
+	parser.add_argument('-m', '--maxMemory', type = float, required = False, help = 'memory limit of Excel in MB above which Aspen and Excel are replaced by fresh instances')
 	args = parser.parse_args()
 	
 	outDir = args.outDir
 	configFile = args.configFile
 	aspenFile = args.aspenFile
 	calculatorFile = args.calculatorFile
+	warmStart = args.warmStart
+	snapshotDir = args.snapshotDir
+	snapshotBudget = args.snapshotBudget
+	importDirs = args.importDirs or []
+	ifHandoff = args.handoff
+	keepBkp = args.keepBkp
+	budget = args.budget
+	loopOrder = args.loopOrder
+	traversal = args.traversal
+	
+	tmpDir = args.tmpDir or outDir + '/tmp'
+	keepTmp = args.keepTmp
+	gzipTmp = args.gzipTmp
+	
+	recycleEvery = args.recycleEvery
+	maxMemory = args.maxMemory
 	
 	os.makedirs(outDir, exist_ok = True)
 	
@@ -44,6 +75,10 @@ if __name__ == '__main__':
 	# parse inputs and outputs
 	inputInfos, outputInfos = parse_config(configFile)
 	
+	handoff = parse_handoff(configFile) if ifHandoff else None
+	if ifHandoff and handoff is None:
+		raise ValueError('%s has no Handoff sheet' % configFile)
+	
 	inputData = generate_input_data(inputInfos)
 	
 	
@@ -51,17 +86,48 @@ if __name__ == '__main__':
 	try:
 		aspenModel = Aspen(aspenFile)
 		calculator = Excel(calculatorFile)
+		tmp = TmpManager(tmpDir, outDir + '/retained', keepTmp, gzipTmp)
+		
+		recycler = None
+		if recycleEvery or maxMemory:
+			recycler = Recycler(aspenModel, calculator, recycleEvery, maxMemory)
+		
+		library = None
+		if snapshotDir:
+			library = SnapshotLibrary(snapshotDir, inputInfos['Location'].tolist(), snapshotBudget)
+			
+			if importDirs:
+				library.import_files(aspenModel, [file for importDir in importDirs for file in glob('%s/*.bkp' % importDir)])
+				aspenModel.load_snapshot(aspenFile)
 		
-		simResults = response_using_aspen(aspenModel, calculator, inputData, outputInfos, outDir)
+		if budget:
+			points = response_adaptive(aspenModel, calculator, inputData, outputInfos, outDir, budget, warm = warmStart, library = library, 
+									   handoff = handoff, keepFiles = keepBkp, tmp = tmp, recycler = recycler)
+		else:
+			cube = response_grid(aspenModel, calculator, inputData, outputInfos, outDir, loopOrder, traversal, warmStart, library, handoff, keepBkp, tmp, 
+								 recycler)
+	
+		save_run_stats(aspenModel.runStats, outDir)
+		
+		tmp.close()
+		save_tmp_usage(tmp.usage(), outDir)
 	
 	finally:
+		if recycler is not None:
+			recycler.close()
 		aspenModel.close()
 		calculator.close()
 	
 	
 	# plot results
-	save_response_results(simResults, outDir)
+	if budget:
+		save_adaptive_response(points, outDir)
+		
+		plot_adaptive_response(points, outDir)
 	
-	plot_aspenVar_or_nonAspenVar_response(simResults, outDir)
+	else:
+		save_response_results(cube.frames(), outDir)
+		
+		plot_response_cube(cube, outDir)
 
 
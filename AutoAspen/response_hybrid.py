@@ -19,9 +19,9 @@ python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\response_hybr
 
 import argparse
 import os
-from i_o import parse_config, save_response_results, plot_hybrid_response
-from utilities import generate_input_data, response_using_aspen_and_calculator_2D
-from classes import Aspen, Excel
+from i_o import parse_config, save_run_stats, save_tmp_usage, save_response_results, plot_hybrid_response, save_adaptive_response, plot_adaptive_response
+from utilities import generate_input_data, response_using_aspen_and_calculator_2D, response_adaptive
+from classes import Aspen, Excel, TmpManager
 
 
 
@@ -33,12 +33,23 @@ if __name__ == '__main__':
 	parser.add_argument('-c', '--configFile', type = str, required = True, help = 'config file, .xlsx')
 	parser.add_argument('-a', '--aspenFile', type = str, required = True, help = 'Aspen model file, .bkp')
 	parser.add_argument('-e', '--calculatorFile', type = str, required = True, help = 'excel calculator file, .xlsm')
+	parser.add_argument('-b', '--budget', type = int, required = False, help = '# of runs of adaptive response of 2 variables, start from a coarse grid and refine where output changes sharply')
+	parser.add_argument('-s', '--warmStart', action = 'store_true', help = 'whether Aspen runs skip Reinit when inputs change little from the last converged run')
+	parser.add_argument('-u', '--tmpDir', type = str, required = False, help = 'directory of temporary .bkp files, can be on a RAM disk, outDir/tmp by default')
+	parser.add_argument('-x', '--keepTmp', type = int, required = False, help = '# of most recent temporary .bkp files kept, all kept by default, .bkp files of failed runs are retained in outDir/retained')
+	parser.add_argument('-g', '--gzipTmp', action = 'store_true', help = 'whether retained .bkp files are gzipped in background')
 	args = parser.parse_args()
 	
 	outDir = args.outDir
 	configFile = args.configFile
 	aspenFile = args.aspenFile
 	calculatorFile = args.calculatorFile
+	warmStart = args.warmStart
+	budget = args.budget
+	
+	tmpDir = args.tmpDir or outDir + '/tmp'
+	keepTmp = args.keepTmp
+	gzipTmp = args.gzipTmp
 	
 	os.makedirs(outDir, exist_ok = True)
 
@@ -53,8 +64,17 @@ if __name__ == '__main__':
 	try:
 		aspenModel = Aspen(aspenFile)
 		calculator = Excel(calculatorFile)
+		tmp = TmpManager(tmpDir, outDir + '/retained', keepTmp, gzipTmp)
+		
+		if budget:
+			points = response_adaptive(aspenModel, calculator, inputData, outputInfos, outDir, budget, warm = warmStart, tmp = tmp)
+		else:
+			simResults = response_using_aspen_and_calculator_2D(aspenModel, calculator, inputData, outputInfos, outDir, warmStart, tmp)
+	
+		save_run_stats(aspenModel.runStats, outDir)
 		
-		simResults = response_using_aspen_and_calculator_2D(aspenModel, calculator, inputData, outputInfos, outDir)
+		tmp.close()
+		save_tmp_usage(tmp.usage(), outDir)
 	
 	finally:
 		aspenModel.close()
@@ -62,9 +82,15 @@ if __name__ == '__main__':
 	
 	
 	# plot results
-	save_response_results(simResults, outDir)
+	if budget:
+		save_adaptive_response(points, outDir)
+		
+		plot_adaptive_response(points, outDir)
 	
-	plot_hybrid_response(simResults, outDir)
+	else:
+		save_response_results(simResults, outDir)
+		
+		plot_hybrid_response(simResults, outDir)
 	
 	
 	
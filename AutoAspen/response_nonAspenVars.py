@@ -8,7 +8,7 @@ __version__ = '1.0'
 
 
 r'''
-This script estimates response of output with respect to 2-3 variables in .xlsm
+This script estimates response of output with respect to 2 or more variables in .xlsm
 
 Example
 python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\response_nonAspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Q4\TPA_and_EG -c C:\Users\cwu\Desktop\Outputs\Aspen_automation\Data\Q4\TPA_and_EG\resp_nonAspenVars_config.xlsx -a C:\Users\cwu\Desktop\Outputs\Aspen_automation\Data\Q4\TPA_and_EG\PETase_Depoly_Base_v8.bkp -e C:\Users\cwu\Desktop\Outputs\Aspen_automation\Data\Q4\TPA_and_EG\PETase_Depoly_Base_v8_corr.xlsm
@@ -19,8 +19,8 @@ python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\response_nonA
 
 import argparse
 import os
-from i_o import parse_config, save_response_results, plot_aspenVar_or_nonAspenVar_response
-from utilities import generate_input_data, response_using_calculator
+from i_o import parse_config, save_response_results, plot_response_cube
+from utilities import generate_input_data, response_grid
 from classes import Aspen, Excel
 
 
@@ -28,17 +28,21 @@ from classes import Aspen, Excel
 
 if __name__ == '__main__':
 	
-	parser = argparse.ArgumentParser(description = 'This script estimates response of output with respect to 2-3 variables in .xlsm')
+	parser = argparse.ArgumentParser(description = 'This script estimates response of output with respect to 2 or more variables in .xlsm')
 	parser.add_argument('-o', '--outDir', type = str, required = True, help = 'output directory')
 	parser.add_argument('-c', '--configFile', type = str, required = True, help = 'config file, .xlsx')
 	parser.add_argument('-a', '--aspenFile', type = str, required = True, help = 'Aspen model file, .bkp')
 	parser.add_argument('-e', '--calculatorFile', type = str, required = True, help = 'excel calculator file, .xlsm')
+	parser.add_argument('-l', '--loopOrder', type = int, nargs = '+', required = False, help = 'index of input variables from the outermost loop to the innermost loop, default in order of config file')
+	parser.add_argument('-t', '--traversal', type = str, required = False, default = 'serpentine', choices = ['serpentine', 'nested'], help = 'path through grid, "serpentine" reverses inner loops instead of restarting them')
 	args = parser.parse_args()
 	
 	outDir = args.outDir
 	configFile = args.configFile
 	aspenFile = args.aspenFile
 	calculatorFile = args.calculatorFile
+	loopOrder = args.loopOrder
+	traversal = args.traversal
 	
 	os.makedirs(outDir, exist_ok = True)
 	
@@ -54,7 +58,7 @@ if __name__ == '__main__':
 		aspenModel = Aspen(aspenFile)
 		calculator = Excel(calculatorFile)
 		
-		simResults = response_using_calculator(aspenModel, calculator, inputData, outputInfos)
+		cube = response_grid(aspenModel, calculator, inputData, outputInfos, outDir, loopOrder, traversal)
 	
 	finally:
 		aspenModel.close()
@@ -62,9 +66,9 @@ if __name__ == '__main__':
 	
 	
 	# plot results
-	save_response_results(simResults, outDir)
+	save_response_results(cube.frames(), outDir)
 	
-	plot_aspenVar_or_nonAspenVar_response(simResults, outDir)
+	plot_response_cube(cube, outDir)
 	
 	
 	
@@ -14,15 +14,22 @@ Example
 python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\sensitivity_AspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Sugars\sensitivity_AspenVars_dis -c C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\sens_AspenVars_dis_config.xlsx -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm -d dis
 
 python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\sensitivity_AspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Sugars\sensitivity_AspenVars_con -c C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\sens_AspenVars_con_config.xlsx -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm -d con -n 3
+
+python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\sensitivity_AspenVars.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Sugars\sensitivity_AspenVars_mf -c C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\sens_AspenVars_con_config.xlsx -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.bkp -A C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm -d con -n 500 -N 30
 '''
 
 
 
 import argparse
 import os
-from i_o import parse_config, save_simulation_results, plot_hist
-from utilities import extract_input_data, generate_input_data, simulate_using_aspen
-from classes import Aspen, Excel
+from glob import glob
+from i_o import (parse_config, parse_handoff, save_run_stats, save_tmp_usage, save_failures, save_skipped_points, save_fidelity_results, 
+				 save_simulation_results, plot_hist)
+from utilities import (extract_input_data, generate_input_data, simulate_using_aspen, simulate_using_aspen_pipelined, simulate_using_pool, 
+					   simulate_multifidelity)
+from classes import Aspen, Excel, SnapshotLibrary, TmpManager, Recycler, FeasibilityClassifier, RuntimeModel
+from parallel import open_pool
+from jobqueue import JobQueue, QueuePool
 
 
 
@@ -36,14 +43,68 @@ if __name__ == '__main__':
 	parser.add_argument('-e', '--calculatorFile', type = str, required = True, help = 'excel calculator file, .xlsm')
 	parser.add_argument('-d', '--varType', type = str, required = True, choices = ['dis', 'con'], help = 'input data type in config file, "dis" for discrete, "con" for continuous')
 	parser.add_argument('-n', '--nruns', type = int, required = False, help = '# of simulation runs')
+	parser.add_argument('-t', '--traversal', type = str, required = False, default = 'nearest', choices = ['nearest', 'given'], help = 'order of runs, "nearest" follows a nearest-neighbour tour through input values')
+	parser.add_argument('-s', '--warmStart', action = 'store_true', help = 'whether Aspen runs skip Reinit when inputs change little from the last converged run')
+	parser.add_argument('-p', '--pipeline', action = 'store_true', help = 'whether Aspen solves the next run in a separate process while calculator processes the current one, snapshot library is not used')
+	parser.add_argument('-y', '--snapshotDir', type = str, required = False, help = 'directory of converged snapshot library, Aspen runs start from the nearest snapshot')
+	parser.add_argument('-z', '--snapshotBudget', type = float, required = False, default = 2048, help = 'disk budget of snapshot library in MB')
+	parser.add_argument('-i', '--importDirs', type = str, nargs = '+', required = False, help = 'directories of converged .bkp files from earlier runs to add to snapshot library')
+	parser.add_argument('-f', '--handoff', action = 'store_true', help = 'whether Aspen results are copied to calculator as mapped in the Handoff sheet of config file instead of saving and reloading .bkp files')
+	parser.add_argument('-k', '--keepBkp', action = 'store_true', help = 'whether .bkp files of runs are still saved in handoff mode')
+	parser.add_argument('-u', '--tmpDir', type = str, required = False, help = 'directory of temporary .bkp files, can be on a RAM disk, outDir/tmp by default')
+	parser.add_argument('-x', '--keepTmp', type = int, required = False, help = '# of most recent temporary .bkp files kept, all kept by default, .bkp files of failed runs are retained in outDir/retained')
+	parser.add_argument('-g', '--gzipTmp', action = 'store_true', help = 'whether retained .bkp files are gzipped in background')
+	parser.add_argument('-q', '--timeouts', type = float, nargs = 2, required = False, help = 'seconds allowed for Aspen and calculator of one run, if given, runs are dispatched to supervised workers, hung or crashed workers are killed and restarted and runs retried')
+	parser.add_argument('-j', '--maxRetries', type = int, required = False, default = 2, help = '# of retries of a run with -q, failed runs are NaN and listed in failed_points.tsv')
+	parser.add_argument('-Q', '--queueFile', type = str, required = False, help = 'job queue file (SQLite) on a shared path, if given, runs are queued and simulated by queue_worker.py on any host')
+	parser.add_argument('-S', '--study', type = str, required = False, help = 'study name of runs in the job queue, name of outDir by default, runs already queued in the study are not simulated again')
+	parser.add_argument('-T', '--timingFile', type = str, required = False, help = 'file of run times (.tsv) with -q, created if not existing, if given, runs are dispatched longest expected first and the ETA is printed')
+	parser.add_argument('-w', '--nworkers', type = int, required = False, default = 1, help = '# of Aspen/Excel workers with -q')
+	parser.add_argument('-r', '--recycleEvery', type = int, required = False, help = '# of runs after which Aspen and Excel are replaced by fresh instances started in background, not used with -p')
+	parser.add_argument('-b', '--feasibilityFile', type = str, required = False, help = 'file of converged and failed runs (.tsv), created if not existing, if given, runs predicted to fail from past runs are skipped, not used with -p or -q')
+	parser.add_argument('-v', '--failThreshold', type = float, required = False, default = 0.8, help = 'predicted failure probability above which runs are skipped with -b')
+	parser.add_argument('-l', '--resample', action = 'store_true', help = 'whether runs skipped with -b are replaced by runs with Aspen inputs drawn again from the same data')
+	parser.add_argument('-A', '--liteFile', type = str, required = False, help = 'lite Aspen model file (.bkp), if given, all runs are simulated with it and -N runs with the full model, outputs of the other runs are predicted by a correction fitted between the two')
+	parser.add_argument('-N', '--nfull', type = int, required = False, default = 20, help = '# of runs simulated with the full model with -A')
+	parser.add_argument('-m', '--maxMemory', type = float, required = False, help = 'memory limit of Excel in MB above which Aspen and Excel are replaced by fresh instances, not used with -p')
 	args = parser.parse_args()
 	
 	outDir = args.outDir
 	configFile = args.configFile
 	aspenFile = args.aspenFile
 	calculatorFile = args.calculatorFile
+	warmStart = args.warmStart
+	pipeline = args.pipeline
+	snapshotDir = args.snapshotDir
+	snapshotBudget = args.snapshotBudget
+	importDirs = args.importDirs or []
+	ifHandoff = args.handoff
+	keepBkp = args.keepBkp
 	varType = args.varType
 	nruns = args.nruns
+	traversal = args.traversal
+	
+	tmpDir = args.tmpDir or outDir + '/tmp'
+	keepTmp = args.keepTmp
+	gzipTmp = args.gzipTmp
+	
+	timeouts = args.timeouts
+	maxRetries = args.maxRetries
+	nworkers = args.nworkers
+	timingFile = args.timingFile
+	
+	queueFile = args.queueFile
+	study = args.study or os.path.basename(os.path.normpath(outDir))
+	
+	recycleEvery = args.recycleEvery
+	maxMemory = args.maxMemory
+	
+	feasibilityFile = args.feasibilityFile
+	failThreshold = args.failThreshold
+	resample = args.resample
+	
+	liteFile = args.liteFile
+	nfull = args.nfull
 	
 	os.makedirs(outDir, exist_ok = True)
 
@@ -51,6 +112,10 @@ if __name__ == '__main__':
 	# parse inputs and outputs
 	inputInfos, outputInfos = parse_config(configFile)
 	
+	handoff = parse_handoff(configFile) if ifHandoff else None
+	if ifHandoff and handoff is None:
+		raise ValueError('%s has no Handoff sheet' % configFile)
+	
 	if varType == 'dis':
 		inputData = extract_input_data(inputInfos)
 	else:
@@ -58,19 +123,100 @@ if __name__ == '__main__':
 	
 	
 	# run simulation with Aspen
-	try:
-		aspenModel = Aspen(aspenFile)
-		calculator = Excel(calculatorFile)
-
-		simResults = simulate_using_aspen(aspenModel, calculator, inputData, outputInfos, outDir, nruns)
+	simInputs = None   # inputs each run was simulated with, differ from inputData for resampled runs
+	
+	if queueFile:
+		simPool = QueuePool(JobQueue(queueFile, maxRetries = maxRetries), study)
+		
+		simResults = simulate_using_pool(simPool, inputData, outputInfos, nruns)
+		
+		save_failures(simPool.failures, inputData['Input'], outDir)
+	
+	elif timeouts:
+		runtimeModel = RuntimeModel(inputData['Path'].tolist(), timingFile) if timingFile else None
+		
+		try:
+			simPool = open_pool(aspenFile, calculatorFile, outDir, nworkers, tmpDir, keepTmp, timeouts, maxRetries, recycleEvery, maxMemory, 
+								runtimeModel)
+			
+			simResults = simulate_using_pool(simPool, inputData, outputInfos, nruns)
+		
+		finally:
+			simPool.close()
+		
+		save_failures(simPool.failures, inputData['Input'], outDir)
 	
-	finally:
-		aspenModel.close()
-		calculator.close()
+	elif liteFile:
+		try:
+			calculator = Excel(calculatorFile)
+			tmp = TmpManager(tmpDir, outDir + '/retained', keepTmp, gzipTmp)
+			
+			simResults, liteResults, fullRuns, errors = simulate_multifidelity(aspenFile, liteFile, calculator, inputData, outputInfos, outDir, 
+																			 nfull, nruns, traversal, warmStart, tmp)
+			
+			save_fidelity_results(liteResults, fullRuns, errors, outDir)
+			
+			tmp.close()
+		
+		finally:
+			calculator.close()
+	
+	elif pipeline:
+		try:
+			calculator = Excel(calculatorFile)
+			
+			simResults, runStats, tmpUsage = simulate_using_aspen_pipelined(aspenFile, calculator, inputData, outputInfos, outDir, nruns, traversal, 
+																			warmStart, tmpDir, keepTmp, gzipTmp)
+			
+			save_run_stats(runStats, outDir)
+			save_tmp_usage(tmpUsage, outDir)
+		
+		finally:
+			calculator.close()
+	
+	else:
+		try:
+			aspenModel = Aspen(aspenFile)
+			calculator = Excel(calculatorFile)
+			tmp = TmpManager(tmpDir, outDir + '/retained', keepTmp, gzipTmp)
+			
+			recycler = None
+			if recycleEvery or maxMemory:
+				recycler = Recycler(aspenModel, calculator, recycleEvery, maxMemory)
+			
+			classifier = None
+			if feasibilityFile:
+				aspenPaths = [path for path in inputInfos['Path'] if '\\' in path]
+				classifier = FeasibilityClassifier(aspenPaths, feasibilityFile, threshold = failThreshold)
+			
+			library = None
+			if snapshotDir:
+				library = SnapshotLibrary(snapshotDir, inputInfos['Path'].tolist(), snapshotBudget)
+				
+				if importDirs:
+					library.import_files(aspenModel, [file for importDir in importDirs for file in glob('%s/*.bkp' % importDir)])
+					aspenModel.load_snapshot(aspenFile)
+
+			simResults, simInputs = simulate_using_aspen(aspenModel, calculator, inputData, outputInfos, outDir, nruns, traversal, warmStart, library, handoff, 
+														 keepBkp, tmp, recycler, classifier, resample)
+		
+			save_run_stats(aspenModel.runStats, outDir)
+			
+			tmp.close()
+			save_tmp_usage(tmp.usage(), outDir)
+			
+			if classifier is not None:
+				save_skipped_points(classifier.skipped, inputInfos['Input'].tolist(), classifier.savings(), outDir)
+		
+		finally:
+			if recycler is not None:
+				recycler.close()
+			aspenModel.close()
+			calculator.close()
 
 	
 	# save and plot results
-	save_simulation_results(simResults, outDir)
+	save_simulation_results(simResults, outDir, simInputs)
 	
 	plot_hist(simResults, outputInfos[['Output', 'Unit']], outDir)
 	
@@ -0,0 +1,84 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+r'''
+This script estimates local sensitivity (gradients and elasticities) of outputs around a baseline by finite differences, 
+inputs could be Aspen variables (Location is Aspen path) or calculator variables (Location is sheet!cell), 
+all perturbed runs are simulated in parallel
+
+Example
+python C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Scripts\sensitivity_local.py -o C:\Users\cwu\Desktop\Outputs\Aspen_automation\Results\Sugars\sensitivity_local -c C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\sens_local_config.xlsx -a C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod-lite.bkp -e C:\Share_GoogleDrive\NREL\Software\Aspen_automation\Data\Sugars\BC1707A_sugars_V10_mod.xlsm -d central -w 4
+'''
+
+
+
+import argparse
+import os
+from i_o import parse_config, save_local_sensitivity, plot_elasticities, save_failures
+from utilities import local_sensitivity
+from classes import RuntimeModel
+from parallel import open_pool
+
+
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description = 'This script estimates local sensitivity of outputs around a baseline by finite differences')
+	parser.add_argument('-o', '--outDir', type = str, required = True, help = 'output directory')
+	parser.add_argument('-c', '--configFile', type = str, required = True, help = 'config file, .xlsx')
+	parser.add_argument('-a', '--aspenFile', type = str, required = True, help = 'Aspen model file, .bkp')
+	parser.add_argument('-e', '--calculatorFile', type = str, required = True, help = 'excel calculator file, .xlsm')
+	parser.add_argument('-d', '--scheme', type = str, required = False, default = 'forward', choices = ['forward', 'central'], help = 'finite-difference scheme, "forward" costs n+1 runs, "central" costs 2n+1 runs')
+	parser.add_argument('-s', '--relStep', type = float, required = False, default = 0.01, help = 'relative step size of inputs without Step in config file')
+	parser.add_argument('-w', '--nworkers', type = int, required = False, default = 1, help = '# of Aspen/Excel workers')
+	parser.add_argument('-q', '--timeouts', type = float, nargs = 2, required = False, help = 'seconds allowed for Aspen and calculator of one run, if given, hung or crashed workers are killed and restarted and runs retried')
+	parser.add_argument('-j', '--maxRetries', type = int, required = False, default = 2, help = '# of retries of a run with -q, failed runs are NaN and listed in failed_points.tsv')
+	parser.add_argument('-t', '--timingFile', type = str, required = False, help = 'file of run times (.tsv), created if not existing, if given, runs are dispatched longest expected first and the ETA is printed')
+	args = parser.parse_args()
+	
+	outDir = args.outDir
+	configFile = args.configFile
+	aspenFile = args.aspenFile
+	calculatorFile = args.calculatorFile
+	scheme = args.scheme
+	relStep = args.relStep
+	nworkers = args.nworkers
+	
+	timeouts = args.timeouts
+	maxRetries = args.maxRetries
+	timingFile = args.timingFile
+	
+	os.makedirs(outDir, exist_ok = True)
+	
+	
+	# parse inputs and outputs
+	inputInfos, outputInfos = parse_config(configFile)
+	
+	
+	# run baseline and perturbed simulations
+	runtimeModel = RuntimeModel(inputInfos['Location'].tolist(), timingFile) if timingFile else None
+	
+	try:
+		simPool = open_pool(aspenFile, calculatorFile, outDir, nworkers, timeouts = timeouts, maxRetries = maxRetries, runtimeModel = runtimeModel)
+		
+		gradients, elasticities = local_sensitivity(inputInfos, outputInfos, simPool, scheme, relStep)
+	
+	finally:
+		simPool.close()
+	
+	
+	# save and plot results
+	save_local_sensitivity(gradients, elasticities, outDir)
+	
+	if timeouts:
+		save_failures(simPool.failures, inputInfos['Input'], outDir)
+	
+	plot_elasticities(elasticities, outDir)
+	
@@ -0,0 +1,164 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+r'''
+Tests of jobqueue.py with workers in separate processes running a fake simulation, no Aspen or Excel is needed.
+
+python -m pytest AutoAspen/test_jobqueue.py
+'''
+
+
+import time
+from multiprocessing import Process
+import numpy as np
+from jobqueue import JobQueue, QueuePool, run_worker
+
+
+INPUTS = [('\\Data\\Blocks\\R1\\Input\\TEMP', 0), ('Sheet1!B2', 0)]
+OUTPUTS = ['Sheet1!C2']
+
+
+def fake_simulate(inputs, values, outputs):
+	'''
+	Parameters
+	inputs: lst of tuples, (location, ifFortran)
+	values: lst, values of inputs, points with negative first value fail
+	outputs: lst of str, sheet!cell of outputs
+
+	Returns
+	outputValues: lst, sum of values for each output
+	'''
+
+	if values[0] < 0:
+		raise RuntimeError('Aspen did not converge')
+
+	time.sleep(0.05)
+
+	return [sum(values)] * len(outputs)
+
+
+def make_tasks(valuesList):
+
+	return [{'inputs': [list(item) for item in INPUTS], 'values': list(values), 'outputs': OUTPUTS} for values in valuesList]
+
+
+def start_workers(queue, study, nworkers = 3):
+
+	workers = [Process(target = run_worker, args = (queue, 'host:%s' % k, fake_simulate, study, 1, 0.05))
+			   for k in range(nworkers)]
+	for worker in workers:
+		worker.start()
+
+	return workers
+
+
+def join_workers(workers):
+
+	for worker in workers:
+		worker.join(60)
+		assert worker.exitcode == 0
+
+
+def test_workers_run_each_job_once(tmp_path):
+
+	queue = JobQueue(str(tmp_path/'farm.db'), leaseSeconds = 1)
+	ids = queue.add_jobs('study', make_tasks([[i, 1] for i in range(30)]))
+
+	join_workers(start_workers(queue, 'study'))
+
+	finished = queue.collect(ids)
+	assert sorted(finished) == sorted(ids)
+	assert [finished[jobId][0][0] for jobId in ids] == [i + 1 for i in range(30)]
+	assert all(attempts == 0 for _, _, attempts in finished.values())
+
+	with queue.connect() as conn:
+		workers = {worker for (worker,) in conn.execute('SELECT worker FROM results')}
+	assert len(workers) > 1
+
+
+def test_expired_lease_is_requeued(tmp_path):
+
+	queue = JobQueue(str(tmp_path/'farm.db'), leaseSeconds = 0.5, maxRetries = 2)
+	ids = queue.add_jobs('study', make_tasks([[1, 1], [2, 2]]))
+
+	jobId, _ = queue.lease('host:dead', 'study')   # the worker dies holding its lease
+	assert queue.progress('study')['leased'] == 1
+	time.sleep(0.6)
+
+	join_workers(start_workers(queue, 'study'))
+
+	finished = queue.collect(ids)
+	assert finished[jobId][0][0] == ids.index(jobId) * 2 + 2
+	assert finished[jobId][1].startswith('lease of host:dead expired')
+	assert finished[jobId][2] == 1
+	assert queue.progress('study')['done'] == 2
+
+
+def test_failed_job_retried_up_to_max_retries(tmp_path):
+
+	queue = JobQueue(str(tmp_path/'farm.db'), leaseSeconds = 1, maxRetries = 2)
+	ids = queue.add_jobs('study', make_tasks([[-1, 1], [3, 1]]))
+
+	join_workers(start_workers(queue, 'study'))
+
+	finished = queue.collect(ids)
+	outputValues, reason, attempts = finished[ids[0]]
+	assert outputValues is None
+	assert reason == 'RuntimeError: Aspen did not converge'
+	assert attempts == 3
+	assert finished[ids[1]][0][0] == 4
+
+	counts = queue.progress('study')
+	assert counts['failed'] == 1 and counts['done'] == 1
+
+
+def test_duplicate_jobs_are_added_once(tmp_path):
+
+	queue = JobQueue(str(tmp_path/'farm.db'))
+	tasks = make_tasks([[1, 1], [2, 2]])
+
+	ids = queue.add_jobs('study', tasks)
+	assert queue.add_jobs('study', tasks[::-1]) == ids[::-1]
+	assert queue.add_jobs('study', tasks + tasks) == ids + ids
+	assert queue.progress('study').sum() == 2
+
+	otherIds = queue.add_jobs('other', tasks)
+	assert not set(otherIds) & set(ids)
+	assert queue.progress().sum() == 4
+
+
+def test_workers_only_lease_their_study(tmp_path):
+
+	queue = JobQueue(str(tmp_path/'farm.db'), leaseSeconds = 1)
+	ids = queue.add_jobs('study', make_tasks([[1, 1]]))
+	otherIds = queue.add_jobs('other', make_tasks([[2, 2]]))
+
+	join_workers(start_workers(queue, 'study', nworkers = 1))
+
+	assert set(queue.collect(ids + otherIds)) == set(ids)
+	assert queue.progress('other')['pending'] == 1
+
+
+def test_queue_pool_simulate_batch(tmp_path):
+
+	queue = JobQueue(str(tmp_path/'farm.db'), leaseSeconds = 1, maxRetries = 1)
+	workers = start_workers(queue, 'study')
+
+	simPool = QueuePool(queue, 'study', pollSeconds = 0.1)
+	outputValues = simPool.simulate_batch(INPUTS, [[1, 2], [-1, 2], [3, 4], [1, 2]], OUTPUTS)
+
+	join_workers(workers)
+
+	assert outputValues.shape == (4, 1)
+	assert np.isnan(outputValues[1, 0])
+	assert outputValues[[0, 2, 3], 0].tolist() == [3, 7, 3]
+	assert simPool.failures == [{'Values': [-1.0, 2.0], 'Reason': 'RuntimeError: Aspen did not converge', 'Attempts': 2}]
+	assert queue.progress('study').sum() == 3
+
+	assert simPool.simulate(INPUTS, [3, 4], OUTPUTS).tolist() == [7]
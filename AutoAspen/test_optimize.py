@@ -0,0 +1,111 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+r'''
+Tests of optimize in utilities.py with fake Aspen and calculator objects on a known quadratic, an optimization
+is interrupted and resumed from its trace.
+
+python -m pytest AutoAspen/test_optimize.py
+'''
+
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('win32com.client')
+
+from classes import read_trace_rows
+from utilities import optimize
+
+
+OPTIMUM = np.array([0.3, 0.6, 0.2])
+
+
+class FakeAspen():
+
+	def __init__(self):
+
+		self.values = {}
+		self.converged = True
+		self.nruns = 0
+
+
+	def set_value(self, path, value, ifFortran):
+
+		self.values[path] = value
+
+
+	def run_model(self):
+
+		self.nruns += 1
+
+
+	def save_model(self, tmpFile):
+
+		with open(tmpFile, 'w') as f:
+			f.write(','.join(str(self.values[path]) for path in sorted(self.values)))
+
+
+class FakeExcel():
+
+	def __init__(self, interruptAfter = None):
+
+		self.interruptAfter = interruptAfter
+		self.nruns = 0
+
+
+	def load_aspenModel(self, tmpFile):
+
+		with open(tmpFile) as f:
+			self.x = np.array(list(map(float, f.read().split(','))))
+
+
+	def run_macro(self, name):
+
+		if self.nruns == self.interruptAfter:
+			raise KeyboardInterrupt
+		self.nruns += 1
+
+
+	def get_cell(self, sheet, loc):
+
+		return ((self.x - OPTIMUM)**2).sum() + 1
+
+
+def run(outDir, resume = False, interruptAfter = None, seed = 0):
+
+	inputInfos = pd.DataFrame({'Input': ['a', 'b', 'c'], 'Path': ['p0', 'p1', 'p2'], 'Range': ['0,1'] * 3, 'Fortran': [0] * 3})
+	outputInfos = pd.DataFrame({'Output': ['MSP'], 'Unit': ['$/GGE'], 'Location': ['Sheet1!A1']})
+
+	aspenModel = FakeAspen()
+	calculator = FakeExcel(interruptAfter)
+
+	np.random.seed(seed)   # x0 of a fresh optimization
+	solutions = optimize(inputInfos, outputInfos, aspenModel, calculator, str(outDir), resume = resume)
+
+	return solutions, aspenModel.nruns
+
+
+def test_resume_replays_interrupted_optimization(tmp_path):
+
+	solutions, nruns = run(tmp_path/'full')
+	trace = read_trace_rows(str(tmp_path/'full'/'MSP_opt.trace'), 3)
+	assert np.allclose(solutions.loc['MSP'].values[1:].astype(float), OPTIMUM, atol = 1e-2)
+
+	with pytest.raises(KeyboardInterrupt):
+		run(tmp_path/'resumed', interruptAfter = 8)
+	assert read_trace_rows(str(tmp_path/'resumed'/'MSP_opt.trace'), 3).shape[0] == 8
+
+	resumed, nrunsLeft = run(tmp_path/'resumed', resume = True, seed = 1)   # a new process draws other random numbers
+	assert nrunsLeft == nruns - 8
+
+	resumedTrace = read_trace_rows(str(tmp_path/'resumed'/'MSP_opt.trace'), 3)
+	assert np.array_equal(resumedTrace[:, :4], trace[:, :4])
+	assert resumed.equals(solutions)
@@ -7,17 +7,21 @@ __date__ = '8/26/2020'
 __version__ = '1.3'
 
 
-import os
 import re
+import time
+from math import ceil
+from itertools import product
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 from pandas import IndexSlice as idx
 from numpy.random import uniform, normal, choice
 from scipy.stats import alpha, beta, triang, pareto
+from scipy.optimize import minimize
 from pybobyqa import solve
 from classes import Scaler
-from logging import INFO, basicConfig
-from classes import Aspen, Excel
+from parallel import simulate_pipelined
+from classes import Aspen, Excel, EvaluationStore, EvaluationRecorder, ResponseCube, Simulator, TmpManager
 
 
 def generate_distribution(distName, size, *params):
@@ -109,6 +113,86 @@ def generate_input_data(inputInfos):
 	return inputData	
 
 
+def latin_hypercube(lb, ub, size):
+	'''
+	Parameters
+	lb: array, lower bounds of variables
+	ub: array, upper bounds of variables
+	size: int, # of points
+	
+	Returns
+	points: 2D array, rows are points, columns are variables, each variable has one point in each of size strata
+	'''
+	
+	lb, ub = np.asarray(lb, dtype = float), np.asarray(ub, dtype = float)
+	
+	strata = np.array([np.random.permutation(size) for _ in range(lb.size)]).T
+	points = lb + (strata + uniform(size = strata.shape)) / size * (ub - lb)
+	
+	return points
+	
+
+def quadratic_features(U):
+	'''
+	Parameters
+	U: 2D array, rows are points, columns are variables
+	
+	Returns
+	features: 2D array, columns are 1, u_i and u_i*u_j (i <= j)
+	'''
+	
+	U = np.atleast_2d(U)
+	rows, cols = np.triu_indices(U.shape[1])
+	
+	features = np.hstack([np.ones((U.shape[0], 1)), U, U[:, rows] * U[:, cols]])
+	
+	return features
+	
+
+def nondominated_sort(F):
+	'''
+	Parameters
+	F: 2D array, rows are points, columns are objectives to minimize
+	
+	Returns
+	fronts: lst of arrays, indices of points in each nondominated front, best front first
+	'''
+	
+	dominates = np.all(F[:, None, :] <= F[None, :, :], axis = 2) & np.any(F[:, None, :] < F[None, :, :], axis = 2)
+	ndominated = dominates.sum(axis = 0)
+	
+	fronts = []
+	front = np.where(ndominated == 0)[0]
+	while front.size:
+		fronts.append(front)
+		ndominated = ndominated - dominates[front].sum(axis = 0)
+		ndominated[np.concatenate(fronts)] = -1
+		front = np.where(ndominated == 0)[0]
+	
+	return fronts
+	
+	
+def crowding_distance(F):
+	'''
+	Parameters
+	F: 2D array, rows are points in one front, columns are objectives
+	
+	Returns
+	distances: array, crowding distance of points, inf for boundary points
+	'''
+	
+	npts, nobjs = F.shape
+	distances = np.zeros(npts)
+	for k in range(nobjs):
+		order = np.argsort(F[:, k])
+		span = F[order[-1], k] - F[order[0], k]
+		distances[order[[0, -1]]] = np.inf
+		if span > 0 and npts > 2:
+			distances[order[1:-1]] += (F[order[2:], k] - F[order[:-2], k]) / span
+	
+	return distances
+	
+
 def extract_input_data(inputInfos):
 	'''
 	column ['Values'] transformed into ['Data']
@@ -186,7 +270,8 @@ def simulate_using_calculator(aspenModel, calculator, inputData, outputInfos, nr
 	return outputData
 	
 	
-def simulate_using_aspen(aspenModel, calculator, inputData, outputInfos, outDir, nruns = None):
+def simulate_using_aspen(aspenModel, calculator, inputData, outputInfos, outDir, nruns = None, traversal = 'nearest', warm = False, 
+						 library = None, handoff = None, keepFiles = False, tmp = None, recycler = None, classifier = None, resample = False):
 	'''
 	Parameters
 	aspenModel: instance of Aspen class
@@ -195,15 +280,25 @@ def simulate_using_aspen(aspenModel, calculator, inputData, outputInfos, outDir,
 	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
 	nruns: int or None, # of runs
 	outDir: str, output directory
+	traversal: str, order of runs, see group_order, results keep the order of values
+	warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+	library: instance of SnapshotLibrary class or None, converged snapshots to start Aspen runs from
+	handoff: lst of tuples or None, (Aspen path, sheet!cell in calculator), results copied to calculator without saving Aspen files
+	keepFiles: bool, whether Aspen files are still saved in handoff mode
+	tmp: instance of TmpManager class or None, manager of temporary Aspen files, all files are kept in outDir/tmp if None
+	recycler: instance of Recycler class or None, recycles COM servers of aspenModel and calculator in long loops
+	classifier: instance of FeasibilityClassifier class or None, if given, runs predicted to fail are deferred to the 
+				end and skipped if still predicted to fail then, their outputs are NaN and they are listed in 
+				classifier.skipped
+	resample: bool, whether skipped runs are replaced by runs with Aspen inputs drawn again from Data until they are 
+			  predicted to converge, outputs of a replaced run are those of its replacement
 	
 	Returns
 	outputData: df, colunms are output variables, index are runs
+	inputValues: df, columns are input variables, index are runs, values each run was simulated with, those of the 
+				 replacement for replaced runs
 	'''
 	
-	tmpDir = outDir + '/tmp'
-	os.makedirs(tmpDir, exist_ok = True)
-	
-	
 	# setting
 	inputSettings = inputData.copy()
 	
@@ -213,205 +308,580 @@ def simulate_using_aspen(aspenModel, calculator, inputData, outputInfos, outDir,
 		inputSettings['Choice'] = inputSettings['Data']
 		nruns = inputSettings.loc[0, 'Choice'].size
 	
-	outputSettings = outputInfos.copy()
-	outputSettings[['Sheet', 'Cell']] = outputSettings['Location'].str.split('!', expand = True)
+	choices = np.column_stack(inputSettings['Choice'].tolist())
 	
+	aspenIdx = [j for j, path in enumerate(inputSettings['Path']) if '\\' in path]
+	runOrder, nsolves = group_order(choices, aspenIdx, traversal)
+	print('%s runs, %s Aspen solves' % (nruns, nsolves))
 	
-	# simulation
-	outputData = pd.DataFrame(index = range(nruns), columns = outputSettings['Output'])
-	count = 0
-	for i in range(nruns):
-		
-		# set ASPEN model variables
-		for _, row in inputSettings.iterrows():
-			_, path, ifFortran = row[['Input', 'Path', 'Fortran']]
-			
-			aspenModel.set_value(path, row['Choice'][i], bool(ifFortran))
+	simulator = Simulator(aspenModel, calculator, list(inputSettings[['Path', 'Fortran']].itertuples(index = False, name = None)), 
+						  outputInfos['Location'].tolist(), tmp or outDir + '/tmp', warm, library, handoff, keepFiles, recycler, 
+						  classifier)
 	
-		# run ASPEN model
-		aspenModel.run_model()
-		
-		count += 1
-		tmpFile = '%s/%s.bkp' % (tmpDir, count)
-		aspenModel.save_model(tmpFile)
-		
-		# run excel calculator
-		calculator.load_aspenModel(tmpFile)
-		calculator.run_macro('solvedcfror')
-		
+	
+	# simulation, runs predicted to fail are checked again at the end with what was learnt meanwhile
+	outputData = pd.DataFrame(index = range(nruns), columns = outputInfos['Output'])
+	deferred = []
+	for i in runOrder:
+		if classifier is not None and classifier.doomed(choices[i, aspenIdx]):
+			deferred.append(i)
+		else:
+			outputData.loc[i] = simulator.run(choices[i])
+	
+	for i in deferred:
+		if not classifier.doomed(choices[i, aspenIdx]):
+			outputData.loc[i] = simulator.run(choices[i])
+			continue
 		
-		for _, row in outputSettings.iterrows():
-			outputData.loc[i, row['Output']] = calculator.get_cell(row['Sheet'], loc = row['Cell'])
+		replacement = resample_feasible(choices[i], inputSettings['Data'].tolist(), aspenIdx, classifier) if resample else None
+		classifier.skipped.append({'Values': choices[i], 'Probability': classifier.probability(choices[i, aspenIdx]), 
+								   'Replacement': replacement})
 		
+		if replacement is not None:
+			outputData.loc[i] = simulator.run(replacement)
+			choices[i] = replacement
+	
 	outputData = outputData.astype(np.float)
+	inputValues = pd.DataFrame(choices, columns = inputSettings['Input'])
 	
 	
-	return outputData
+	return outputData, inputValues
 		
 
-def response_using_calculator(aspenModel, calculator, inputData, outputInfos):
+def resample_feasible(x, dataList, aspenIdx, classifier, maxTries = 100):
 	'''
 	Parameters
-	aspenModel: instance of Aspen class
+	x: array, values of inputs of a run predicted to fail
+	dataList: lst of arrays, data of each input to draw from
+	aspenIdx: lst, index of Aspen inputs
+	classifier: instance of FeasibilityClassifier class
+	maxTries: int, max # of draws
+	
+	Returns
+	newX: array or None, values of inputs with Aspen inputs drawn again, None if all draws are predicted to fail
+	'''
+	
+	for _ in range(maxTries):
+		newX = np.array(x, dtype = float)
+		newX[aspenIdx] = [choice(dataList[j]) for j in aspenIdx]
+		
+		if not classifier.doomed(newX[aspenIdx]):
+			return newX
+	
+	return None
+		
+		
+def simulate_using_aspen_pipelined(aspenFile, calculator, inputData, outputInfos, outDir, nruns = None, traversal = 'nearest', 
+								   warm = False, tmpDir = None, keep = None, compress = False):
+	'''
+	Same as simulate_using_aspen, but Aspen solves the next run in a separate process while calculator processes the 
+	current run, so each run costs about the longer of the two instead of their sum
+	
+	Parameters
+	aspenFile: str, Aspen model file
 	calculator: instance of Excel class
-	inputData: df, input data for sensitivity_AspenVars, columns are ['Input', 'Unit', 'Location', 'Data']
+	inputData: df, input data for sensitivity_AspenVars, columns are ['Input', 'Path', 'Fortran', 'Data']
 	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
+	outDir: str, output directory
+	nruns: int or None, # of runs
+	traversal: str, 'given' or 'nearest', see simulate_using_aspen
+	warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+	tmpDir: str or None, directory of temporary Aspen files, outDir/tmp if None
+	keep: int or None, # of most recent temporary Aspen files kept, all kept if None, files of failed runs are retained 
+		  in outDir/retained
+	compress: bool, whether retained files are gzipped
 	
 	Returns
-	simResults: dict, keys are 'output+unit', values are df,
-	for 2 input variables, index are 1st var values, columns are 2nd var values, index.name is '1stVar+unit,2ndVar+unit'
-	for 3 input variables, index are 1st var values, columns are multiIndex with 2nd and 3rd var values, index.name is '1stVar+unit,2ndVar+unit,3rdVar+unit'
+	outputData: df, colunms are output variables, index are runs
+	runStats: lst of dict, stats of Aspen runs
+	tmpUsage: dict, usage of temporary Aspen files, see TmpManager.usage
 	'''
 	
-	# setting
-	inputSettings = inputData.copy()
-	inputSettings[['Sheet', 'Cell']] = inputSettings['Location'].str.split('!', expand = True)
-	inputSettings['Unit'].fillna('', inplace = True)
+	if nruns:
+		choices = np.column_stack([choice(data, size = nruns, replace = False) for data in inputData['Data']])
+	else:
+		choices = np.column_stack(inputData['Data'].tolist())
 	
-	outputSettings = outputInfos.copy()
-	outputSettings[['Sheet', 'Cell']] = outputSettings['Location'].str.split('!', expand = True)
-	outputSettings['Unit'].fillna('', inplace = True)
+	aspenIdx = [j for j, path in enumerate(inputData['Path']) if '\\' in path]
+	runOrder, nsolves = group_order(choices, aspenIdx, traversal)
+	print('%s runs, %s Aspen solves' % (choices.shape[0], nsolves))
 	
-	# simulation
-	simResults = {}
-	for _, row in outputSettings.iterrows():
-		outputID = row['Output'] + ' (%s)' % row['Unit']
+	outputValues, runStats, tmpUsage = simulate_pipelined(aspenFile, calculator, list(inputData[['Path', 'Fortran']].itertuples(index = False, name = None)), 
+														  choices, outputInfos['Location'].tolist(), tmpDir or outDir + '/tmp', runOrder, warm = warm, 
+														  retainDir = outDir + '/retained', keep = keep, compress = compress)
+	
+	outputData = pd.DataFrame(outputValues, columns = outputInfos['Output'])
+	
+	
+	return outputData, runStats, tmpUsage
+	
+	
+def simulate_multifidelity(aspenFile, liteFile, calculator, inputData, outputInfos, outDir, nfull, nruns = None, traversal = 'nearest', 
+						   warm = False, tmp = None):
+	'''
+	All runs are simulated with the lite Aspen model and nfull runs spread over the input space with the full model. 
+	For each output, the full value is modelled as a linear function of the lite value plus a correction in the inputs, 
+	quadratic or linear if there are at least twice as many converged full runs as its terms and none otherwise, fitted 
+	to the full runs by least squares. Outputs of the other runs are predicted from their lite values, and are NaN if 
+	fewer than two full runs converged.
+	
+	Parameters
+	aspenFile: str, full Aspen model file
+	liteFile: str, lite Aspen model file
+	calculator: instance of Excel class
+	inputData: df, input data for sensitivity_AspenVars, columns are ['Input', 'Path', 'Fortran', 'Data']
+	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
+	outDir: str, output directory
+	nfull: int, # of runs simulated with the full model
+	nruns: int or None, # of runs
+	traversal: str, order of runs, see group_order
+	warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+	tmp: instance of TmpManager class or None, manager of temporary Aspen files
+	
+	Returns
+	outputData: df, colunms are output variables, index are runs, simulated for full runs and predicted for the others
+	liteData: df, outputs of the lite model, colunms are output variables, index are runs
+	fullRuns: array, index of runs simulated with the full model
+	errors: df, index are outputs, columns are ['Lite RMSE', 'Corrected RMSE'], errors against full runs, the 
+			corrected by leave-one-out, NaN if the fit without one run is underdetermined
+	'''
+	
+	if nruns:
+		choices = np.column_stack([choice(data, size = nruns, replace = False) for data in inputData['Data']])
+	else:
+		choices = np.column_stack(inputData['Data'].tolist())
+	
+	fullRuns = np.sort(maximin_subset(choices, min(nfull, choices.shape[0])))
+	
+	def simulate(file, X):
 		
-		if inputSettings.shape[0] == 2:
-			outputData = pd.DataFrame(index = inputSettings.loc[0, 'Data'], columns = inputSettings.loc[1, 'Data'])
-		elif inputSettings.shape[0] == 3:
-			mutiIdx = pd.MultiIndex.from_product([inputSettings.loc[1, 'Data'], inputSettings.loc[2, 'Data']])
-			outputData = pd.DataFrame(index = inputSettings.loc[0, 'Data'], columns = mutiIdx)
-		else:
-			raise ValueError('Only 2-3 input variables are acceptable')
+		aspenModel = Aspen(file)
+		try:
+			runData = inputData.copy()
+			runData['Data'] = list(X.T)
 			
-		outputData.index.name = ','.join(inputSettings['Input'] + ' (' + inputSettings['Unit'] + ')')
+			return simulate_using_aspen(aspenModel, calculator, runData, outputInfos, outDir, traversal = traversal, warm = warm, tmp = tmp)[0]
 		
-		simResults[outputID] = outputData
+		finally:
+			aspenModel.close()
+	
+	print('lite model:')
+	liteData = simulate(liteFile, choices)
+	
+	print('full model:')
+	fullData = simulate(aspenFile, choices[fullRuns])
+	
+	
+	# correction
+	span = choices.max(axis = 0) - choices.min(axis = 0)
+	U = (choices - choices.min(axis = 0)) / np.where(span > 0, span, 1)
+	
+	outputData = pd.DataFrame(index = range(choices.shape[0]), columns = outputInfos['Output'], dtype = float)
+	errors = pd.DataFrame(index = outputInfos['Output'], columns = ['Lite RMSE', 'Corrected RMSE'], dtype = float)
+	for output in outputInfos['Output']:
+		yLite = liteData[output].values
+		yFull = fullData[output].values
 		
-	for var1value in inputSettings.loc[0, 'Data']:
-		var1sheet, var1cell = inputSettings.loc[0, ['Sheet', 'Cell']]
-		calculator.set_cell(var1value, var1sheet, loc = var1cell)
+		valid = ~np.isnan(yLite[fullRuns]) & ~np.isnan(yFull)
+		Ufit, yLiteFit, yFullFit = U[fullRuns][valid], yLite[fullRuns][valid], yFull[valid]
 		
-		for var2value in inputSettings.loc[1, 'Data']:
-			var2sheet, var2cell = inputSettings.loc[1, ['Sheet', 'Cell']]
-			calculator.set_cell(var2value, var2sheet, loc = var2cell)
+		nterms = {terms: correction_features(U[:1], yLite[:1], terms).shape[1] for terms in ['quadratic', 'linear', 'lite']}
+		terms = next((terms for terms in ['quadratic', 'linear'] if yFullFit.size >= 2 * nterms[terms]), 'lite')
 		
-			if inputSettings.shape[0] == 3:
-				for k in range(inputSettings.loc[2, 'Data'].size):
-					var3value = inputSettings.loc[2, 'Data'][k]
-					var3sheet, var3cell = inputSettings.loc[2, ['Sheet', 'Cell']]
-					calculator.set_cell(var3value, var3sheet, loc = var3cell)
-			
-					calculator.load_aspenModel(aspenModel.file)
-					calculator.run_macro('solvedcfror')
-					
-					for _, row in outputSettings.iterrows():
-						outputID = row['Output'] + ' (%s)' % row['Unit']
-						simResults[outputID].loc[idx[var1value], idx[var2value, var3value]] = \
-						calculator.get_cell(row['Sheet'], loc = row['Cell'])
-			
-			else:
-				calculator.load_aspenModel(aspenModel.file)
-				calculator.run_macro('solvedcfror')
-				
-				for _, row in outputSettings.iterrows():
-					outputID = row['Output'] + ' (%s)' % row['Unit']
-					simResults[outputID].loc[var1value, var2value] = calculator.get_cell(row['Sheet'], loc = row['Cell'])
-			
+		if yFullFit.size < nterms[terms]:
+			print('%s: %s of %s full runs converged, outputs of other runs not predicted' % (output, yFullFit.size, fullRuns.size))
+			outputData[output] = np.nan
+			outputData.loc[fullRuns, output] = yFull
+			errors.loc[output] = [np.sqrt(np.mean((yFullFit - yLiteFit)**2)) if yFullFit.size else np.nan, np.nan]
+			continue
+		
+		coef = fit_correction(Ufit, yLiteFit, yFullFit, terms)
+		
+		outputData[output] = correction_features(U, yLite, terms) @ coef
+		outputData.loc[fullRuns, output] = yFull
+		
+		looErrors = [yFullFit[i] - correction_features(Ufit[[i]], yLiteFit[[i]], terms) @ 
+					 fit_correction(np.delete(Ufit, i, axis = 0), np.delete(yLiteFit, i), np.delete(yFullFit, i), terms) 
+					 for i in range(yFullFit.size)] if yFullFit.size > nterms[terms] else np.nan
+		errors.loc[output] = [np.sqrt(np.mean((yFullFit - yLiteFit)**2)), np.sqrt(np.mean(np.square(looErrors)))]
 	
-	return simResults
-			
-			
-def response_using_aspen(aspenModel, calculator, inputData, outputInfos, outDir):
+	print('%s lite runs, %s full runs' % (choices.shape[0], fullRuns.size))
+	
+	
+	return outputData, liteData, fullRuns, errors
+	
+	
+def correction_features(U, yLite, terms):
+	'''
+	Parameters
+	U: 2D array, scaled inputs, rows are runs
+	yLite: array, output values of the lite model
+	terms: str, correction in inputs, 'quadratic', 'linear' or 'lite' for an intercept only
+	
+	Returns
+	features: 2D array, columns are terms of correction in inputs and the lite value
+	'''
+	
+	U = np.atleast_2d(U)
+	if terms == 'quadratic':
+		inputFeatures = quadratic_features(U)
+	elif terms == 'linear':
+		inputFeatures = np.hstack([np.ones((U.shape[0], 1)), U])
+	else:
+		inputFeatures = np.ones((U.shape[0], 1))
+	
+	return np.hstack([inputFeatures, np.reshape(yLite, (-1, 1))])
+	
+	
+def fit_correction(U, yLite, yFull, terms):
+	'''
+	Parameters
+	U: 2D array, scaled inputs of full runs
+	yLite: array, output values of the lite model at full runs
+	yFull: array, output values of the full model
+	terms: str, see correction_features
+	
+	Returns
+	coef: array, coefficients of correction_features
+	'''
+	
+	return np.linalg.lstsq(correction_features(U, yLite, terms), yFull, rcond = None)[0]
+	
+	
+def simulate_using_pool(simPool, inputData, outputInfos, nruns = None):
+	'''
+	Same as simulate_using_aspen, but runs are dispatched to the workers of simPool, e.g. an instance of SupervisedPool 
+	class so hung or crashed runs are retried and finally left as NaN
+	
+	Parameters
+	simPool: instance of SimulationPool or SupervisedPool class
+	inputData: df, input data for sensitivity_AspenVars, columns are ['Input', 'Path', 'Fortran', 'Data']
+	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
+	nruns: int or None, # of runs
+	
+	Returns
+	outputData: df, colunms are output variables, index are runs
+	'''
+	
+	if nruns:
+		choices = np.column_stack([choice(data, size = nruns, replace = False) for data in inputData['Data']])
+	else:
+		choices = np.column_stack(inputData['Data'].tolist())
+	
+	outputValues = simPool.simulate_batch(list(inputData[['Path', 'Fortran']].itertuples(index = False, name = None)), choices, 
+										  outputInfos['Location'].tolist())
+	
+	outputData = pd.DataFrame(outputValues, columns = outputInfos['Output'])
+	
+	
+	return outputData
+	
+	
+def grid_order(shape, loopOrder = None, path = 'serpentine'):
+	'''
+	Parameters
+	shape: tuple, # of values of each input variable
+	loopOrder: lst or None, index of input variables from the outermost loop to the innermost loop, 
+			   in order of input variables by default
+	path: str, 'nested' restarts inner loops from their first value whenever an outer loop advances, 'serpentine' 
+		  reverses inner loops instead (reflected Gray code), so consecutive points differ in one variable by one step
+	
+	Returns
+	positions: generator of tuples, grid positions
 	'''
+	
+	loopOrder = list(range(len(shape))) if loopOrder is None else list(loopOrder)
+	sizes = [shape[i] for i in loopOrder]
+	
+	for loopPos in product(*[range(size) for size in sizes]):
+		if path == 'serpentine':
+			reflected = []
+			for p, size in zip(loopPos, sizes):
+				reflected.append(size - 1 - p if sum(reflected) % 2 else p)
+			loopPos = reflected
+		
+		pos = [0] * len(shape)
+		for i, p in zip(loopOrder, loopPos):
+			pos[i] = p
+		
+		yield tuple(pos)
+	
+	
+def group_order(X, aspenIdx, traversal = 'nearest'):
+	'''
+	Groups runs by the unique values of Aspen inputs, runs of a group are consecutive so Aspen is solved once per 
+	group and only calculator inputs change within it
+	
+	Parameters
+	X: 2D array, rows are runs, columns are inputs
+	aspenIdx: lst, index of columns of Aspen inputs
+	traversal: str, 'given' visits groups in order of their first runs, 'nearest' along a nearest-neighbour tour 
+			   through values of Aspen inputs, so each Aspen run starts close to the previous converged state
+	
+	Returns
+	order: array, index of runs in order of simulation, runs of a group keep their given order
+	ngroups: int, # of groups, i.e. # of Aspen solves
+	'''
+	
+	X = np.asarray(X, dtype = float)
+	
+	if not aspenIdx:
+		return np.arange(X.shape[0]), min(X.shape[0], 1)
+	
+	aspenValues = X[:, aspenIdx]
+	_, first, inverse = np.unique(aspenValues, axis = 0, return_index = True, return_inverse = True)
+	inverse = inverse.ravel()
+	
+	groups = np.argsort(first)
+	if traversal == 'nearest':
+		groups = groups[nearest_neighbour_order(aspenValues[first[groups]])]
+	
+	rank = np.empty_like(groups)
+	rank[groups] = np.arange(groups.size)
+	order = np.argsort(rank[inverse], kind = 'stable')
+	
+	return order, groups.size
+	
+	
+def maximin_subset(X, k):
+	'''
+	Greedy maximin selection of points with inputs scaled to [0, 1], each point picked is the farthest from those 
+	picked before, starting from the point nearest the center
+	
+	Parameters
+	X: 2D array, rows are points, columns are inputs
+	k: int, # of points to pick
+	
+	Returns
+	picked: array, index of picked points in order of picking
+	'''
+	
+	X = np.asarray(X, dtype = float)
+	span = X.max(axis = 0) - X.min(axis = 0)
+	U = (X - X.min(axis = 0)) / np.where(span > 0, span, 1)
+	
+	picked = [int(np.argmin(np.linalg.norm(U - 0.5, axis = 1)))]
+	dists = np.linalg.norm(U - U[picked[0]], axis = 1)
+	for _ in range(k - 1):
+		farthest = int(np.argmax(dists))
+		picked.append(farthest)
+		dists = np.minimum(dists, np.linalg.norm(U - U[farthest], axis = 1))
+	
+	return np.array(picked[:k])
+	
+	
+def nearest_neighbour_order(X, start = 0):
+	'''
+	Greedy nearest-neighbour tour through points with inputs scaled to [0, 1]
+	
+	Parameters
+	X: 2D array, rows are points, columns are inputs
+	start: int, index of the first point
+	
+	Returns
+	order: array, index of points in order of visit
+	'''
+	
+	X = np.asarray(X, dtype = float)
+	span = X.max(axis = 0) - X.min(axis = 0)
+	U = (X - X.min(axis = 0)) / np.where(span > 0, span, 1)
+	
+	order = [start]
+	left = np.ones(U.shape[0], dtype = bool)
+	left[start] = False
+	for _ in range(U.shape[0] - 1):
+		dists = np.abs(U - U[order[-1]]).sum(axis = 1)
+		dists[~left] = np.inf
+		
+		nearest = int(np.argmin(dists))
+		order.append(nearest)
+		left[nearest] = False
+	
+	return np.array(order)
+	
+	
+def response_grid(aspenModel, calculator, inputData, outputInfos, outDir, loopOrder = None, path = 'serpentine', warm = False, 
+				  library = None, handoff = None, keepFiles = False, tmp = None, recycler = None):
+	'''
+	Full-factorial response over any number of input variables. Grid points are visited in loopOrder along path, 
+	the serpentine path keeps each Aspen run close to the previous converged state. Only variables whose values change 
+	are set again, and Aspen is run only when an Aspen variable changes, so by default Aspen variables are the outer 
+	loops and Aspen is solved once per combination of their values. Results are written 
+	into outDir/response_cube.npy as they finish, points already simulated there are skipped so an interrupted run 
+	continues where it stopped.
+	
 	Parameters
 	aspenModel: instance of Aspen class
 	calculator: instance of Excel class
-	inputData: df, input data for sensitivity_AspenVars, columns are ['Input', 'Unit', 'Location', 'Fortran', 'Data']
+	inputData: df, input data, columns are ['Input', 'Unit', 'Location', 'Data'] and optionally ['Fortran'], 
+			   Location is Aspen path or sheet!cell in calculator
 	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
 	outDir: str, output directory
+	loopOrder: lst or None, index of input variables from the outermost loop to the innermost loop, Aspen variables 
+			   first by default
+	path: str, 'nested' or 'serpentine', see grid_order
+	warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+	library: instance of SnapshotLibrary class or None, converged snapshots to start Aspen runs from
+	handoff: lst of tuples or None, (Aspen path, sheet!cell in calculator), results copied to calculator without saving Aspen files
+	keepFiles: bool, whether Aspen files are still saved in handoff mode
+	tmp: instance of TmpManager class or None, manager of temporary Aspen files, all files are kept in outDir/tmp if None
+	recycler: instance of Recycler class or None, recycles COM servers of aspenModel and calculator in long loops
 	
 	Returns
-	simResults: dict, keys are 'output+unit', values are df,
-	for 2 input variables, index are 1st var values, columns are 2nd var values, index.name is '1stVar+unit,2ndVar+unit'
-	for 3 input variables, index are 1st var values, columns are multiIndex with 2nd and 3rd var values, index.name is '1stVar+unit,2ndVar+unit,3rdVar+unit'
+	cube: instance of ResponseCube class
 	'''
 	
-	tmpDir = outDir + '/tmp'
-	os.makedirs(tmpDir, exist_ok = True)
-	
 	# setting
+	inputSettings, outputSettings = response_settings(inputData, outputInfos)
+	
+	if inputSettings.shape[0] < 2:
+		raise ValueError('At least 2 input variables are required')
+	
+	axes = list(zip(inputSettings['ID'], inputSettings['Data']))
+	cube = ResponseCube(outDir + '/response_cube.npy', axes, outputSettings['ID'])
+	
+	simulator = Simulator(aspenModel, calculator, list(inputSettings[['Location', 'Fortran']].itertuples(index = False, name = None)), 
+						  outputSettings['Location'].tolist(), tmp or outDir + '/tmp', warm, library, handoff, keepFiles, recycler)
+	
+	if loopOrder is None:
+		loopOrder = sorted(range(inputSettings.shape[0]), key = lambda j: '\\' not in inputSettings['Location'].iloc[j])
+	
+	# simulation
+	for pos in grid_order(cube.shape, loopOrder, path):
+		if cube.done(pos):
+			continue
+		
+		values = [data[p] for data, p in zip(inputSettings['Data'], pos)]
+		cube.set(pos, simulator.run(values))
+	
+	
+	return cube
+	
+	
+def response_settings(inputData, outputInfos):
+	'''
+	Parameters
+	inputData: df, input data, columns are ['Input', 'Unit', 'Location', 'Data'] and optionally ['Fortran']
+	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
+	
+	Returns
+	inputSettings: df, columns are ['Input', 'Unit', 'Location', 'Data', 'Fortran', 'ID'], ID is 'input (unit)'
+	outputSettings: df, columns are ['Output', 'Unit', 'Location', 'ID'], ID is 'output (unit)'
+	'''
+	
 	inputSettings = inputData.copy()
-	inputSettings['Unit'].fillna('', inplace = True)
+	inputSettings['Unit'] = inputSettings['Unit'].fillna('')
+	if 'Fortran' not in inputSettings:
+		inputSettings['Fortran'] = 0
+	inputSettings['ID'] = inputSettings['Input'] + ' (' + inputSettings['Unit'] + ')'
 	
 	outputSettings = outputInfos.copy()
-	outputSettings[['Sheet', 'Cell']] = outputSettings['Location'].str.split('!', expand = True)
-	outputSettings['Unit'].fillna('', inplace = True)
+	outputSettings['Unit'] = outputSettings['Unit'].fillna('')
+	outputSettings['ID'] = outputSettings['Output'] + ' (' + outputSettings['Unit'] + ')'
 	
-	# simulation
-	simResults = {}
-	for _, row in outputSettings.iterrows():
-		outputID = row['Output'] + ' (%s)' % row['Unit']
+	return inputSettings, outputSettings
+	
+	
+def response_adaptive(aspenModel, calculator, inputData, outputInfos, outDir, budget, tol = 0.02, ncoarse = 3, maxDepth = 6, warm = False, 
+					  library = None, handoff = None, keepFiles = False, tmp = None, recycler = None):
+	'''
+	Adaptive response over 2 input variables within the range of their values. Starts from a coarse ncoarse x ncoarse 
+	grid, then repeatedly splits the cell with the largest error estimate of the first output into 4 cells, until 
+	no cell exceeds tol or budget runs are used. The error estimate of a cell is the larger of the range of its corner 
+	values (gradient estimate) and the error of bilinear interpolation at the center of its parent cell, both relative 
+	to the range of all simulated values.
+	
+	Parameters
+	aspenModel: instance of Aspen class
+	calculator: instance of Excel class
+	inputData: df, input data, columns are ['Input', 'Unit', 'Location', 'Data'] and optionally ['Fortran'], 
+			   Location is Aspen path or sheet!cell in calculator
+	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
+	outDir: str, output directory
+	budget: int, maximal # of runs
+	tol: float, relative tolerance of cell error estimate
+	ncoarse: int, # of values of each input variable in the coarse grid
+	maxDepth: int, maximal # of splits of a coarse cell
+	warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+	library: instance of SnapshotLibrary class or None, converged snapshots to start Aspen runs from
+	handoff: lst of tuples or None, (Aspen path, sheet!cell in calculator), results copied to calculator without saving Aspen files
+	keepFiles: bool, whether Aspen files are still saved in handoff mode
+	tmp: instance of TmpManager class or None, manager of temporary Aspen files, all files are kept in outDir/tmp if None
+	recycler: instance of Recycler class or None, recycles COM servers of aspenModel and calculator in long loops
+	
+	Returns
+	points: df, columns are inputs + outputs in format of 'var (unit)', rows are scattered simulated points
+	'''
+	
+	# setting
+	inputSettings, outputSettings = response_settings(inputData, outputInfos)
+	
+	if inputSettings.shape[0] != 2:
+		raise ValueError('Only 2 input variables are acceptable')
+	
+	(xlb, xub), (ylb, yub) = [(data.min(), data.max()) for data in inputSettings['Data']]
+	
+	simulator = Simulator(aspenModel, calculator, list(inputSettings[['Location', 'Fortran']].itertuples(index = False, name = None)), 
+						  outputSettings['Location'].tolist(), tmp or outDir + '/tmp', warm, library, handoff, keepFiles, recycler)
+	
+	results = {}
+	def evaluate(x, y):
 		
-		if inputSettings.shape[0] == 2:
-			outputData = pd.DataFrame(index = inputSettings.loc[0, 'Data'], columns = inputSettings.loc[1, 'Data'])
-		elif inputSettings.shape[0] == 3:
-			mutiIdx = pd.MultiIndex.from_product([inputSettings.loc[1, 'Data'], inputSettings.loc[2, 'Data']])
-			outputData = pd.DataFrame(index = inputSettings.loc[0, 'Data'], columns = mutiIdx)
-		else:
-			raise ValueError('Only 2-3 input variables are acceptable')
+		key = (round(x, 12), round(y, 12))
+		if key not in results:
+			results[key] = simulator.run(key)
 			
-		outputData.index.name = ','.join(inputSettings['Input'] + ' (' + inputSettings['Unit'] + ')')
+		return results[key][0]
+	
+	def corners(cell):
 		
-		simResults[outputID] = outputData
+		x0, y0, x1, y1, _, _ = cell
+		
+		return [evaluate(x, y) for x, y in [(x0, y0), (x1, y0), (x0, y1), (x1, y1)]]
 	
-	count = 0
-	for var1value in inputSettings.loc[0, 'Data']:
-		var1path, var1ifFortran = inputSettings.loc[0, ['Location', 'Fortran']]
-		aspenModel.set_value(var1path, var1value, bool(var1ifFortran))
-		
-		for var2value in inputSettings.loc[1, 'Data']:
-			var2path, var2ifFortran = inputSettings.loc[1, ['Location', 'Fortran']]
-			aspenModel.set_value(var2path, var2value, bool(var2ifFortran))
-			
-			if inputSettings.shape[0] == 3:
-				for var3value in inputSettings.loc[2, 'Data']:
-					var3path, var3ifFortran = inputSettings.loc[2, ['Location', 'Fortran']]
-					aspenModel.set_value(var3path, var3value, bool(var3ifFortran))
-					
-					aspenModel.run_model()
-					
-					count += 1
-					tmpFile = '%s/%s.bkp' % (tmpDir, count)
-					aspenModel.save_model(tmpFile)
-					
-					calculator.load_aspenModel(tmpFile)
-					calculator.run_macro('solvedcfror')
-					
-					for _, row in outputSettings.iterrows():
-						outputID = row['Output'] + ' (%s)' % row['Unit']
-						simResults[outputID].loc[idx[var1value], idx[var2value, var3value]] = \
-						calculator.get_cell(row['Sheet'], loc = row['Cell'])
-			
-			else:
-				aspenModel.run_model()
+	# coarse grid, serpentine so consecutive Aspen runs are close
+	xs, ys = np.linspace(xlb, xub, ncoarse), np.linspace(ylb, yub, ncoarse)
+	for i, x in enumerate(xs):
+		for y in (ys if i % 2 == 0 else ys[::-1]):
+			evaluate(x, y)
+	
+	# cells are (x0, y0, x1, y1, depth, interpolation error at center of parent)
+	cells = [(xs[i], ys[j], xs[i+1], ys[j+1], 0, 0) for i in range(ncoarse-1) for j in range(ncoarse-1)]
+	
+	while len(results) < budget:
+		values = np.array([outputValues[0] for outputValues in results.values()])
+		zrange = np.nanmax(values) - np.nanmin(values) or 1
 		
-				count += 1
-				tmpFile = '%s/%s.bkp' % (tmpDir, count)
-				aspenModel.save_model(tmpFile)
-				
-				calculator.load_aspenModel(tmpFile)
-				calculator.run_macro('solvedcfror')
+		errors = [max(np.ptp(corners(cell)), cell[5]) / zrange if cell[4] < maxDepth else 0 for cell in cells]
+		k = int(np.nanargmax(errors)) if not np.isnan(errors).all() else 0
+		if errors[k] <= tol:
+			break
+		
+		x0, y0, x1, y1, depth, _ = cells.pop(k)
+		xm, ym = (x0 + x1) / 2, (y0 + y1) / 2
+		
+		# split only if the new center and edge midpoints fit into the budget
+		newPoints = [(x, y) for x, y in [(xm, y0), (x1, ym), (xm, ym), (x0, ym), (xm, y1)] if (round(x, 12), round(y, 12)) not in results]
+		if len(results) + len(newPoints) > budget:
+			break
 		
-				for _, row in outputSettings.iterrows():
-					outputID = row['Output'] + ' (%s)' % row['Unit']
-					simResults[outputID].loc[var1value, var2value] = calculator.get_cell(row['Sheet'], loc = row['Cell'])
+		interpError = abs(evaluate(xm, ym) - np.mean(corners((x0, y0, x1, y1, depth, 0))))
+		for x, y in newPoints:
+			evaluate(x, y)
+		
+		cells += [(x0, y0, xm, ym, depth+1, interpError), (xm, y0, x1, ym, depth+1, interpError), 
+				  (x0, ym, xm, y1, depth+1, interpError), (xm, ym, x1, y1, depth+1, interpError)]
+		
+		print('%s runs, largest relative cell error %.4f' % (len(results), errors[k]))
 	
-	return simResults
-
-
-def response_using_aspen_and_calculator_2D(aspenModel, calculator, inputData, outputInfos, outDir):
+	points = pd.DataFrame([list(key) + outputValues.tolist() for key, outputValues in results.items()], 
+						  columns = inputSettings['ID'].tolist() + outputSettings['ID'].tolist())
+	
+	
+	return points
+	
+	
+def response_using_aspen_and_calculator_2D(aspenModel, calculator, inputData, outputInfos, outDir, warm = False, tmp = None):
 	'''
 	Parameters
 	aspenModel: instance of Aspen class
@@ -419,13 +889,14 @@ def response_using_aspen_and_calculator_2D(aspenModel, calculator, inputData, ou
 	inputData: df, input data for sensitivity_AspenVars, columns are ['Input', 'Unit', 'Location', 'Fortran', 'Data']
 	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
 	outDir: str, output directory
+	warm: bool, whether Aspen runs start from the previous converged state when inputs change little
+	tmp: instance of TmpManager class or None, manager of temporary Aspen files, all files are kept in outDir/tmp if None
 	
 	Returns
 	simResults: dict, keys are 'output+unit', values are df, index are aspenVar values, columns are nonaspenVar values, index.name is 'nonaspenVar+unit,aspenVar+unit'
 	'''
 	
-	tmpDir = outDir + '/tmp'
-	os.makedirs(tmpDir, exist_ok = True)
+	tmp = tmp or TmpManager(outDir + '/tmp')
 	
 	
 	# setting
@@ -447,19 +918,9 @@ def response_using_aspen_and_calculator_2D(aspenModel, calculator, inputData, ou
 	outputSettings['Unit'].fillna('', inplace = True)
 	
 	
-	# simulation
-	simResults = {}
-	for _, row in outputSettings.iterrows():
-		outputID = row['Output'] + ' (%s)' % row['Unit']
-		
-		outputData = pd.DataFrame(0, index = aspenVarValues, columns = nonaspenVarValues)
-		nonaspenVarID = nonaspenVar + (' (%s)' % nonaspenVarUnit if nonaspenVarUnit else '')
-		aspenVarID = aspenVar + (' (%s)' % aspenVarUnit if aspenVarUnit else '')
-		outputData.index.name = nonaspenVarID + ',' + aspenVarID
-		
-		simResults[outputID] = outputData
+	# simulation, results are indexed by grid position
+	results = np.full((outputSettings.shape[0], aspenVarValues.size, nonaspenVarValues.size), np.nan)
 	
-	count = 0
 	for i in range(aspenVarValues.size):
 	
 		# set ASPEN model variable
@@ -467,11 +928,11 @@ def response_using_aspen_and_calculator_2D(aspenModel, calculator, inputData, ou
 		aspenModel.set_value(aspenPath, aspenVarValue, bool(ifFortran))
 		
 		# run ASPEN model
-		aspenModel.run_model()
+		aspenModel.run_model(warm = warm)
 
-		count += 1
-		tmpFile = '%s/%s.bkp' % (tmpDir, count)
+		tmpFile = tmp.new_file()
 		aspenModel.save_model(tmpFile)
+		tmp.done(tmpFile, failed = not aspenModel.converged)
 		
 		for j in range(nonaspenVarValues.size):
 			
@@ -484,29 +945,49 @@ def response_using_aspen_and_calculator_2D(aspenModel, calculator, inputData, ou
 			calculator.run_macro('solvedcfror')
 			
 			
-			for _, row in outputSettings.iterrows():
-				outputID = row['Output'] + ' (%s)' % row['Unit']
-				simResults[outputID].iloc[i, j] = calculator.get_cell(row['Sheet'], loc = row['Cell'])
+			results[:, i, j] = [calculator.get_cell(sheet, loc = cell) for sheet, cell in outputSettings[['Sheet', 'Cell']].values]
+	
+	simResults = {}
+	for (_, row), values in zip(outputSettings.iterrows(), results):
+		outputID = row['Output'] + ' (%s)' % row['Unit']
+		
+		outputData = pd.DataFrame(values, index = aspenVarValues, columns = nonaspenVarValues)
+		nonaspenVarID = nonaspenVar + (' (%s)' % nonaspenVarUnit if nonaspenVarUnit else '')
+		aspenVarID = aspenVar + (' (%s)' % aspenVarUnit if aspenVarUnit else '')
+		outputData.index.name = nonaspenVarID + ',' + aspenVarID
+		
+		simResults[outputID] = outputData
 	
 		
 	return simResults	
 
 
-def optimize(inputInfos, outputInfos, aspenModel, calculator, outDir):	
+def optimize(inputInfos, outputInfos, aspenModel, calculator, outDir, store = None, resume = False, tmp = None, recycler = None):	
 	'''
+	Every simulation records all outputs in store, so evaluations at inputs simulated before are answered from store, 
+	and the optimization of each output after the first starts from the best stored inputs for that output.
+	Evaluations of each output are recorded in outDir/output_opt.trace. If resume, an interrupted optimization 
+	restarts from the first recorded inputs and recorded evaluations are replayed without running Aspen. BOBYQA builds 
+	its initial interpolation set along coordinate directions rather than random ones, so the resumed optimization asks 
+	for the recorded inputs in the recorded order.
+	
 	Parameters
 	inputInfos: df, input infos for optimization, columns are ['Input', 'Path', 'Range', 'Fortran']
 	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
 	aspenModel: instance of Aspen class
 	calculator: instance of Excel class
 	outDir: str, output directory
+	store: instance of EvaluationStore class or None, shared evaluations of all outputs
+	resume: bool, whether to replay recorded evaluations
+	tmp: instance of TmpManager class or None, manager of temporary Aspen files, all files are kept in outDir/tmp if None, 
+	     the Aspen file of the best evaluation of each output is retained as output_opt.bkp
+	recycler: instance of Recycler class or None, recycles COM servers of aspenModel and calculator in long loops
 	
 	Returns
 	solutions: df, index are outputs, index are ['Objective'] + inputs
 	'''
 	
-	tmpDir = outDir + '/tmp'
-	os.makedirs(tmpDir, exist_ok = True)
+	tmp = tmp or TmpManager(outDir + '/tmp')
 	
 	
 	## setting
@@ -515,6 +996,9 @@ def optimize(inputInfos, outputInfos, aspenModel, calculator, outDir):
 	
 	outputSettings = outputInfos.copy()
 	outputSettings[['Sheet', 'Cell']] = outputSettings['Location'].str.split('!', expand = True)
+	
+	if store is None:
+		store = EvaluationStore(inputSettings['Input'], outputSettings['Output'])
 			
 	
 	## optimization
@@ -528,12 +1012,27 @@ def optimize(inputInfos, outputInfos, aspenModel, calculator, outDir):
 	maxfun = 100   #!
 
 				
+	bestValues = np.full(outputSettings.shape[0], np.inf)   # of simulated runs, their Aspen files are retained
+	
 	solutions = pd.DataFrame(columns = ['Objective'] + inputSettings['Input'].tolist())
-	for idx, row in outputSettings.iterrows():
-		output, sheet, cell = row[['Output', 'Sheet', 'Cell']]
+	for j, (_, row) in enumerate(outputSettings.iterrows()):
+		output = row['Output']
 		
-		count = 0
-		def f(x, aspenModel, calculator, inputSettings, tmpDir):
+		recorder = EvaluationRecorder('%s/%s_opt.trace' % (outDir, output), nvars, resume)
+		
+		def f(x, aspenModel, calculator, inputSettings, tmp):
+			
+			res = recorder.replay_next(x)
+			if res is not None:
+				return res
+			
+			t0 = time.time()
+			
+			outputValues = store.get(x)
+			if outputValues is not None:
+				recorder.record(x, outputValues[j], [time.time() - t0, np.nan, np.nan])
+				
+				return outputValues[j]
 			
 			# set ASPEN model variables
 			for idx, row in inputSettings.iterrows():
@@ -544,30 +1043,486 @@ def optimize(inputInfos, outputInfos, aspenModel, calculator, outDir):
 			# run ASPEN model
 			aspenModel.run_model()
 			
-			nonlocal count
-			count += 1
-			tmpFile = '%s/%s.bkp' % (tmpDir, count)
+			tmpFile = tmp.new_file()
 			aspenModel.save_model(tmpFile)
+			tmp.done(tmpFile, failed = not aspenModel.converged)
+			
+			t1 = time.time()
 			
 			# run excel calculator
 			calculator.load_aspenModel(tmpFile)
 			
 			calculator.run_macro('solvedcfror')
 			
-			res = np.float(calculator.get_cell(sheet, loc = cell))
+			outputValues = [np.float(calculator.get_cell(sheet, loc = cell)) for sheet, cell in outputSettings[['Sheet', 'Cell']].values]
+			store.add(x, outputValues)
+			
+			for k, (name, value) in enumerate(zip(outputSettings['Output'], outputValues)):
+				if value < bestValues[k]:
+					bestValues[k] = value
+					tmp.retain(tmpFile, '%s_opt' % name)
 			
-			return res	
+			if recycler is not None:
+				recycler.after_run()
+			
+			t2 = time.time()
+			recorder.record(x, outputValues[j], [t2 - t0, t1 - t0, t2 - t1])
+			
+			return outputValues[j]	
 		
 		
-		basicConfig(filename = '%s/%s_opt.log' % (outDir, output), level = INFO, format = '%(message)s', filemode = 'w')
+		xbest, _ = store.best(output)
+		if recorder.x0() is not None:
+			x0 = recorder.x0()
+		elif xbest is not None:
+			x0 = np.clip(xbest, lb, ub)
 		
-		res = solve(f, x0, args = (aspenModel, calculator, inputSettings, tmpDir), bounds = (lb, ub), rhoend = rhoend, maxfun = maxfun, scaling_within_bounds = True)
+		hits = store.hits
+		res = solve(f, x0, args = (aspenModel, calculator, inputSettings, tmp), bounds = (lb, ub), rhoend = rhoend, maxfun = maxfun, 
+					scaling_within_bounds = True, user_params = {'init.random_initial_directions': False})
+		print('%s: %s evaluations, %s answered from stored simulations' % (output, res.nf, store.hits - hits))
 	
 		solutions.loc[output, :] = [res.f] + res.x.tolist()
 		
 		
 	return solutions	
 
+
+def optimize_multistart(inputInfos, outputInfos, simPool, outDir, nstarts, maxfun = 100, rhoend = 0.001, keepFrac = 0.5, store = None):
+	'''
+	BOBYQA is started from nstarts Latin hypercube points and run in two rounds. Each start first gets a third of 
+	maxfun evaluations, then starts whose objective is not in the best keepFrac are pruned and the others continue from 
+	their incumbent with a smaller trust region until maxfun is used up. Starts run concurrently in threads, and their 
+	function evaluations are dispatched to the workers of simPool. As in optimize, all outputs are recorded in store 
+	and the best stored inputs of an output replace its first start, and evaluations of all starts are recorded in 
+	outDir/output_opt.trace.
+	
+	Parameters
+	inputInfos: df, input infos for optimization, columns are ['Input', 'Path', 'Range', 'Fortran']
+	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
+	simPool: instance of SimulationPool class
+	outDir: str, output directory
+	nstarts: int, # of starts
+	maxfun: int, max # of function evaluations of each start, raised to 2*nvars+2 per round if smaller
+	rhoend: float, final trust region radius (in scaled variables)
+	keepFrac: float, fraction of starts continued after the first round
+	store: instance of EvaluationStore class or None, shared evaluations of all outputs
+	
+	Returns
+	solutions: df, index are outputs, columns are ['Objective'] + inputs
+	localOptima: df, index are (output, start), columns are ['Objective'] + inputs + ['Evaluations', 'Pruned']
+	'''
+	
+	## setting
+	inputSettings = inputInfos.copy()
+	inputSettings[['LB', 'UB']] = inputSettings['Range'].str.split(',', expand = True).astype(np.float)
+	inputs = list(inputSettings[['Path', 'Fortran']].itertuples(index = False, name = None))
+	outputs = outputInfos['Location'].tolist()
+	
+	if store is None:
+		store = EvaluationStore(inputSettings['Input'], outputInfos['Output'])
+	
+	lb = inputSettings['LB'].values
+	ub = inputSettings['UB'].values
+	
+	nvars = inputSettings.shape[0]
+	maxfun1 = max(maxfun // 3, 2*nvars + 2)   # BOBYQA needs 2n+1 evaluations for its initial interpolation set
+	maxfun2 = max(maxfun - maxfun1, 2*nvars + 2)
+	nkeep = ceil(nstarts * keepFrac)
+	
+	
+	## optimization
+	solutions = pd.DataFrame(columns = ['Objective'] + inputSettings['Input'].tolist())
+	localOptima = []
+	for j, output in enumerate(outputInfos['Output']):
+		
+		recorder = EvaluationRecorder('%s/%s_opt.trace' % (outDir, output), nvars)
+		
+		def f(x):
+			
+			t0 = time.time()
+			
+			outputValues = store.get(x)
+			if outputValues is None:
+				outputValues = simPool.simulate(inputs, x, outputs)
+				store.add(x, outputValues)
+			
+			recorder.record(x, outputValues[j], [time.time() - t0, np.nan, np.nan])
+			
+			return outputValues[j]
+		
+		def run_start(x0, rhobeg, maxfun):
+			
+			return solve(f, x0, bounds = (lb, ub), rhobeg = rhobeg, rhoend = rhoend, maxfun = maxfun, 
+						 scaling_within_bounds = True)
+			
+		starts = latin_hypercube(lb, ub, nstarts)
+		
+		xbest, _ = store.best(output)
+		if xbest is not None:
+			starts[0] = np.clip(xbest, lb, ub)
+		
+		hits = store.hits
+		with ThreadPoolExecutor(nstarts) as executor:
+		
+			# exploration round from all starts
+			results = list(executor.map(lambda x0: run_start(x0, 0.1, maxfun1), starts))
+			nfs = [res.nf for res in results]
+			
+			# refinement round from incumbents of the best starts
+			kept = np.argsort([res.f for res in results])[:nkeep]
+			refined = executor.map(lambda k: run_start(results[k].x, 0.02, maxfun2), kept)
+			for k, res in zip(kept, refined):
+				nfs[k] += res.nf
+				if res.f <= results[k].f:
+					results[k] = res
+		
+		for k, res in enumerate(results):
+			localOptima.append([output, k, res.f] + res.x.tolist() + [nfs[k], k not in kept])
+		
+		print('%s: %s evaluations, %s answered from stored simulations' % (output, sum(nfs), store.hits - hits))
+		
+		best = min(results, key = lambda res: res.f)
+		solutions.loc[output, :] = [best.f] + best.x.tolist()
+	
+	localOptima = pd.DataFrame(localOptima, columns = ['Output', 'Start', 'Objective'] + inputSettings['Input'].tolist() + 
+							   ['Evaluations', 'Pruned']).set_index(['Output', 'Start'])
+	
+	
+	return solutions, localOptima
+
+
+def optimize_surrogate(inputInfos, outputInfos, simPool, outDir, models = None, maxruns = 20, nverify = 3, radius = 0.2, 
+					   rhoend = 0.001, patience = 2, store = None):
+	'''
+	Trust region optimization on a quadratic surrogate in variables scaled to [0, 1]. Each iteration fits the 
+	surrogate to successful simulations around the incumbent (linear until there are (n+1)(n+2)/2 of them with n 
+	variables, so the fit is never underdetermined), minimizes it in the trust region by multistart L-BFGS-B, 
+	and simulates the candidate optimum together with nverify-1 Latin hypercube points of the trust region in 
+	parallel. With fewer than n+1 successful simulations, an iteration only simulates nverify trust region points. 
+	The trust region moves to the best simulated point and grows if the candidate improved the objective as 
+	predicted, otherwise it shrinks. Optimization of an output stops after patience iterations without improvement, 
+	when the radius is below rhoend or when maxruns simulations are used. Simulated points are recorded in 
+	outDir/output_opt.trace.
+	
+	If an output has a trained model in models, e.g. regression.mod trained by AutoAspen2 with the optimization inputs 
+	as features in the order of inputInfos, its surrogate is model prediction plus a quadratic correction fitted to 
+	the residuals.
+	
+	Parameters
+	inputInfos: df, input infos for optimization, columns are ['Input', 'Path', 'Range', 'Fortran']
+	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location']
+	simPool: instance of SimulationPool class
+	outDir: str, output directory
+	models: dict or None, keys are outputs, values are trained models predicting the output from inputs
+	maxruns: int, max # of simulations of each output, raised to cover the initial design of 2n+1 points and one 
+			 iteration
+	nverify: int, # of points simulated in each iteration
+	radius: float, initial trust region radius (in scaled variables)
+	rhoend: float, final trust region radius (in scaled variables)
+	patience: int, # of iterations without improvement before stopping
+	store: instance of EvaluationStore class or None, shared evaluations of all outputs
+	
+	Returns
+	solutions: df, index are outputs, columns are ['Objective'] + inputs + ['Simulations']
+	'''
+	
+	## setting
+	inputSettings = inputInfos.copy()
+	inputSettings[['LB', 'UB']] = inputSettings['Range'].str.split(',', expand = True).astype(np.float)
+	inputs = list(inputSettings[['Path', 'Fortran']].itertuples(index = False, name = None))
+	outputs = outputInfos['Location'].tolist()
+	
+	if store is None:
+		store = EvaluationStore(inputSettings['Input'], outputInfos['Output'])
+	
+	if models is None:
+		models = {}
+	
+	lb = inputSettings['LB'].values
+	ub = inputSettings['UB'].values
+	nvars = lb.size
+	nterms = (nvars+1)*(nvars+2)//2
+	
+	if maxruns < 2*nvars + 1 + nverify:
+		print('maxruns of %s does not cover the initial design of %s points and one iteration, raised to %s' % 
+			  (maxruns, 2*nvars + 1, 2*nvars + 1 + nverify))
+		maxruns = 2*nvars + 1 + nverify
+	
+	
+	## optimization
+	solutions = pd.DataFrame(columns = ['Objective'] + inputSettings['Input'].tolist() + ['Simulations'])
+	for j, output in enumerate(outputInfos['Output']):
+		
+		recorder = EvaluationRecorder('%s/%s_opt.trace' % (outDir, output), nvars)
+		
+		nruns = 0
+		def evaluate(U):
+			
+			nonlocal nruns
+			
+			t0 = time.time()
+			
+			X = lb + np.clip(U, 0, 1) * (ub - lb)
+			new = [x for x in X if x not in store]
+			if new:
+				for x, outputValues in zip(new, simPool.simulate_batch(inputs, new, outputs)):
+					store.add(x, outputValues)
+				nruns += len(new)
+			
+			fs = np.array([store.get(x)[j] for x in X])
+			for x, f in zip(X, fs):
+				recorder.record(x, f, [time.time() - t0, np.nan, np.nan])
+			
+			return fs
+		
+		def base(U):
+			
+			return models[output].predict(lb + U * (ub - lb)) if output in models else np.zeros(U.shape[0])
+		
+		# initial design from stored simulations, topped up with Latin hypercube points
+		evaluations = store.to_frame()
+		U = (evaluations[inputSettings['Input']].values - lb) / (ub - lb)
+		y = evaluations[output].values
+		valid = ~np.isnan(y) & np.all((U >= 0) & (U <= 1), axis = 1)
+		U, y = U[valid], y[valid]
+		
+		ninit = 2*nvars + 1 - y.size
+		if ninit > 0:
+			Unew = latin_hypercube(np.zeros(nvars), np.ones(nvars), ninit)
+			U, y = np.vstack([U, Unew]), np.concatenate([y, evaluate(Unew)])
+		
+		if np.isnan(y).all():
+			print('%s: all %s initial simulations failed, not optimized' % (output, y.size))
+			
+			solutions.loc[output, :] = [np.nan] * (nvars + 1) + [nruns]
+			continue
+		
+		k = np.nanargmin(y)
+		center, fbest = U[k], y[k]
+		r = radius
+		stall = 0
+		while stall < patience and r >= rhoend and nruns < maxruns:
+			
+			tlb, tub = np.maximum(center - r, 0), np.minimum(center + r, 1)
+			
+			# fit surrogate to successful simulations around incumbent
+			succeeded = np.flatnonzero(~np.isnan(y))
+			dists = np.abs(U[succeeded] - center).max(axis = 1)
+			npts = max(np.sum(dists <= 2*r), min(succeeded.size, nterms))
+			near = succeeded[np.argsort(dists)[:npts]]
+			
+			if near.size < nvars + 1:   # too few for even a linear fit, sample the trust region instead
+				Unew = latin_hypercube(tlb, tub, nverify)[:max(maxruns - nruns, 1)]
+				fnew = evaluate(Unew)
+				U, y = np.vstack([U, Unew]), np.concatenate([y, fnew])
+				
+				if (fnew < fbest).any():
+					k = np.nanargmin(fnew)
+					center, fbest = Unew[k], fnew[k]
+				continue
+			
+			# linear terms only until there are enough points for all quadratic terms
+			nfeatures = nterms if near.size >= nterms else nvars + 1
+			features = lambda u: quadratic_features(u)[:, :nfeatures]
+			
+			coef = np.linalg.lstsq(features(U[near]), y[near] - base(U[near]), rcond = None)[0]
+			predict = lambda u: base(np.atleast_2d(u)) + features(u) @ coef
+			
+			# minimize surrogate in trust region
+			u0s = np.vstack([center, latin_hypercube(tlb, tub, 4)])
+			ress = [minimize(lambda u: predict(u)[0], u0, method = 'L-BFGS-B', bounds = list(zip(tlb, tub))) for u0 in u0s]
+			ucand = min(ress, key = lambda res: res.fun).x
+			
+			# verify candidate and trust region points
+			Unew = np.vstack([ucand, latin_hypercube(tlb, tub, nverify - 1)])[:max(maxruns - nruns, 1)]
+			fnew = evaluate(Unew)
+			U, y = np.vstack([U, Unew]), np.concatenate([y, fnew])
+			
+			predicted = predict(center)[0] - predict(ucand)[0]
+			ratio = (fbest - fnew[0]) / predicted if predicted > 0 else 0
+			
+			if np.nanmin(fnew) < fbest - 1e-6 * abs(fbest):
+				k = np.nanargmin(fnew)
+				center, fbest = Unew[k], fnew[k]
+				stall = 0
+			else:
+				stall += 1
+			
+			r = min(2*r, 0.5) if ratio > 0.75 else r if ratio > 0.25 else r / 2
+		
+		print('%s: %s simulations' % (output, nruns))
+		
+		solutions.loc[output, :] = [fbest] + (lb + center * (ub - lb)).tolist() + [nruns]
+	
+	
+	return solutions
+
+	
+def optimize_pareto(inputInfos, outputInfos, simPool, popSize = 20, ngens = 10, store = None):
+	'''
+	NSGA-II over input variables scaled to [0, 1], with binary tournament selection, simulated binary crossover and 
+	polynomial mutation. Each generation of offspring is simulated as one batch on the workers of simPool, and every 
+	simulation provides all objectives. Objectives are minimized unless column 'Sense' of outputInfos is 'max'. 
+	Failed simulations (NaN) are ranked behind all others.
+	
+	Parameters
+	inputInfos: df, input infos for optimization, columns are ['Input', 'Path', 'Range', 'Fortran']
+	outputInfos: df, output infos, columns are ['Output', 'Unit', 'Location'] and optionally ['Sense']
+	simPool: instance of SimulationPool class
+	popSize: int, population size
+	ngens: int, # of generations
+	store: instance of EvaluationStore class or None, shared evaluations of all outputs
+	
+	Returns
+	front: df, nondominated points of all simulations, columns are inputs + outputs
+	'''
+	
+	## setting
+	inputSettings = inputInfos.copy()
+	inputSettings[['LB', 'UB']] = inputSettings['Range'].str.split(',', expand = True).astype(np.float)
+	inputs = list(inputSettings[['Path', 'Fortran']].itertuples(index = False, name = None))
+	outputs = outputInfos['Location'].tolist()
+	
+	if store is None:
+		store = EvaluationStore(inputSettings['Input'], outputInfos['Output'])
+	
+	lb = inputSettings['LB'].values
+	ub = inputSettings['UB'].values
+	nvars = lb.size
+	
+	if 'Sense' in outputInfos:
+		signs = np.where(outputInfos['Sense'].fillna('min').str.lower() == 'max', -1, 1)
+	else:
+		signs = np.ones(outputInfos.shape[0])
+	
+	def evaluate(U):
+		
+		X = lb + U * (ub - lb)
+		new = [x for x in X if x not in store]
+		if new:
+			for x, outputValues in zip(new, simPool.simulate_batch(inputs, new, outputs)):
+				store.add(x, outputValues)
+		
+		F = np.array([store.get(x) for x in X]) * signs
+		F[np.isnan(F).any(axis = 1)] = np.inf
+		
+		return F
+	
+	def rank(F):
+		
+		ranks = np.zeros(F.shape[0], dtype = int)
+		crowding = np.zeros(F.shape[0])
+		for r, front in enumerate(nondominated_sort(F)):
+			ranks[front] = r
+			crowding[front] = crowding_distance(F[front])
+		
+		return ranks, crowding
+	
+	
+	## optimization
+	U = latin_hypercube(np.zeros(nvars), np.ones(nvars), popSize)
+	F = evaluate(U)
+	
+	etaC, etaM, pm = 15, 20, 1 / nvars
+	for gen in range(ngens):
+		ranks, crowding = rank(F)
+		
+		# binary tournament selection
+		a, b = np.random.randint(popSize, size = (2, popSize))
+		better = (ranks[a] < ranks[b]) | ((ranks[a] == ranks[b]) & (crowding[a] > crowding[b]))
+		parents = U[np.where(better, a, b)]
+		
+		# simulated binary crossover
+		half = popSize // 2
+		p1, p2 = parents[:half], parents[half:2*half]
+		mu = uniform(size = p1.shape)
+		betaq = np.where(mu <= 0.5, (2*mu)**(1/(etaC+1)), (1/(2*(1-mu)))**(1/(etaC+1)))
+		children = np.vstack([0.5*((1+betaq)*p1 + (1-betaq)*p2), 0.5*((1-betaq)*p1 + (1+betaq)*p2)])
+		
+		# polynomial mutation
+		mu = uniform(size = children.shape)
+		delta = np.where(mu < 0.5, (2*mu)**(1/(etaM+1)) - 1, 1 - (2*(1-mu))**(1/(etaM+1)))
+		mutated = uniform(size = children.shape) < pm
+		children = np.clip(children + mutated * delta, 0, 1)
+		
+		# survival of the best popSize of parents and children
+		U, F = np.vstack([U, children]), np.vstack([F, evaluate(children)])
+		ranks, crowding = rank(F)
+		survivors = np.lexsort((-crowding, ranks))[:popSize]
+		U, F = U[survivors], F[survivors]
+		
+		print('generation %s: %s simulations, %s points in first front' % (gen+1, len(store.records), np.sum(ranks == 0)))
+	
+	evaluations = store.to_frame().dropna()
+	front = evaluations.iloc[nondominated_sort(evaluations[store.outputs].values * signs)[0]]
+	front = front.sort_values(store.outputs[0]).reset_index(drop = True)
+	
+	
+	return front
+
+	
+def local_sensitivity(inputInfos, outputInfos, simPool, scheme = 'forward', relStep = 0.01):
+	'''
+	Finite-difference derivatives of outputs around the baseline. The baseline run is reused by every forward 
+	difference, so n inputs cost n+1 runs for forward and 2n+1 runs for central scheme. Runs perturbing Aspen inputs 
+	are simulated as one batch on the workers of simPool, while runs perturbing calculator inputs only are simulated 
+	with the baseline as a group on one worker, which solves Aspen once for all of them.
+	
+	Parameters
+	inputInfos: df, columns are ['Input', 'Location', 'Fortran', 'Baseline'] and optionally ['Step'], Location is Aspen 
+				path or sheet!cell in calculator, Step is the relative step size
+	outputInfos: df, columns are ['Output', 'Unit', 'Location']
+	simPool: instance of SimulationPool, SupervisedPool or QueuePool class
+	scheme: str, 'forward' or 'central'
+	relStep: float, relative step size of inputs without Step, absolute if baseline is 0
+	
+	Returns
+	gradients: df, index are inputs, columns are outputs, derivatives of outputs with respect to inputs
+	elasticities: df, index are inputs, columns are outputs, relative change of outputs per relative change of inputs
+	'''
+	
+	inputs = list(inputInfos[['Location', 'Fortran']].itertuples(index = False, name = None))
+	outputs = outputInfos['Location'].tolist()
+	
+	x0 = inputInfos['Baseline'].values.astype(np.float)
+	steps = inputInfos['Step'].fillna(relStep).values.astype(np.float) if 'Step' in inputInfos else np.full(x0.size, relStep)
+	h = steps * np.where(x0 == 0, 1, np.abs(x0))
+	
+	# perturbation stencil, first row is the baseline
+	I = np.eye(x0.size)
+	if scheme == 'forward':
+		X = np.vstack([x0, x0 + I * h])
+	elif scheme == 'central':
+		X = np.vstack([x0, x0 + I * h, x0 - I * h])
+	else:
+		raise ValueError('unknown finite-difference scheme %s' % scheme)
+	
+	# perturbations of calculator inputs share the Aspen solve of the baseline
+	ifAspen = np.array([bool(re.search(r'\\', location)) for location, _ in inputs])
+	aspenRuns = [i for i in range(1, X.shape[0]) if ifAspen[(i-1) % x0.size]]
+	groupRuns = [0] + [i for i in range(1, X.shape[0]) if not ifAspen[(i-1) % x0.size]]
+	
+	print('%s runs for %s inputs, %s Aspen solves' % (X.shape[0], x0.size, len(aspenRuns) + 1))
+	Y = np.full((X.shape[0], len(outputs)), np.nan)
+	with ThreadPoolExecutor(1) as executor:
+		group = executor.submit(simPool.simulate_group, inputs, X[groupRuns], outputs)
+		if aspenRuns:
+			Y[aspenRuns] = simPool.simulate_batch(inputs, X[aspenRuns], outputs)
+		Y[groupRuns] = group.result()
+	
+	y0 = Y[0]
+	if scheme == 'forward':
+		grads = (Y[1:x0.size+1] - y0) / h[:, None]
+	else:
+		grads = (Y[1:x0.size+1] - Y[x0.size+1:]) / (2 * h[:, None])
+	
+	gradients = pd.DataFrame(grads, index = inputInfos['Input'], columns = outputInfos['Output'])
+	elasticities = gradients * x0[:, None] / y0
+	
+	
+	return gradients, elasticities
+	
 	
 def calculate_margin(inputInfos, outputInfos, aspenFiles, calculatorFiles, marketPriceFiles, rinPriceFile, capital, credits):
 	'''
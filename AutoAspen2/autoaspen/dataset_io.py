@@ -0,0 +1,387 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+r'''
+This module reads and writes datasets in the columnar format. A columnar dataset is a directory containing:
+	meta.json     names, types and locations of input variables, name and location of the output variable
+	inputs.npy    float64 array of shape (# of runs, # of inputs), columns follow the order in meta.json
+	output.npy    float64 array of shape (# of runs,), NaN for runs not simulated yet
+	claims.npy    int32 array of shape (# of runs,), index of the worker that claimed each run, created on first use 
+	              by parallel generation, UNCLAIMED for runs free to claim and FAILED for runs given up
+	times.npy     float64 array of shape (# of runs,), seconds each run took, created on first use by parallel 
+	              generation, NaN for runs not timed
+	output_lite.npy  float64 array of shape (# of runs,), output values of the lite Aspen model, created on first use 
+	              by multi-fidelity generation, output.npy then holds values of the full model for a subset of runs
+
+Runs can also be queued in a job queue file shared by hosts (see AutoAspen/jobqueue.py, whose queue_worker.py runs 
+them), each run is a job of the study keyed by its task as in JobQueue.add_jobs, so a point already queued in the 
+study is simulated once, and outputs are collected back into output.npy by job ids.
+
+Values are stored as binary float64 so no precision is lost, and the .npy arrays are memory-mapped when read.
+A dataset path ending with .xlsx is treated as the Excel format with comma-joined values in the Values column.
+'''
+
+
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'AutoAspen'))
+from jobqueue import JobQueue
+
+
+META_FILE = 'meta.json'
+INPUTS_FILE = 'inputs.npy'
+OUTPUT_FILE = 'output.npy'
+CLAIMS_FILE = 'claims.npy'
+LITE_OUTPUT_FILE = 'output_lite.npy'
+TIMES_FILE = 'times.npy'
+
+UNCLAIMED = -1
+FAILED = -2
+
+
+def is_columnar(data_file):
+	'''
+	Parameters
+	data_file: str, dataset file (.xlsx) or directory (columnar)
+
+	Returns
+	ifColumnar: bool
+	'''
+
+	return not data_file.lower().endswith(('.xlsx', '.xls'))
+
+
+def write_dataset(data_dir, inputs_info, inputs_values, output_info):
+	'''
+	Parameters
+	data_dir: str, dataset directory
+	inputs_info: df, columns are ['Input variable', 'Type', 'Location']
+	inputs_values: 2D array, rows are runs, columns are input variables in the order of inputs_info
+	output_info: df, columns are ['Output variable', 'Location']
+	'''
+
+	os.makedirs(data_dir, exist_ok = True)
+
+	inputs_values = np.asarray(inputs_values, dtype = np.float64)
+	nruns = inputs_values.shape[0]
+
+	outputName, outputLoc = output_info[['Output variable', 'Location']].squeeze()
+	meta = {'inputs': [{'name': name, 'type': varType, 'location': loc}
+					   for name, varType, loc in inputs_info[['Input variable', 'Type', 'Location']].values],
+			'output': {'name': outputName, 'location': outputLoc},
+			'nruns': nruns}
+
+	with open('%s/%s' % (data_dir, META_FILE), 'w') as f:
+		json.dump(meta, f, indent = 2)
+
+	np.save('%s/%s' % (data_dir, INPUTS_FILE), inputs_values)
+	np.save('%s/%s' % (data_dir, OUTPUT_FILE), np.full(nruns, np.nan))
+
+
+def read_dataset(data_dir, mode = 'r'):
+	'''
+	Parameters
+	data_dir: str, dataset directory
+	mode: str, memory-map mode of output values, 'r' for read only, 'r+' for updating
+
+	Returns
+	meta: dict, keys are 'inputs', 'output' and 'nruns'
+	inputsValues: memmap, rows are runs, columns are input variables
+	outputValues: memmap, NaN for runs not simulated yet
+	'''
+
+	with open('%s/%s' % (data_dir, META_FILE)) as f:
+		meta = json.load(f)
+
+	inputsValues = np.load('%s/%s' % (data_dir, INPUTS_FILE), mmap_mode = 'r')
+	outputValues = np.load('%s/%s' % (data_dir, OUTPUT_FILE), mmap_mode = mode)
+
+	return meta, inputsValues, outputValues
+
+
+def read_features_and_targets(data_dir):
+	'''
+	Parameters
+	data_dir: str, dataset directory
+
+	Returns
+	features: df, simulated runs only
+	targets: ser, simulated runs only
+	'''
+
+	meta, inputsValues, outputValues = read_dataset(data_dir)
+
+	simulated = ~np.isnan(outputValues)
+
+	features = pd.DataFrame(inputsValues[simulated], columns = [info['name'] for info in meta['inputs']])
+	targets = pd.Series(outputValues[simulated], name = meta['output']['name'])
+
+	return features, targets
+
+
+def open_lite_output(data_dir):
+	'''
+	Parameters
+	data_dir: str, dataset directory
+	
+	Returns
+	liteValues: memmap, output values of the lite model, NaN for runs not simulated yet
+	'''
+	
+	liteFile = '%s/%s' % (data_dir, LITE_OUTPUT_FILE)
+	
+	if not os.path.exists(liteFile):
+		with open('%s/%s' % (data_dir, META_FILE)) as f:
+			nruns = json.load(f)['nruns']
+		
+		np.save(liteFile, np.full(nruns, np.nan))
+	
+	liteValues = np.load(liteFile, mmap_mode = 'r+')
+	
+	return liteValues
+	
+	
+def read_multifidelity(data_dir):
+	'''
+	Parameters
+	data_dir: str, dataset directory with lite output values
+	
+	Returns
+	features: df, runs simulated with the lite model
+	liteTargets: ser, output values of the lite model
+	fullTargets: ser, output values of the full model, NaN for runs not simulated with it
+	'''
+	
+	meta, inputsValues, outputValues = read_dataset(data_dir)
+	liteValues = np.load('%s/%s' % (data_dir, LITE_OUTPUT_FILE), mmap_mode = 'r')
+	
+	simulated = ~np.isnan(liteValues)
+	
+	features = pd.DataFrame(inputsValues[simulated], columns = [info['name'] for info in meta['inputs']])
+	liteTargets = pd.Series(liteValues[simulated], name = meta['output']['name'])
+	fullTargets = pd.Series(outputValues[simulated], name = meta['output']['name'])
+	
+	return features, liteTargets, fullTargets
+	
+	
+def excel_to_columnar(data_file, data_dir):
+	'''
+	Parameters
+	data_file: str, dataset file in Excel format
+	data_dir: str, dataset directory to write in columnar format
+	'''
+
+	dataInfo = pd.read_excel(data_file, sheet_name = ['Inputs', 'Output'])
+	inputInfo = dataInfo['Inputs']
+	outputInfo = dataInfo['Output']
+
+	inputsValues = np.array([list(map(float, values.split(','))) for values in inputInfo['Values']]).T
+
+	write_dataset(data_dir, inputInfo, inputsValues, outputInfo)
+
+	values = outputInfo['Values'].squeeze()
+	if isinstance(values, str):
+		values = list(map(float, values.split(',')))
+	elif np.isnan(values):
+		values = []
+	else:
+		values = [values]
+	
+	_, _, outputValues = read_dataset(data_dir, mode = 'r+')
+	outputValues[:len(values)] = values
+	outputValues.flush()
+
+
+def open_claims(data_dir):
+	'''
+	Parameters
+	data_dir: str, dataset directory
+	
+	Returns
+	claims: memmap, index of the worker that claimed each run, UNCLAIMED or FAILED
+	'''
+	
+	claimsFile = '%s/%s' % (data_dir, CLAIMS_FILE)
+	
+	if not os.path.exists(claimsFile):
+		with open('%s/%s' % (data_dir, META_FILE)) as f:
+			nruns = json.load(f)['nruns']
+		
+		claims = np.lib.format.open_memmap(claimsFile, mode = 'w+', dtype = np.int32, shape = (nruns,))
+		claims[:] = UNCLAIMED
+		claims.flush()
+	
+	claims = np.load(claimsFile, mmap_mode = 'r+')
+	
+	return claims
+
+
+def open_times(data_dir):
+	'''
+	Parameters
+	data_dir: str, dataset directory
+	
+	Returns
+	times: memmap, seconds each run took, NaN for runs not timed
+	'''
+	
+	timesFile = '%s/%s' % (data_dir, TIMES_FILE)
+	
+	if not os.path.exists(timesFile):
+		with open('%s/%s' % (data_dir, META_FILE)) as f:
+			nruns = json.load(f)['nruns']
+		
+		np.save(timesFile, np.full(nruns, np.nan))
+	
+	times = np.load(timesFile, mmap_mode = 'r+')
+	
+	return times
+	
+	
+def predict_times(inputs_values, times, runs, k = 5):
+	'''
+	Parameters
+	inputs_values: memmap, input values of dataset
+	times: memmap, times of dataset
+	runs: array, indices of runs to predict
+	k: int, # of nearest timed runs averaged, inputs are scaled by their range
+	
+	Returns
+	predicted: array, predicted seconds of runs, NaN if no run is timed
+	'''
+	
+	timed = np.where(~np.isnan(times))[0]
+	if timed.size == 0 or len(runs) == 0:
+		return np.full(len(runs), np.nan)
+	
+	X = np.asarray(inputs_values, dtype = float)
+	span = X.max(axis = 0) - X.min(axis = 0)
+	scale = np.where(span > 0, span, 1)
+	
+	k = min(k, timed.size)
+	_, idx = cKDTree(X[timed] / scale).query(X[runs] / scale, k = k)
+	
+	return np.asarray(times)[timed][np.reshape(idx, (len(runs), k))].mean(axis = 1)
+	
+	
+def claim_run(output_values, claims, nruns, worker, lock, inputs_values = None, times = None):
+	'''
+	Parameters
+	output_values: memmap, output values of dataset
+	claims: memmap, claims of dataset
+	nruns: int, total # of runs
+	worker: int, index of worker
+	lock: Lock, shared by all workers
+	inputs_values: memmap or None, input values of dataset, used with times
+	times: memmap or None, times of dataset, if given, the run with the longest predicted time is claimed first
+	
+	Returns
+	i: int or None, index of claimed run, None if no run is left
+	'''
+	
+	with lock:
+		pending = np.where(np.isnan(output_values[:nruns]) & (claims[:nruns] == UNCLAIMED))[0]
+		if pending.size == 0:
+			return None
+		
+		i = pending[0]
+		if times is not None:
+			predicted = predict_times(inputs_values, times, pending)
+			if not np.isnan(predicted).all():
+				i = pending[np.argmax(predicted)]
+		claims[i] = worker
+		claims.flush()
+	
+	return i
+
+
+def release_claims(output_values, claims, worker, lock):
+	'''
+	Parameters
+	output_values: memmap, output values of dataset
+	claims: memmap, claims of dataset
+	worker: int or None, index of worker whose unfinished runs are released, None for all workers
+	lock: Lock, shared by all workers
+	
+	Returns
+	released: array, indices of released runs
+	'''
+	
+	with lock:
+		if worker is None:
+			unfinished = np.isnan(output_values) & (claims != UNCLAIMED)
+		else:
+			unfinished = np.isnan(output_values) & (claims == worker)
+		released = np.where(unfinished)[0]
+		
+		claims[released] = UNCLAIMED
+		claims.flush()
+	
+	return released
+	
+	
+def queue_runs(data_dir, queue_file, study, nruns):
+	'''
+	Parameters
+	data_dir: str, dataset directory
+	queue_file: str, job queue file (SQLite), created if not existing
+	study: str, study name, one per Aspen model and calculator
+	nruns: int, total # of runs, runs not simulated yet are queued unless already queued
+	
+	Returns
+	jobs: dict, keys are indices of runs not simulated yet, values are ids of their jobs
+	'''
+	
+	meta, inputsValues, outputValues = read_dataset(data_dir)
+	
+	inputs = [[info['location'], int(info['type'] == 'bkp_fortran')] for info in meta['inputs'] if info['type'] in ('bkp', 'bkp_fortran', 'xlsm')]
+	cols = [j for j, info in enumerate(meta['inputs']) if info['type'] in ('bkp', 'bkp_fortran', 'xlsm')]
+	outputs = [meta['output']['location']]
+	
+	runs = np.where(np.isnan(outputValues[:nruns]))[0].tolist()
+	tasks = [{'inputs': inputs, 'values': inputsValues[i, cols].tolist(), 'outputs': outputs} for i in runs]
+	
+	ids = JobQueue(queue_file).add_jobs(study, tasks)
+	
+	return dict(zip(runs, ids))
+	
+	
+def collect_runs(data_dir, queue_file, jobs):
+	'''
+	Parameters
+	data_dir: str, dataset directory
+	queue_file: str, job queue file (SQLite)
+	jobs: dict, keys are indices of runs, values are ids of their jobs, returned by queue_runs
+	
+	Returns
+	counts: dict, keys are ['done', 'failed', 'left'], values are # of runs
+	'''
+	
+	_, _, outputValues = read_dataset(data_dir, mode = 'r+')
+	
+	finished = JobQueue(queue_file).collect(sorted(set(jobs.values())))
+	
+	counts = {'done': 0, 'failed': 0, 'left': 0}
+	for i, jobId in jobs.items():
+		if jobId not in finished:
+			counts['left'] += 1
+		
+		elif finished[jobId][0] is None:
+			counts['failed'] += 1
+		
+		else:
+			outputValues[i] = finished[jobId][0][0]
+			counts['done'] += 1
+	outputValues.flush()
+	
+	return counts
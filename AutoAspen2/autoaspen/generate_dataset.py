@@ -10,24 +10,70 @@ __version__ = '1.0'
 r'''
 This script generates training dataset using Aspen model and .xslm calculator.
 The first NRUNS values in input variables will be used to calculate the output values.
+DATASET_FILE ending with .xlsx is read and updated in Excel format, otherwise it is a directory in the columnar format 
+(see dataset_io.py), where each finished run is written to output.npy in place.
+
+With NWORKERS > 1 (columnar format only), NWORKERS worker processes are started, each with its own Aspen and Excel 
+instances and tmp directory. Workers claim pending runs from the dataset and write results in place. Runs claimed by 
+a crashed worker are re-queued and a replacement worker is started; a run is given up after MAX_RETRIES crashes. A 
+worker that crashes more than MAX_RETRIES times in a row without finishing or claiming a run (e.g. no Aspen licence or 
+COM start-up failure) stops the generation with an error instead of being restarted forever.
+The time of each run is recorded in times.npy, and workers claim the run with the longest time predicted from the 
+nearest timed runs first, so short runs fill the gaps at the end. The ETA is printed every ETA_INTERVAL seconds.
+
+With PIPELINE (columnar format only), Aspen solves the next run in a separate process while the calculator processes 
+the current run, so each run costs about the longer of the two instead of their sum.
+
+In the columnar format, runs are grouped by the values of their Aspen inputs (bkp and bkp_fortran), and Aspen is 
+solved once per group while the calculator inputs (xlsm) of all runs in the group are swept against that solution.
+
+With LITE_ASPEN_FILE (columnar format and NWORKERS = 1 only), all NRUNS runs are first simulated with the lite Aspen 
+model into output_lite.npy, then the first NFULL runs with ASPEN_FILE into output.npy. Since input values are drawn at 
+random, the first NFULL runs are a random subset. train_regression_model.py with MULTI_FIDELITY fits the correction 
+between the two.
+
+With QUEUE_FILE (columnar format only), runs left are queued in the job queue file as study STUDY and simulated by 
+AutoAspen/queue_worker.py -s STUDY on any host, this script collects outputs into the dataset every QUEUE_POLL seconds 
+until all runs queued are done or failed. Runs already queued are not queued again, so the script can be restarted.
+
+Temporary Aspen files are written to TMP_DIR, which can be a RAM-backed path, and only the TMP_KEEP most recent ones 
+are kept. The disk usage of TMP_DIR is printed at the end.
 
 python path\to\autoaspen\generate_dataset.py
 '''
 
 
-DATASET_FILE = 'path\to\dataset.xlsx'   # generated by generate_dataset_template.py
+DATASET_FILE = 'path\to\dataset.xlsx'   # generated by generate_dataset_template.py, .xlsx or columnar directory
 ASPEN_FILE = 'path\to\aspenmodel.bkp'
 CALCULATOR_FILE = 'path\to\calculator.xlsm'
 NRUNS = 50   # equals NRUNS in generate_dataset_template.py
+NWORKERS = 1   # no more than available Aspen licences and CPU cores
+MAX_RETRIES = 2
+ETA_INTERVAL = 300   # seconds between ETA prints of parallel generation
+PIPELINE = False   # whether Aspen and calculator run concurrently, columnar format and NWORKERS = 1 only
+PIPELINE_DEPTH = 2
+TMP_DIR = None   # directory of temporary Aspen files, e.g. on a RAM disk, DATASET_FILE directory/tmp if None
+TMP_KEEP = None   # # of most recent temporary Aspen files kept, at least 1, all kept if None
+LITE_ASPEN_FILE = None   # e.g. 'path\to\aspenmodel-lite.bkp', multi-fidelity generation if given
+NFULL = 20   # # of runs simulated with ASPEN_FILE in multi-fidelity generation
+QUEUE_FILE = None   # e.g. '\\\\fileserver\\aspen\\farm.db', runs are simulated by queue workers if given
+STUDY = None   # study name of runs in QUEUE_FILE, one per Aspen model and calculator, DATASET_FILE directory name if None
+QUEUE_POLL = 60   # seconds between collections of queued runs
 
 
 import os
 import re
-from collections import namedtuple
+import time
+import traceback
+from collections import namedtuple, Counter, deque
+from multiprocessing import Process, Lock, Queue
+from queue import Empty
 import numpy as np
 import pandas as pd
 from pythoncom import CoInitialize
 from win32com.client import DispatchEx
+from dataset_io import (is_columnar, read_dataset, open_claims, open_lite_output, open_times, predict_times, claim_run, release_claims, 
+						queue_runs, collect_runs, UNCLAIMED, FAILED)
 
 
 class Excel():
@@ -192,6 +238,174 @@ def parse_data_file(data_file):
 	return inputInfo, outputInfo
 	
 	
+def simulate_run(aspen_model, calculator, input_infos, output_loc, i, tmp_dir, recent):
+	'''
+	Parameters
+	aspen_model: instance of Aspen class
+	calculator: instance of Excel class
+	input_infos: lst of namedtuples, fields are ['name', 'type', 'loc', 'values']
+	output_loc: str, location of output variable in calculator
+	i: int, index of run
+	tmp_dir: str, directory of temporary Aspen files
+	recent: deque, temporary Aspen files of finished runs, see discard_tmp
+	
+	Returns
+	output: float, output value
+	'''
+	
+	tmpFile = solve_aspen(aspen_model, input_infos, i, tmp_dir)
+	
+	output = calculate(calculator, input_infos, output_loc, i, tmpFile)
+	
+	discard_tmp(tmpFile, recent)
+	
+	return output
+	
+	
+def plan_runs(input_infos, runs):
+	'''
+	Parameters
+	input_infos: lst of namedtuples, fields are ['name', 'type', 'loc', 'values']
+	runs: array, indices of runs to simulate
+	
+	Returns
+	groups: lst of arrays, indices of runs sharing the values of all Aspen inputs, groups are in order of their 
+			first runs and runs in a group keep their order
+	'''
+	
+	runs = np.asarray(runs)
+	
+	aspenValues = [np.asarray(inputInfo.values)[runs] for inputInfo in input_infos if inputInfo.type in ('bkp', 'bkp_fortran')]
+	if not aspenValues or runs.size == 0:
+		return [runs] if runs.size else []
+	
+	_, first, inverse = np.unique(np.column_stack(aspenValues), axis = 0, return_index = True, return_inverse = True)
+	inverse = inverse.ravel()
+	
+	groups = [runs[inverse == g] for g in np.argsort(first)]
+	
+	return groups
+	
+	
+def tmp_root(data_file):
+	'''
+	Parameters
+	data_file: str, dataset file (.xlsx) or directory (columnar)
+	
+	Returns
+	tmpRoot: str, directory of temporary Aspen files
+	'''
+	
+	if TMP_DIR is not None:
+		return TMP_DIR
+	
+	if is_columnar(data_file):
+		return data_file + '/tmp'
+	else:
+		return os.path.dirname(data_file) + '/tmp'
+	
+	
+def discard_tmp(tmp_file, recent, keep = TMP_KEEP):
+	'''
+	Parameters
+	tmp_file: str, temporary Aspen file of a finished run
+	recent: deque, temporary Aspen files of finished runs, files beyond the keep most recent are deleted
+	keep: int or None, # of most recent files kept, all kept if None, at least 1 as later runs of a group reuse the file
+	'''
+	
+	if keep is None or (recent and recent[-1] == tmp_file):
+		return
+	
+	recent.append(tmp_file)
+	while len(recent) > max(keep, 1):
+		try:
+			os.remove(recent.popleft())
+		except FileNotFoundError:
+			pass
+	
+	
+def print_tmp_usage(tmp_dir):
+	'''
+	Parameters
+	tmp_dir: str, directory of temporary Aspen files
+	'''
+	
+	if not os.path.isdir(tmp_dir):
+		return
+	
+	nfiles = 0
+	size = 0
+	for folder, _, files in os.walk(tmp_dir):
+		nfiles += len(files)
+		size += sum(os.path.getsize(os.path.join(folder, file)) for file in files)
+	
+	print('%s temporary files in %s, %.1f MB.' % (nfiles, tmp_dir, size / 1024**2))
+	
+	
+def solve_aspen(aspen_model, input_infos, i, tmp_dir):
+	'''
+	Parameters
+	aspen_model: instance of Aspen class
+	input_infos: lst of namedtuples, fields are ['name', 'type', 'loc', 'values']
+	i: int, index of run
+	tmp_dir: str, directory of temporary Aspen files
+	
+	Returns
+	tmpFile: str, saved Aspen file of run i
+	'''
+	
+	# set Aspen variables
+	for inputInfo in input_infos:
+		if inputInfo.type == 'bkp':
+			aspen_model.set_value(inputInfo.loc, inputInfo.values[i], False)
+			
+		elif inputInfo.type == 'bkp_fortran':
+			aspen_model.set_value(inputInfo.loc, inputInfo.values[i], True)
+		
+		else:
+			continue
+
+	# run Aspen model
+	aspen_model.run_model()
+	
+	tmpFile = '%s/%s.bkp' % (tmp_dir, i)
+	aspen_model.save_model(tmpFile)
+	
+	return tmpFile
+	
+	
+def calculate(calculator, input_infos, output_loc, i, tmp_file):
+	'''
+	Parameters
+	calculator: instance of Excel class
+	input_infos: lst of namedtuples, fields are ['name', 'type', 'loc', 'values']
+	output_loc: str, location of output variable in calculator
+	i: int, index of run
+	tmp_file: str, saved Aspen file of run i
+	
+	Returns
+	output: float, output value
+	'''
+	
+	# set calculator variables
+	for inputInfo in input_infos:
+		if inputInfo.type == 'xlsm':
+			inputSheet, inputCell = inputInfo.loc.split('!')
+			calculator.set_cell(inputInfo.values[i], inputSheet, loc = inputCell)
+		
+		else:
+			continue
+	
+	# run calculator
+	calculator.load_aspenModel(tmp_file)
+	calculator.run_macro('solvedcfror')
+	
+	outputSheet, outputCell = output_loc.split('!')
+	output = calculator.get_cell(outputSheet, loc = outputCell)
+	
+	return output
+	
+	
 def run_and_update(data_file, input_infos, output_info, aspen_file, calculator_file, nruns):	
 	'''
 	Parameters
@@ -233,9 +447,9 @@ def run_and_update(data_file, input_infos, output_info, aspen_file, calculator_f
 			inputInfos.append(InputInfo(*others, values))
 		
 		# run
-		outDir = os.path.dirname(data_file)
-		tmpDir = outDir + '/tmp'
+		tmpDir = tmp_root(data_file)
 		os.makedirs(tmpDir, exist_ok = True)
+		recent = deque()
 	
 		aspenModel = Aspen(aspen_file)
 		calculator = Excel(calculator_file)
@@ -243,38 +457,7 @@ def run_and_update(data_file, input_infos, output_info, aspen_file, calculator_f
 		for i in range(nrunsCompl, nruns):
 			print('run %s:' % (i+1))
 			
-			# set Aspen variables
-			for inputInfo in inputInfos:
-				if inputInfo.type == 'bkp':
-					aspenModel.set_value(inputInfo.loc, inputInfo.values[i], False)
-					
-				elif inputInfo.type == 'bkp_fortran':
-					aspenModel.set_value(inputInfo.loc, inputInfo.values[i], True)
-				
-				else:
-					continue
-
-			# run Aspen model
-			aspenModel.run_model()
-			
-			tmpFile = '%s/%s.bkp' % (tmpDir, i)
-			aspenModel.save_model(tmpFile)
-			
-			# set calculator variables
-			for inputInfo in inputInfos:
-				if inputInfo.type == 'xlsm':
-					inputSheet, inputCell = inputInfo.loc.split('!')
-					calculator.set_cell(inputInfo.values[i], inputSheet, loc = inputCell)
-				
-				else:
-					continue
-			
-			# run calculator
-			calculator.load_aspenModel(tmpFile)
-			calculator.run_macro('solvedcfror')
-			
-			outputSheet, outputCell = outputInfo.loc.split('!')
-			output = calculator.get_cell(outputSheet, loc = outputCell)
+			output = simulate_run(aspenModel, calculator, inputInfos, outputInfo.loc, i, tmpDir, recent)
 			outputInfo.values.append(output)
 			
 			# update dataset
@@ -295,13 +478,428 @@ def run_and_update(data_file, input_infos, output_info, aspen_file, calculator_f
 	print('all done.')
 	
 	
+def run_and_update_columnar(data_dir, aspen_file, calculator_file, nruns, lite = False):
+	'''
+	Parameters
+	data_dir: str, dataset directory in columnar format
+	aspen_file: str, Aspen model file
+	calculator_file: .xslm calculator file
+	nruns: int, total # of runs
+	lite: bool, whether aspen_file is the lite model and output values are written to output_lite.npy
+	'''
+	
+	meta, inputsValues, outputValues = read_dataset(data_dir, mode = 'r+')
+	if lite:
+		outputValues = open_lite_output(data_dir)
+	
+	if nruns > meta['nruns']:
+		print('required number of runs exceeds the dataset size, only %s runs available.' % meta['nruns'])
+		nruns = meta['nruns']
+	
+	runsLeft = np.where(np.isnan(outputValues[:nruns]))[0]
+	print('totally %s runs, %s runs left.' % (nruns, runsLeft.size))
+	
+	if runsLeft.size != 0:
+		
+		# columns of memory-mapped input values
+		InputInfo = namedtuple('InputInfo', ['name', 'type', 'loc', 'values'])
+		inputInfos = [InputInfo(info['name'], info['type'], info['location'], inputsValues[:, j]) 
+					  for j, info in enumerate(meta['inputs'])]
+		outputLoc = meta['output']['location']
+		
+		# run
+		tmpDir = tmp_root(data_dir)
+		os.makedirs(tmpDir, exist_ok = True)
+		recent = deque()
+		
+		aspenModel = Aspen(aspen_file)
+		calculator = Excel(calculator_file)
+		
+		groups = plan_runs(inputInfos, runsLeft)
+		print('%s Aspen solves.' % len(groups))
+		
+		for runs in groups:
+			tmpFile = solve_aspen(aspenModel, inputInfos, runs[0], tmpDir)
+			
+			for i in runs:
+				print('run %s:' % (i+1))
+				
+				output = calculate(calculator, inputInfos, outputLoc, i, tmpFile)
+				
+				# update dataset
+				outputValues[i] = output
+				outputValues.flush()
+				
+				print('done.')
+			
+			discard_tmp(tmpFile, recent)
+			
+		aspenModel.close()
+		calculator.close()
+	
+	print('all done.')
+	
+	
+def run_worker(data_dir, aspen_file, calculator_file, nruns, worker, lock):
+	'''
+	Parameters
+	data_dir: str, dataset directory in columnar format
+	aspen_file: str, Aspen model file
+	calculator_file: .xslm calculator file
+	nruns: int, total # of runs
+	worker: int, index of worker
+	lock: Lock, shared by all workers
+	'''
+	
+	meta, inputsValues, outputValues = read_dataset(data_dir, mode = 'r+')
+	claims = open_claims(data_dir)
+	times = open_times(data_dir)
+	
+	InputInfo = namedtuple('InputInfo', ['name', 'type', 'loc', 'values'])
+	inputInfos = [InputInfo(info['name'], info['type'], info['location'], inputsValues[:, j]) 
+				  for j, info in enumerate(meta['inputs'])]
+	outputLoc = meta['output']['location']
+	
+	tmpDir = '%s/worker%s' % (tmp_root(data_dir), worker)
+	os.makedirs(tmpDir, exist_ok = True)
+	recent = deque()
+	
+	aspenModel = Aspen(aspen_file)
+	calculator = Excel(calculator_file)
+	
+	try:
+		while True:
+			i = claim_run(outputValues, claims, nruns, worker, lock, inputsValues, times)
+			if i is None:
+				break
+			
+			print('worker %s run %s:' % (worker, i+1))
+			
+			t0 = time.time()
+			output = simulate_run(aspenModel, calculator, inputInfos, outputLoc, i, tmpDir, recent)
+			
+			outputValues[i] = output
+			outputValues.flush()
+			times[i] = time.time() - t0
+			times.flush()
+			
+			print('worker %s run %s done.' % (worker, i+1))
+	
+	finally:
+		aspenModel.close()
+		calculator.close()
+	
+	
+def run_and_update_parallel(data_dir, aspen_file, calculator_file, nruns, nworkers, max_retries = MAX_RETRIES):
+	'''
+	Parameters
+	data_dir: str, dataset directory in columnar format
+	aspen_file: str, Aspen model file
+	calculator_file: .xslm calculator file
+	nruns: int, total # of runs
+	nworkers: int, # of worker processes
+	max_retries: int, # of times a run is re-queued after crashing its worker, also # of times a worker is restarted 
+				 after crashing in a row with no progress
+	'''
+	
+	meta, inputsValues, outputValues = read_dataset(data_dir)
+	claims = open_claims(data_dir)
+	times = open_times(data_dir)
+	lock = Lock()
+	
+	if nruns > meta['nruns']:
+		print('required number of runs exceeds the dataset size, only %s runs available.' % meta['nruns'])
+		nruns = meta['nruns']
+	
+	# runs claimed or given up in previous sessions are queued again
+	release_claims(outputValues, claims, None, lock)
+	
+	runsLeft = np.isnan(outputValues[:nruns]).sum()
+	print('totally %s runs, %s runs left, %s workers.' % (nruns, runsLeft, nworkers))
+	
+	def runs_done(worker):
+		
+		return int(np.sum((claims[:nruns] == worker) & ~np.isnan(outputValues[:nruns])))
+	
+	def start_worker(worker):
+		
+		doneAtStart[worker] = runs_done(worker)
+		
+		proc = Process(target = run_worker, args = (data_dir, aspen_file, calculator_file, nruns, worker, lock))
+		proc.start()
+		
+		return proc
+	
+	doneAtStart = {}
+	workers = {worker: start_worker(worker) for worker in range(min(nworkers, runsLeft))}
+	crashes = Counter()
+	strikes = Counter()   # crashes of each worker in a row without progress
+	lastETA = time.time()
+	while workers:
+		time.sleep(1)
+		
+		if time.time() - lastETA > ETA_INTERVAL:
+			left = np.where(np.isnan(outputValues[:nruns]) & (claims[:nruns] != FAILED))[0]
+			eta = estimate_eta(predict_times(inputsValues, times, left), len(workers))
+			print('%s runs left, ETA %s.' % (left.size, '?' if np.isnan(eta) else '%.1f h' % (eta / 3600)))
+			lastETA = time.time()
+		
+		for worker, proc in list(workers.items()):
+			if proc.is_alive():
+				continue
+			
+			del workers[worker]
+			
+			if proc.exitcode != 0:
+				released = release_claims(outputValues, claims, worker, lock)
+				if released.size:
+					print('worker %s crashed, run(s) %s re-queued.' % (worker, ', '.join(str(i+1) for i in released)))
+				else:
+					print('worker %s crashed with no run claimed.' % worker)
+				
+				if released.size or runs_done(worker) > doneAtStart[worker]:
+					strikes[worker] = 0
+				else:
+					strikes[worker] += 1
+				
+				if strikes[worker] > max_retries:
+					for other in workers.values():
+						other.terminate()
+						other.join()
+					release_claims(outputValues, claims, None, lock)
+					
+					raise RuntimeError('worker %s crashed %s times in a row without claiming a run, check Aspen and Excel start-up' 
+									   % (worker, strikes[worker]))
+				
+				crashes.update(released)
+				givenUp = [i for i in released if crashes[i] > max_retries]
+				if givenUp:
+					with lock:
+						claims[givenUp] = FAILED
+						claims.flush()
+					print('run(s) %s failed %s times, given up.' % (', '.join(str(i+1) for i in givenUp), max_retries+1))
+				
+				if has_pending(outputValues, claims, nruns):
+					workers[worker] = start_worker(worker)
+	
+	print('all done.')
+	
+	
+def estimate_eta(predicted, nworkers):
+	'''
+	Parameters
+	predicted: array, predicted seconds of runs left
+	nworkers: int, # of workers
+	
+	Returns
+	eta: float, seconds until all runs finish when the longest runs are claimed first by the first free worker, 
+		 NaN if times cannot be predicted
+	'''
+	
+	if np.isnan(predicted).any():
+		return np.nan
+	
+	free = [0] * max(nworkers, 1)
+	for seconds in sorted(predicted, reverse = True):
+		free[free.index(min(free))] += seconds
+	
+	return max(free)
+	
+	
+def run_aspen_stage(data_dir, aspen_file, groups, queue):
+	'''
+	Parameters
+	data_dir: str, dataset directory in columnar format
+	aspen_file: str, Aspen model file
+	groups: lst of arrays, indices of runs sharing Aspen inputs, see plan_runs
+	queue: Queue, bounded, (index of run, saved Aspen file) are put for the calculator stage, (None, None) at the end, 
+		   ('error', traceback) if the stage failed
+	'''
+	
+	meta, inputsValues, _ = read_dataset(data_dir)
+	
+	InputInfo = namedtuple('InputInfo', ['name', 'type', 'loc', 'values'])
+	inputInfos = [InputInfo(info['name'], info['type'], info['location'], inputsValues[:, j]) 
+				  for j, info in enumerate(meta['inputs'])]
+	
+	tmpDir = tmp_root(data_dir)
+	os.makedirs(tmpDir, exist_ok = True)
+	
+	aspenModel = Aspen(aspen_file)
+	
+	try:
+		for runs in groups:
+			tmpFile = solve_aspen(aspenModel, inputInfos, runs[0], tmpDir)
+			
+			for i in runs:
+				queue.put((i, tmpFile))   # blocks while the calculator stage is maxsize runs behind
+	
+	except BaseException:
+		queue.put(('error', traceback.format_exc()))
+		raise
+	
+	else:
+		queue.put((None, None))
+	
+	finally:
+		aspenModel.close()
+	
+	
+def run_and_update_pipelined(data_dir, aspen_file, calculator_file, nruns, maxsize = PIPELINE_DEPTH):
+	'''
+	Aspen solves run i+1 in a separate process while the calculator processes run i in this process, 
+	connected by a bounded queue of saved Aspen files
+	
+	Parameters
+	data_dir: str, dataset directory in columnar format
+	aspen_file: str, Aspen model file
+	calculator_file: .xslm calculator file
+	nruns: int, total # of runs
+	maxsize: int, maximal # of solved runs waiting for the calculator
+	'''
+	
+	meta, inputsValues, outputValues = read_dataset(data_dir, mode = 'r+')
+	
+	if nruns > meta['nruns']:
+		print('required number of runs exceeds the dataset size, only %s runs available.' % meta['nruns'])
+		nruns = meta['nruns']
+	
+	runsLeft = np.where(np.isnan(outputValues[:nruns]))[0]
+	print('totally %s runs, %s runs left.' % (nruns, runsLeft.size))
+	
+	if runsLeft.size != 0:
+		
+		InputInfo = namedtuple('InputInfo', ['name', 'type', 'loc', 'values'])
+		inputInfos = [InputInfo(info['name'], info['type'], info['location'], inputsValues[:, j]) 
+					  for j, info in enumerate(meta['inputs'])]
+		outputLoc = meta['output']['location']
+		
+		groups = plan_runs(inputInfos, runsLeft)
+		print('%s Aspen solves.' % len(groups))
+		
+		queue = Queue(maxsize)
+		aspenStage = Process(target = run_aspen_stage, args = (data_dir, aspen_file, groups, queue))
+		aspenStage.start()
+		
+		calculator = Excel(calculator_file)
+		recent = deque()
+		
+		try:
+			while True:
+				try:
+					i, tmpFile = queue.get(timeout = 1)
+				except Empty:
+					if aspenStage.is_alive():
+						continue
+					raise RuntimeError('Aspen stage exited unexpectedly with exit code %s' % aspenStage.exitcode)
+				
+				if i is None:
+					break
+				
+				if i == 'error':
+					raise RuntimeError('Aspen stage failed:\n%s' % tmpFile)
+				
+				print('run %s:' % (i+1))
+				
+				outputValues[i] = calculate(calculator, inputInfos, outputLoc, i, tmpFile)
+				outputValues.flush()
+				
+				discard_tmp(tmpFile, recent)   # only files already read by calculator
+				
+				print('done.')
+		
+		except BaseException:
+			aspenStage.terminate()   # otherwise it may block on a full queue forever
+			raise
+		
+		finally:
+			calculator.close()
+			aspenStage.join()
+	
+	print('all done.')
+	
+	
+def run_and_update_queued(data_dir, nruns, queue_file, study, poll = QUEUE_POLL):
+	'''
+	Parameters
+	data_dir: str, dataset directory in columnar format
+	nruns: int, total # of runs
+	queue_file: str, job queue file (SQLite)
+	study: str, study name
+	poll: float, seconds between collections
+	'''
+	
+	jobs = queue_runs(data_dir, queue_file, study, nruns)
+	print('%s runs queued in %s as study %s.' % (len(jobs), queue_file, study))
+	
+	while True:
+		counts = collect_runs(data_dir, queue_file, jobs)
+		print('%(done)s runs done, %(failed)s failed, %(left)s left.' % counts)
+		
+		if counts['left'] == 0:
+			break
+		
+		time.sleep(poll)
+	
+	print('all done.')
+	
+	
+def has_pending(output_values, claims, nruns):
+	'''
+	Parameters
+	output_values: memmap, output values of dataset
+	claims: memmap, claims of dataset
+	nruns: int, total # of runs
+	
+	Returns
+	ifPending: bool, whether unclaimed runs are left
+	'''
+	
+	return bool((np.isnan(output_values[:nruns]) & (claims[:nruns] == UNCLAIMED)).any())
+	
+	
 	
 	
 if __name__ == '__main__':
 	
-	inputsInfo, outputInfo = parse_data_file(DATASET_FILE)
+	if QUEUE_FILE is not None:
+		if not is_columnar(DATASET_FILE):
+			raise ValueError('queued generation needs the columnar format, convert with dataset_io.excel_to_columnar')
+		
+		study = STUDY if STUDY is not None else os.path.basename(os.path.normpath(DATASET_FILE))
+		run_and_update_queued(DATASET_FILE, NRUNS, QUEUE_FILE, study)
+	
+	elif NWORKERS > 1:
+		if not is_columnar(DATASET_FILE):
+			raise ValueError('parallel generation needs the columnar format, convert with dataset_io.excel_to_columnar')
+		
+		run_and_update_parallel(DATASET_FILE, ASPEN_FILE, CALCULATOR_FILE, NRUNS, NWORKERS)
+	
+	elif PIPELINE:
+		if not is_columnar(DATASET_FILE):
+			raise ValueError('pipelined generation needs the columnar format, convert with dataset_io.excel_to_columnar')
+		
+		run_and_update_pipelined(DATASET_FILE, ASPEN_FILE, CALCULATOR_FILE, NRUNS)
+	
+	elif LITE_ASPEN_FILE is not None:
+		if not is_columnar(DATASET_FILE):
+			raise ValueError('multi-fidelity generation needs the columnar format, convert with dataset_io.excel_to_columnar')
+		
+		print('lite model:')
+		run_and_update_columnar(DATASET_FILE, LITE_ASPEN_FILE, CALCULATOR_FILE, NRUNS, lite = True)
+		
+		print('full model:')
+		run_and_update_columnar(DATASET_FILE, ASPEN_FILE, CALCULATOR_FILE, min(NFULL, NRUNS))
+	
+	elif is_columnar(DATASET_FILE):
+		run_and_update_columnar(DATASET_FILE, ASPEN_FILE, CALCULATOR_FILE, NRUNS)
+	
+	else:
+		inputsInfo, outputInfo = parse_data_file(DATASET_FILE)
+		
+		run_and_update(DATASET_FILE, inputsInfo, outputInfo, ASPEN_FILE, CALCULATOR_FILE, NRUNS)
 	
-	run_and_update(DATASET_FILE, inputsInfo, outputInfo, ASPEN_FILE, CALCULATOR_FILE, NRUNS)
+	print_tmp_usage(tmp_root(DATASET_FILE))
 	
 	
 	
@@ -22,12 +22,15 @@ Input variable types are:
 	xlsm for calculator variables
 	bkp for Aspen non-Fortran variables
 	bkp_fortran for Aspen Fortran variables
+
+OUTPUT_FILE ending with .xlsx writes the dataset in Excel format, otherwise OUTPUT_FILE is a directory and the dataset 
+is written in the columnar format (see dataset_io.py).
 	
 python path\to\autoaspen\generate_dataset_template.py
 '''
 
 
-OUTPUT_FILE = 'path\to\dataset.xlsx'
+OUTPUT_FILE = 'path\to\dataset.xlsx'   # or 'path\to\dataset' for the columnar format
 CONFIG_FILE = 'path\to\var_infos.xlsx'
 NRUNS = 100
 
@@ -36,6 +39,7 @@ import os
 import numpy as np
 import pandas as pd
 from scipy import stats
+from dataset_io import is_columnar, write_dataset
 
 
 def parse_config_file(config_file):
@@ -61,7 +65,7 @@ def generate_input_values(inputs_info, nruns):
 	nruns: int, # of runs
 	
 	Returns
-	inputsValues: df
+	inputsValues: df, columns are ['Input variable', 'Type', 'Location', 'Values'], Values are arrays
 	'''
 	
 	inputsValues = pd.DataFrame(columns = ['Input variable', 'Type', 'Location', 'Values'])
@@ -89,9 +93,7 @@ def generate_input_values(inputs_info, nruns):
 					count += 1
 					values.append(value)
 		
-		values = ','.join(np.array(values).astype(str))
-		
-		inputsValues.loc[inputVar, :] = [inputVar, varType, local, values]
+		inputsValues.loc[inputVar, :] = [inputVar, varType, local, np.array(values, dtype = np.float64)]
 	
 	return inputsValues
 
@@ -100,19 +102,35 @@ def write_to_excel(out_file, inputs_values, output_info):
 	'''
 	Parameters
 	out_file: str, output file
-	inputs_values: df, columns are ['Input variable', 'Type', 'Location', 'Values']
+	inputs_values: df, columns are ['Input variable', 'Type', 'Location', 'Values'], Values are arrays
 	output_info: df , columns are ['Output variable', 'Location']
 	'''
 	
 	outDir = os.path.dirname(out_file)
 	os.makedirs(outDir, exist_ok = True)
 	
+	inputs_values = inputs_values.copy()
+	inputs_values['Values'] = [','.join(values.astype(str)) for values in inputs_values['Values']]
+	
 	output_info = output_info.copy()
 	output_info['Values'] = 'NaN'
 	
 	with pd.ExcelWriter(out_file) as writer:
 		inputs_values.to_excel(writer, sheet_name = 'Inputs', index = False)
 		output_info.to_excel(writer, sheet_name = 'Output', index = False)
+		
+		
+def write_to_dataset(out_dir, inputs_values, output_info):
+	'''
+	Parameters
+	out_dir: str, dataset directory
+	inputs_values: df, columns are ['Input variable', 'Type', 'Location', 'Values'], Values are arrays
+	output_info: df , columns are ['Output variable', 'Location']
+	'''
+	
+	values = np.column_stack(inputs_values['Values'].tolist())
+	
+	write_dataset(out_dir, inputs_values, values, output_info)
 	
 	
 
@@ -123,7 +141,10 @@ if __name__ == '__main__':
 	
 	inputsValues = generate_input_values(inputsInfo, NRUNS)
 	
-	write_to_excel(OUTPUT_FILE, inputsValues, outputInfo)
+	if is_columnar(OUTPUT_FILE):
+		write_to_dataset(OUTPUT_FILE, inputsValues, outputInfo)
+	else:
+		write_to_excel(OUTPUT_FILE, inputsValues, outputInfo)
 	
 	
 	
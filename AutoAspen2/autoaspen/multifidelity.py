@@ -0,0 +1,45 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+r'''
+This module defines the multi-fidelity regression model saved by train_regression_model.py with MULTI_FIDELITY. 
+It predicts like other trained models, so predict_and_simulate.py loads it the same way.
+'''
+
+
+import numpy as np
+
+
+class MultiFidelityModel():
+	
+	def __init__(self, lite_model, correction):
+		'''
+		Parameters
+		lite_model: model, trained on output values of the lite Aspen model over many runs
+		correction: model, trained on output values of the full Aspen model, features are inputs followed by the 
+					lite output value
+		'''
+		
+		self.liteModel = lite_model
+		self.correction = correction
+		
+		
+	def predict(self, features):
+		'''
+		Parameters
+		features: df or 2D array, columns are inputs in the order of training
+		
+		Returns
+		predicted: array, predicted output values of the full model
+		'''
+		
+		features = np.asarray(features, dtype = float)
+		liteValues = self.liteModel.predict(features)
+		
+		return self.correction.predict(np.column_stack([features, liteValues]))
@@ -15,7 +15,7 @@ python path\to\autoaspen\plot_hist.py
 
 
 OUT_DIR = 'path\to\output\plot_hist'
-DATA_FILE = 'path\to\data.xlsx'
+DATA_FILE = 'path\to\data.xlsx'   # or 'path\to\dataset' to plot output values of a columnar dataset
 XLABEL = 'MFSP - Rin ($/GGE)'
 
 
@@ -24,14 +24,20 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from dataset_io import is_columnar, read_features_and_targets
 
 
 def read_data(data_file):
 	'''
 	Parameters
-	data_file: str, data file
+	data_file: str, data file (.xlsx) or dataset directory (columnar)
 	'''
 	
+	if is_columnar(data_file):
+		_, data = read_features_and_targets(data_file)
+		
+		return data
+	
 	data = pd.read_excel(data_file, header = None, index_col = None, squeeze = True)
 	
 	return data	
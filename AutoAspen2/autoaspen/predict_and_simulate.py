@@ -11,11 +11,14 @@ r'''
 This script predicts output MSP using a trained regression model and performs:
 1. Sensitivity analysis with one query input;
 2. Response analysis with two query inputs;
-3. Monte Carlo simulation with three or more query inputs
+3. Monte Carlo simulation with three or more query inputs;
+4. Optimization of MSP within bounds of query inputs, optionally sweeping one bound
 
 NOTE
 1. Variable name can have unit in format of "varname (unit)";
-2. Variable name should be consistent in "input" sheet and "baseline" sheet.
+2. Variable name should be consistent in "input" sheet and "baseline" sheet;
+3. Sheet "Optimization" is optional, columns are ['Input variable', 'Bounds', 'Sweep'], Sweep of at most one variable is 
+   in format of "lower|start,end,size" or "upper|start,end,size".
 
 python path\to\autoaspen\predict_and_simulate.py
 '''
@@ -34,6 +37,7 @@ from collections import namedtuple
 import numpy as np
 import pandas as pd
 from scipy import stats
+from scipy.optimize import minimize
 from joblib import load
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -324,6 +328,155 @@ class MoreInputsHandler(BaseHandler):
 		self.plot_hist_and_save(out_dir, 'more_input', xlabel)
 		
 
+class OptimizationHandler(BaseHandler):
+	
+	def generate_input_matrix(self, nstarts = 20):
+		'''
+		Parameters
+		nstarts: int, # of L-BFGS-B starts, the baseline is always one of them
+		'''
+		
+		baseInput = self.baseline.set_index('Input variable')['Baseline value']
+		self.features = baseInput.index.tolist()
+		self.x0 = baseInput.values.astype(float)
+		
+		self.inputVars = [var.strip() for var in self.config['Input variable']]
+		self.varIdx = np.array([self.features.index(var) for var in self.inputVars])
+		print('_'.join(self.inputVars), 'generating starting points')
+		
+		self.bounds = np.array([list(map(float, bnds.split(','))) for bnds in self.config['Bounds']])
+		lb, ub = self.bounds.T
+		
+		self.starts = np.vstack([np.clip(self.x0[self.varIdx], lb, ub), 
+								 np.random.uniform(lb, ub, size = (nstarts-1, lb.size))])
+		
+		self.sweep = None
+		if 'Sweep' in self.config:
+			for i, sweep in enumerate(self.config['Sweep']):
+				if isinstance(sweep, str):
+					side, values = sweep.split('|')
+					start, end, size = map(float, values.split(','))
+					self.sweep = (i, side.strip(), np.linspace(start, end, int(size)))
+					break
+	
+	
+	def predict_and_gradient(self, u):
+		'''
+		Parameters
+		u: array, values of query inputs, other inputs are at baseline
+		
+		Returns
+		y: float, predicted output
+		grad: array or None, gradient of y with respect to u, None if the model is not polynomial + linear
+		'''
+		
+		x = self.x0.copy()
+		x[self.varIdx] = u
+		
+		if not hasattr(self, 'poly'):
+			poly, reg = (self.model.steps[0][1], self.model.steps[-1][1]) if hasattr(self.model, 'steps') else (None, None)
+			if hasattr(poly, 'powers_') and hasattr(reg, 'coef_'):
+				self.poly, self.coef, self.intercept = poly.powers_, np.ravel(reg.coef_), np.ravel(reg.intercept_)[0]
+			else:
+				self.poly = None
+		
+		if self.poly is None:
+			return self.model.predict(x.reshape(1, -1))[0], None
+		
+		# terms are products of x_i^p_ki, the product excluding x_j comes from prefix and suffix products
+		P = self.poly
+		Xp = x**P
+		left = np.cumprod(np.hstack([np.ones((P.shape[0], 1)), Xp[:, :-1]]), axis = 1)
+		right = np.cumprod(np.hstack([np.ones((P.shape[0], 1)), Xp[:, :0:-1]]), axis = 1)[:, ::-1]
+		
+		phi = left[:, -1] * Xp[:, -1]
+		y = self.coef @ phi + self.intercept
+		
+		Pq = P[:, self.varIdx]
+		dXp = np.where(Pq > 0, Pq * x[self.varIdx]**np.maximum(Pq-1, 0), 0)
+		grad = self.coef @ (left[:, self.varIdx] * right[:, self.varIdx] * dXp)
+		
+		return y, grad
+	
+	
+	def optimize(self, bounds):
+		'''
+		Parameters
+		bounds: 2D array, rows are query inputs, columns are [lower bound, upper bound]
+		
+		Returns
+		uopt: array, optimal values of query inputs
+		yopt: float, minimal predicted output
+		'''
+		
+		if self.predict_and_gradient(self.starts[0])[1] is not None:
+			fun, jac = self.predict_and_gradient, True
+		else:
+			fun, jac = lambda u: self.predict_and_gradient(u)[0], None   # gradient by finite differences
+		
+		best = None
+		for u0 in np.clip(self.starts, *bounds.T):
+			res = minimize(fun, u0, method = 'L-BFGS-B', jac = jac, bounds = bounds)
+			if best is None or res.fun < best.fun:
+				best = res
+		
+		return best.x, float(best.fun)
+	
+	
+	def simulate(self):
+		
+		name = '_'.join(self.inputVars)
+		print(name, 'optimizing')
+		
+		uopt, yopt = self.optimize(self.bounds)
+		self.optimum = pd.Series(np.append(uopt, yopt), index = self.inputVars + ['Optimum'])
+		
+		self.sweepResults = None
+		if self.sweep is not None:
+			i, side, values = self.sweep
+			print(self.inputVars[i], 'sweeping %s bound' % side)
+			
+			results = []
+			for value in values:
+				bounds = self.bounds.copy()
+				bounds[i, 0 if side == 'lower' else 1] = value
+				if bounds[i, 0] > bounds[i, 1]:
+					continue
+				
+				uopt, yopt = self.optimize(bounds)
+				results.append(np.concatenate([[value], uopt, [yopt]]))
+			
+			self.sweepResults = pd.DataFrame(results, columns = ['%s (%s bound)' % (self.inputVars[i], side)] + self.inputVars + ['Optimum'])
+	
+	
+	def plot_and_save(self, out_dir, xlabel):
+		'''
+		Parameters
+		out_dir: str, output directory
+		xlabel: str, label of xaxis
+		'''
+		
+		varName = get_var_name('_'.join(self.inputVars))
+		fileName = get_var_name(xlabel)
+		
+		saveDir = '%s/%s/%s' % (out_dir, 'optimization', varName)
+		saveDir = make_dir(saveDir)
+		
+		self.optimum.rename({'Optimum': xlabel}).to_excel('%s/%s_optimum.xlsx' % (saveDir, fileName), header = False)
+		
+		if self.sweepResults is not None:
+			sweepResults = self.sweepResults.rename(columns = {'Optimum': xlabel})
+			sweepResults.to_excel('%s/%s_sweep.xlsx' % (saveDir, fileName), header = True, index = False)
+			
+			fig, ax = plt.subplots()
+			ax.plot(sweepResults.iloc[:, 0], sweepResults[xlabel], marker = 'o')
+			ax.set_xlabel(sweepResults.columns[0], fontsize = 15)
+			ax.set_ylabel('Optimal ' + xlabel, fontsize = 15)
+			
+			fig.savefig('%s/%s_sweep.jpg' % (saveDir, fileName), dpi = 300, bbox_inches = 'tight')
+			plt.close(fig = fig)
+		
+
 def parse_config_file(config_file):
 	'''
 	Parameters
@@ -331,16 +484,17 @@ def parse_config_file(config_file):
 				 with the order of model features
 	
 	Returns
-	oneInput, twoInputs, moreInputs, baseline: df
+	oneInput, twoInputs, moreInputs, optimization, baseline: df, optimization is empty if sheet Optimization is absent
 	'''
 	
-	configInfo = pd.read_excel(config_file, sheet_name = ['One-input', 'Two-inputs', 'More-inputs', 'Baseline'])
+	configInfo = pd.read_excel(config_file, sheet_name = None)
 	oneInput = configInfo['One-input']
 	twoInputs = configInfo['Two-inputs']
 	moreInputs = configInfo['More-inputs']
+	optimization = configInfo.get('Optimization', pd.DataFrame())
 	baseline = configInfo['Baseline']
 	
-	return oneInput, twoInputs, moreInputs, baseline
+	return oneInput, twoInputs, moreInputs, optimization, baseline
 	
 	
 def get_var_name(name_with_unit):		
@@ -377,8 +531,8 @@ def make_dir(directory):
 if __name__ == '__main__':
 	
 	*configs, baseline = parse_config_file(CONFIG_FILE)
-	Handlers = [OneInputHandler, TwoInputsHandler, MoreInputsHandler]
-	labels = ['one input variable', 'two input variables', 'more input variables']
+	Handlers = [OneInputHandler, TwoInputsHandler, MoreInputsHandler, OptimizationHandler]
+	labels = ['one input variable', 'two input variables', 'more input variables', 'optimization']
 	
 	for config, Handler, label in zip(configs, Handlers, labels):
 		print('handle %s:' % label)
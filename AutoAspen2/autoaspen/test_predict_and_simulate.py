@@ -0,0 +1,94 @@
+#!/usr/bin/env pyhton
+# -*- coding: UTF-8 -*-
+
+
+__author__ = 'Chao Wu'
+__date__ = '10/19/2026'
+__version__ = '1.0'
+
+
+r'''
+Tests of OptimizationHandler in predict_and_simulate.py with models trained on a known quadratic.
+
+python -m pytest AutoAspen2/autoaspen/test_predict_and_simulate.py
+'''
+
+
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import PolynomialFeatures
+from sklearn.linear_model import Ridge, LinearRegression
+from sklearn.ensemble import RandomForestRegressor
+from predict_and_simulate import OptimizationHandler
+from multifidelity import MultiFidelityModel
+
+
+OPTIMUM = np.array([0.3, 0.6])
+
+
+def response(X):
+
+	return ((X[:, :2] - OPTIMUM)**2).sum(axis = 1) + 0.1 * X[:, 2]
+
+
+def make_handler(model):
+
+	config = pd.DataFrame({'Input variable': ['a', 'b'], 'Bounds': ['0,1', '0,1']})
+	baseline = pd.DataFrame({'Input variable': ['a', 'b', 'c'], 'Baseline value': [0.5, 0.5, 1.0]})
+
+	np.random.seed(0)
+	handler = OptimizationHandler(config, baseline)
+	handler.generate_input_matrix(nstarts = 5)
+	handler.model = model
+
+	return handler
+
+
+def training_data(nruns = 400):
+
+	X = np.random.RandomState(1).uniform(0, 1, size = (nruns, 3))
+
+	return X, response(X)
+
+
+def test_optimize_polynomial_model_with_gradient():
+
+	X, y = training_data()
+	model = Pipeline([('poly', PolynomialFeatures(2)), ('reg', Ridge(alpha = 1e-8))]).fit(X, y)
+
+	handler = make_handler(model)
+	assert handler.predict_and_gradient(OPTIMUM)[1] is not None
+
+	uopt, yopt = handler.optimize(handler.bounds)
+	assert np.allclose(uopt, OPTIMUM, atol = 1e-3)
+	assert abs(yopt - 0.1) < 1e-3
+
+
+def test_optimize_model_without_gradient():
+
+	X, y = training_data()
+	model = RandomForestRegressor(n_estimators = 50, random_state = 0).fit(X, y)
+
+	handler = make_handler(model)
+	assert handler.predict_and_gradient(OPTIMUM)[1] is None
+
+	uopt, yopt = handler.optimize(handler.bounds)
+	assert np.all((uopt >= 0) & (uopt <= 1))
+	assert yopt <= model.predict(np.append(handler.starts, np.ones((5, 1)), axis = 1)).min() + 1e-12
+
+
+def test_optimize_multifidelity_model():
+
+	X, y = training_data()
+	yLite = 0.8 * y + 0.05
+	liteModel = Pipeline([('poly', PolynomialFeatures(2)), ('reg', Ridge(alpha = 1e-8))]).fit(X, yLite)
+	correction = LinearRegression().fit(np.column_stack([X, liteModel.predict(X)]), y)
+	model = MultiFidelityModel(liteModel, correction)
+
+	handler = make_handler(model)
+	assert handler.predict_and_gradient(OPTIMUM)[1] is None
+
+	uopt, yopt = handler.optimize(handler.bounds)
+	assert np.allclose(uopt, OPTIMUM, atol = 1e-2)
+	assert abs(yopt - 0.1) < 1e-3
@@ -10,12 +10,17 @@ __version__ = '1.0'
 r'''
 This script trains and tunes a ridge regression model using polynomial kernel.
 
+With MULTI_FIDELITY (columnar dataset generated with LITE_ASPEN_FILE), the model is trained on output values of the 
+lite Aspen model over all runs, and a correction from the lite output to the full output is trained on the runs also 
+simulated with the full model. The saved model predicts output values of the full model.
+
 python path\to\autoaspen\train_regression_model.py
 '''
 
 
 OUT_DIR = 'path\to\training'
-DATA_FILE = 'path\to\dataset.xlsx'
+DATA_FILE = 'path\to\dataset.xlsx'   # or 'path\to\dataset' for the columnar format
+MULTI_FIDELITY = False
 
 
 import sys
@@ -29,22 +34,27 @@ import pandas as pd
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import PolynomialFeatures
 from sklearn.linear_model import Ridge
-from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import GridSearchCV, cross_val_predict
 from scipy.stats import pearsonr
 import matplotlib.pyplot as plt
 from joblib import dump
+from dataset_io import is_columnar, read_features_and_targets, read_multifidelity
+from multifidelity import MultiFidelityModel
 
 
 def read_data(data_file):
 	'''
 	Parameters
-	data_file: str, data file
+	data_file: str, data file (.xlsx) or dataset directory (columnar)
 	
 	Returns
 	features: df
 	targets: ser
 	'''
 	
+	if is_columnar(data_file):
+		return read_features_and_targets(data_file)
+	
 	dataInfo = pd.read_excel(data_file, sheet_name = ['Inputs', 'Output'])
 	inputInfo = dataInfo['Inputs']
 	outputInfo = dataInfo['Output'].squeeze()
@@ -95,6 +105,46 @@ def train_and_turn(features, targets, nfolds = 5, njobs = 3):
 	return bestModel, bestParams, true_vs_pred, R2
 	
 	
+def train_correction(features, lite_targets, full_targets, nfolds = 5):
+	'''
+	Parameters
+	features: df, training features
+	lite_targets: ser, output values of the lite model
+	full_targets: ser, output values of the full model, NaN for runs not simulated with it
+	nfolds: int, # of cross validation folds
+	
+	Returns
+	correction: model, features are inputs followed by the lite output value
+	true_vs_pred: df, full values and cross-validated predictions
+	R2: float, of cross-validated predictions
+	liteR2: float, of lite values against full values
+	'''
+	
+	both = full_targets.notna().values
+	X = np.column_stack([features.values[both], lite_targets.values[both]])
+	y = full_targets.values[both]
+	cv = min(nfolds, y.size)
+	
+	pipe = Pipeline(steps = [('poly', PolynomialFeatures()), ('ridge', Ridge())])
+	paramGrid = {'poly__degree': [1, 2],
+				 'ridge__alpha': [0.01, 0.1, 1]}
+	
+	regModels = GridSearchCV(pipe, paramGrid, cv = cv)
+	regModels.fit(X, y)
+	
+	correction = regModels.best_estimator_
+	
+	predicted = cross_val_predict(correction, X, y, cv = cv)
+	R2 = pearsonr(predicted, y)[0]**2
+	liteR2 = pearsonr(X[:, -1], y)[0]**2
+	
+	correction.fit(X, y)
+	
+	true_vs_pred = pd.DataFrame({'True': y, 'Predicted': predicted})
+	
+	return correction, true_vs_pred, R2, liteR2
+	
+	
 def display_results(best_params, true_vs_pred, r2):
 	'''
 	Parameters
@@ -153,9 +203,20 @@ def plot_true_vs_predicted(out_dir, true_vs_pred, r2):
 
 if __name__ == '__main__':
 	
-	features, targets = read_data(DATA_FILE)
+	if MULTI_FIDELITY:
+		features, liteTargets, fullTargets = read_multifidelity(DATA_FILE)
+		
+		liteModel, bestParams, _, _ = train_and_turn(features, liteTargets)
+		correction, trueVSpred, R2, liteR2 = train_correction(features, liteTargets, fullTargets)
+		
+		bestModel = MultiFidelityModel(liteModel, correction)
+		print('%s lite runs, %s full runs, R2 of lite outputs against full outputs: %.4f' % 
+			  (liteTargets.size, fullTargets.notna().sum(), liteR2))
 	
-	bestModel, bestParams, trueVSpred, R2 = train_and_turn(features, targets)
+	else:
+		features, targets = read_data(DATA_FILE)
+		
+		bestModel, bestParams, trueVSpred, R2 = train_and_turn(features, targets)
 	
 	display_results(bestParams, trueVSpred, R2)
 	save_results(OUT_DIR, bestModel, trueVSpred)